@@ -0,0 +1,117 @@
+"""
+File: benchmark_dimensionality_reduction.py
+Directory: scripts/benchmark_dimensionality_reduction.py
+Created: 2026-10-19 11:30 UTC
+Version: 1.0.0
+
+Summary:
+--------
+Measures the memory/accuracy trade-off of projecting stored and query vectors
+to a lower dimension (PCA or truncation) before indexing in VectorStore.
+
+Purpose:
+--------
+- Report recall@k of reduced-dimension search against full-dimension exact search
+- Report raw vector memory for each target dimension (128/256/384 by default)
+- Run on real corpus embeddings (--embeddings file.npy) or on synthetic
+  vectors with a decaying spectrum that mimics sentence embeddings
+
+Dependencies:
+------------
+- numpy
+- faiss-cpu
+- rich (for formatted console output)
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import faiss
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "chatgfp"))
+
+from app.services.projection import build_projection
+
+console = Console()
+
+
+def synthetic_embeddings(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """Gaussian vectors with a power-law spectrum, rotated into a random basis"""
+    rng = np.random.default_rng(seed)
+    spectrum = (np.arange(1, dimension + 1) ** -0.75).astype(np.float32)
+    latent = rng.standard_normal((count, dimension), dtype=np.float32) * spectrum
+    rotation, _ = np.linalg.qr(rng.standard_normal((dimension, dimension)))
+    vectors = latent @ rotation.astype(np.float32)
+    return np.ascontiguousarray(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbours recovered, averaged over queries"""
+    k = truth.shape[1]
+    hits = sum(len(np.intersect1d(t, f)) for t, f in zip(truth, found))
+    return hits / (len(truth) * k)
+
+
+def run(embeddings: np.ndarray, queries: int, k: int, dims: List[int], train_size: Optional[int]) -> None:
+    corpus, query_vectors = embeddings[queries:], embeddings[:queries]
+    full_dim = corpus.shape[1]
+
+    exact = faiss.IndexFlatL2(full_dim)
+    exact.add(corpus)
+    _, truth = exact.search(query_vectors, k)
+
+    table = Table(title=f"Recall@{k} vs full {full_dim}-dim exact search ({len(corpus)} vectors)")
+    table.add_column("Projection", style="cyan")
+    table.add_column("Dims", style="cyan")
+    table.add_column("Vector memory (MB)", style="yellow")
+    table.add_column(f"Recall@{k}", style="green")
+    table.add_row("none", str(full_dim), f"{corpus.nbytes / 1024 / 1024:.1f}", "1.0000")
+
+    sample = corpus[:train_size] if train_size else corpus
+    for kind in ("pca", "truncate"):
+        for dim in dims:
+            if dim >= full_dim:
+                continue
+            # Stored and query vectors go through the transform as in VectorStore
+            transform = build_projection(kind, full_dim, dim)
+            if not transform.is_trained:
+                transform.train(sample)
+            index = faiss.IndexFlatL2(dim)
+            index.add(transform.apply(corpus))
+            _, found = index.search(transform.apply(query_vectors), k)
+            memory = len(corpus) * dim * 4 / 1024 / 1024
+            table.add_row(kind, str(dim), f"{memory:.1f}", f"{recall_at_k(truth, found):.4f}")
+
+    console.print(table)
+
+
+"""
+Usage:
+------
+python scripts/benchmark_dimensionality_reduction.py
+python scripts/benchmark_dimensionality_reduction.py --embeddings corpus_embeddings.npy --k 10
+
+The first --queries vectors are used as queries and excluded from the corpus.
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall of projected vs full-dimension search")
+    parser.add_argument("--embeddings", help="(n, d) float32 .npy file of corpus embeddings")
+    parser.add_argument("--count", type=int, default=50_000, help="Synthetic corpus size")
+    parser.add_argument("--dimension", type=int, default=768, help="Synthetic dimension")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", type=int, nargs="+", default=[128, 256, 384])
+    parser.add_argument("--train-size", type=int, default=20_000, help="PCA training sample size")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        data = np.ascontiguousarray(np.load(args.embeddings, mmap_mode="r"), dtype=np.float32)
+    else:
+        data = synthetic_embeddings(args.count + args.queries, args.dimension)
+    run(data, args.queries, args.k, args.dims, args.train_size)
@@ -0,0 +1,120 @@
+"""
+File: benchmark_embedding_arrays.py
+Directory: scripts/benchmark_embedding_arrays.py
+Created: 2026-10-19 09:00 UTC
+Version: 1.0.0
+
+Summary:
+--------
+Benchmark comparing the legacy list-of-floats embedding path against the
+NumPy-native float32 path from the encoder into FAISS `index.add`/`index.search`.
+
+Purpose:
+--------
+- Measure latency of both paths for 10k-chunk batches
+- Measure peak Python allocations (tracemalloc) of both paths
+- Optionally run against the real SentenceTransformer model instead of
+  synthetic encoder output
+
+Dependencies:
+------------
+- numpy
+- faiss-cpu
+- rich (for formatted console output)
+- sentence-transformers (only with --model)
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import faiss
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "chatgfp"))
+
+console = Console()
+
+
+def measure(fn: Callable[[], None], repeats: int) -> Dict[str, float]:
+    """Run fn `repeats` times and return best latency and peak allocation"""
+    timings = []
+    peak = 0
+    for _ in range(repeats):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {"seconds": min(timings), "peak_mb": peak / 1024 / 1024}
+
+
+def run(chunks: int, dimension: int, repeats: int, model_name: str = None) -> None:
+    if model_name:
+        from app.services.embeddings import EmbeddingService
+        service = EmbeddingService(model_name)
+        texts = [f"FCA handbook chunk {i} about client money and conduct rules" for i in range(chunks)]
+        encoder_output = lambda: service.model.encode(texts, convert_to_tensor=False)
+    else:
+        rng = np.random.default_rng(0)
+        synthetic = rng.standard_normal((chunks, dimension), dtype=np.float32)
+        encoder_output = lambda: synthetic.copy()
+
+    def list_path() -> None:
+        # encode -> .tolist() -> np.array().astype('float32'), as before
+        embeddings: List[List[float]] = encoder_output().tolist()
+        index = faiss.IndexFlatL2(len(embeddings[0]))
+        index.add(np.array(embeddings).astype('float32'))
+        query = np.array([embeddings[0]]).astype('float32')
+        index.search(query, 5)
+
+    def array_path() -> None:
+        embeddings = np.ascontiguousarray(encoder_output(), dtype=np.float32)
+        index = faiss.IndexFlatL2(embeddings.shape[1])
+        index.add(embeddings)
+        index.search(embeddings[:1], 5)
+
+    results = {
+        "list round-trip": measure(list_path, repeats),
+        "float32 ndarray": measure(array_path, repeats),
+    }
+
+    table = Table(title=f"Embedding path: {chunks} chunks x {dimension} dims")
+    table.add_column("Path", style="cyan")
+    table.add_column("Best latency (s)", style="green")
+    table.add_column("Peak Python alloc (MB)", style="yellow")
+    for name, stats in results.items():
+        table.add_row(name, f"{stats['seconds']:.3f}", f"{stats['peak_mb']:.1f}")
+    console.print(table)
+
+    baseline, native = results["list round-trip"], results["float32 ndarray"]
+    console.print(
+        f"Speed-up: {baseline['seconds'] / native['seconds']:.1f}x, "
+        f"allocation saving: {baseline['peak_mb'] - native['peak_mb']:.1f} MB"
+    )
+
+
+"""
+Usage:
+------
+python scripts/benchmark_embedding_arrays.py --chunks 10000 --dimension 768
+python scripts/benchmark_embedding_arrays.py --model all-MiniLM-L6-v2
+
+Without --model the encoder output is synthetic, which isolates the cost of
+the list round-trip from transformer inference time.
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark list vs ndarray embedding paths")
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--model", default=None, help="SentenceTransformer model to encode with")
+    args = parser.parse_args()
+    run(args.chunks, args.dimension, args.repeats, args.model)
@@ -0,0 +1,256 @@
+"""
+File: benchmark_local_pinecone.py
+Directory: scripts/benchmark_local_pinecone.py
+Created: 2026-10-19 18:45 UTC
+Version: 1.0.0
+
+Summary:
+--------
+Load-tests PineconeClient (and optionally QueryProcessor end to end) against
+the local FAISS-backed Pinecone stand-in, so the retrieval path can be
+benchmarked on one machine without access to Pinecone.
+
+Purpose:
+--------
+- Start the stand-in in a subprocess (or use --host for a running one)
+- Report bulk upsert throughput for synthetic handbook vectors across
+  namespaces, sequential vs pipelined (several requests in flight)
+- Report query latency percentiles and throughput, with and without
+  metadata filters, at several client concurrency levels
+- Compare async queries with and without hedging (hedge rate, win rate and
+  tail latency); --slow-fraction/--slow-ms give the stand-in a long tail
+- With --end-to-end, time QueryProcessor.process_query (embedding + search)
+
+Dependencies:
+------------
+- numpy
+- requests, httpx, tenacity (PineconeClient)
+- fastapi, uvicorn, faiss-cpu (stand-in server)
+- sentence-transformers (only with --end-to-end)
+- rich (for formatted console output)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+import requests
+from rich.console import Console
+from rich.table import Table
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "src" / "chatgfp"))
+
+from chatgfp.steps.step_3_embedding.pinecone_client import BulkUpsertReport, PineconeClient
+
+console = Console()
+
+MODULES = ["SYSC", "COBS", "CASS", "PRIN", "DISP"]
+
+
+def start_stand_in(port: int, dimension: int, slow_fraction: float, slow_ms: float) -> subprocess.Popen:
+    """Run the stand-in server in a subprocess and wait until it answers"""
+    env = dict(os.environ, PYTHONPATH=str(ROOT / "src"))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "chatgfp.steps.step_3_embedding.local_pinecone",
+         "--port", str(port), "--dimension", str(dimension),
+         "--slow-fraction", str(slow_fraction), "--slow-ms", str(slow_ms)],
+        env=env
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{port}/describe_index_stats", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Local Pinecone stand-in did not start")
+
+
+def percentiles(latencies: List[float]) -> str:
+    millis = np.array(latencies) * 1000
+    return " / ".join(f"{np.percentile(millis, p):.2f}" for p in (50, 95, 99))
+
+
+def records(count: int, dimension: int, module: str, seed: int) -> Iterator[tuple]:
+    """Synthetic (id, vector, metadata) records for one handbook module, generated lazily"""
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        yield (f"{module}-{i}", rng.standard_normal(dimension, dtype=np.float32), {
+            "section": f"{module} {i % 20}",
+            "category": "rules" if i % 2 else "guidance",
+            "text": f"{module} chunk {i}",
+            "source": f"handbook/{module.lower()}.pdf"
+        })
+
+
+def load(client: PineconeClient, count: int, dimension: int, concurrency: int) -> BulkUpsertReport:
+    """Bulk upsert count vectors, one namespace per module; returns the combined report"""
+    total = BulkUpsertReport()
+    for seed, module in enumerate(MODULES):
+        client.delete(delete_all=True, namespace=module)
+        report = client.bulk_upsert(
+            records(count // len(MODULES), dimension, module, seed), namespace=module, concurrency=concurrency
+        )
+        total.vectors += report.vectors
+        total.batches += report.batches
+        total.bytes_sent += report.bytes_sent
+        total.retries += report.retries
+        total.seconds += report.seconds
+    return total
+
+
+def measure(call: Callable[[int], None], queries: int, concurrency: int) -> tuple:
+    """Run call(i) for i in range(queries) on concurrency threads; returns latencies and QPS"""
+    latencies: List[float] = []
+
+    def timed(i: int) -> None:
+        start = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(queries)))
+    return latencies, queries / (time.perf_counter() - start)
+
+
+async def measure_async(client: PineconeClient, query_vectors: np.ndarray, concurrency: int, hedge: bool) -> dict:
+    """Run aquery over query_vectors with concurrency tasks in flight; returns client.query_stats()"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            await client.aquery(query_vectors[i], top_k=10, namespace=MODULES[i % len(MODULES)], hedge=hedge)
+
+    await asyncio.gather(*(one(i) for i in range(len(query_vectors))))
+    stats = client.query_stats()
+    await client.aclose()
+    return stats
+
+
+def run(host: Optional[str], port: int, count: int, dimension: int, queries: int,
+        concurrency: List[int], upsert_concurrency: List[int], slow_fraction: float, slow_ms: float,
+        end_to_end: bool) -> None:
+    process = None if host else start_stand_in(port, dimension, slow_fraction, slow_ms)
+    client = PineconeClient(api_key="local", host=host or f"http://127.0.0.1:{port}")
+    try:
+        table = Table(title=f"bulk_upsert of {count} vectors ({dimension}-dim) across {len(MODULES)} namespaces")
+        table.add_column("Requests in flight", style="cyan")
+        table.add_column("Batches", style="cyan")
+        table.add_column("Vectors / s", style="green")
+        table.add_column("MB / s", style="green")
+        table.add_column("Retries", style="yellow")
+        for in_flight in upsert_concurrency:
+            report = load(client, count, dimension, in_flight)
+            table.add_row(
+                str(in_flight), str(report.batches), f"{report.vectors_per_second:.0f}",
+                f"{report.megabytes_per_second:.1f}", str(report.retries)
+            )
+        console.print(table)
+        console.print(client.get_health_check())
+
+        rng = np.random.default_rng(1)
+        query_vectors = rng.standard_normal((queries, dimension), dtype=np.float32)
+        cases = {
+            "no filter": lambda i: client.query(query_vectors[i], top_k=10, namespace=MODULES[i % len(MODULES)]),
+            "filter": lambda i: client.query(
+                query_vectors[i], top_k=10, namespace=MODULES[i % len(MODULES)],
+                filter={"category": {"$eq": "rules"}}
+            ),
+        }
+
+        table = Table(title=f"PineconeClient against the local stand-in ({count} vectors, {dimension}-dim)")
+        table.add_column("Query", style="cyan")
+        table.add_column("Concurrency", style="cyan")
+        table.add_column("p50 / p95 / p99 (ms)", style="yellow")
+        table.add_column("QPS", style="green")
+        for name, call in cases.items():
+            for threads in concurrency:
+                latencies, qps = measure(call, queries, threads)
+                table.add_row(name, str(threads), percentiles(latencies), f"{qps:.0f}")
+        console.print(table)
+
+        table = Table(title="Async queries (aquery), hedged after the p95 of recent latencies")
+        table.add_column("Hedging", style="cyan")
+        table.add_column("Hedge rate", style="yellow")
+        table.add_column("Hedge wins", style="yellow")
+        table.add_column("p50 / p95 / p99 (ms)", style="green")
+        table.add_column("Max (ms)", style="green")
+        for hedge in (False, True):
+            # A fresh client per run so the latency window and counters start empty
+            async_client = PineconeClient(api_key="local", host=host or f"http://127.0.0.1:{port}")
+            stats = asyncio.run(measure_async(async_client, query_vectors, concurrency[-1], hedge))
+            async_client.close()
+            table.add_row(
+                "on" if hedge else "off",
+                f"{stats['hedge_rate']:.1%}",
+                f"{stats['hedge_win_rate']:.1%}" if hedge else "-",
+                f"{stats['p50_ms']:.2f} / {stats['p95_ms']:.2f} / {stats['p99_ms']:.2f}",
+                f"{stats['max_ms']:.1f}"
+            )
+        console.print(table)
+
+        if end_to_end:
+            from app.services.embeddings import EmbeddingService
+            from app.services.query_cache import QueryEmbeddingCache
+            from chatgfp.steps.step_4_retrieval.query_processor import QueryProcessor, QueryContext
+            embedding_service = EmbeddingService(
+                os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"), query_cache=QueryEmbeddingCache()
+            )
+            processor = QueryProcessor(embedding_service, client=client)
+            if processor.embedding_service.model.get_sentence_embedding_dimension() != dimension:
+                raise ValueError(f"--dimension must match the embedding model ({processor.model_name})")
+            asyncio.run(processor.generate_embedding("warm up"))
+            questions = ["What are the requirements for client money handling?"] * queries
+            latencies = []
+            for i, question in enumerate(questions):
+                start = time.perf_counter()
+                asyncio.run(processor.process_query(
+                    question, context=QueryContext(query=question, namespace=MODULES[i % len(MODULES)])
+                ))
+                latencies.append(time.perf_counter() - start)
+            console.print(f"QueryProcessor.process_query p50 / p95 / p99: {percentiles(latencies)} ms")
+    finally:
+        client.close()
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+"""
+Usage:
+------
+python scripts/benchmark_local_pinecone.py
+python scripts/benchmark_local_pinecone.py --count 114000 --dimension 768 --concurrency 1 8 32
+python scripts/benchmark_local_pinecone.py --dimension 384 --end-to-end
+python scripts/benchmark_local_pinecone.py --host http://127.0.0.1:5080
+python scripts/benchmark_local_pinecone.py --slow-fraction 0.05 --slow-ms 100 --queries 2000
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test PineconeClient against the local stand-in")
+    parser.add_argument("--host", help="URL of a running stand-in (default: start one)")
+    parser.add_argument("--port", type=int, default=5080)
+    parser.add_argument("--count", type=int, default=20_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="Query threads")
+    parser.add_argument("--upsert-concurrency", type=int, nargs="+", default=[1, 4], help="Upsert requests in flight")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="Fraction of stand-in queries to delay")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Delay added to those queries")
+    parser.add_argument("--end-to-end", action="store_true", help="Also time QueryProcessor (loads the model)")
+    args = parser.parse_args()
+
+    run(
+        args.host, args.port, args.count, args.dimension, args.queries,
+        args.concurrency, args.upsert_concurrency, args.slow_fraction, args.slow_ms, args.end_to_end
+    )
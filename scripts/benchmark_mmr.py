@@ -0,0 +1,147 @@
+"""
+File: benchmark_mmr.py
+Directory: scripts/benchmark_mmr.py
+Created: 2026-10-19 21:45 UTC
+Version: 1.0.0
+
+Summary:
+--------
+Measures the latency cost of MMR diversification (ResultRanker / mmr) on a
+candidate pool, against plain top-k by score and against a straightforward
+Python-loop MMR, and how much it diversifies the top-k.
+
+Purpose:
+--------
+- Report p50/p95 latency of top-k, vectorised MMR and loop MMR at the given
+  k and pool size (default k=50, pool=500) for several lambda values
+- Check that vectorised and loop MMR select the same candidates
+- Report diversity of the selected top-k: distinct near-duplicate clusters
+  covered and mean pairwise cosine similarity
+- Candidates are synthetic clusters of near-duplicate chunks around a query,
+  mimicking overlapping handbook chunks of one section
+
+Dependencies:
+------------
+- numpy
+- rich (for formatted console output)
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from chatgfp.steps.step_4_retrieval.result_ranker import mmr
+
+console = Console()
+
+
+def clustered_pool(pool: int, dimension: int, clusters: int, seed: int = 0) -> tuple:
+    """Query vector, (pool, dimension) candidates in near-duplicate clusters, and each candidate's cluster"""
+    rng = np.random.default_rng(seed)
+    query = rng.standard_normal(dimension).astype(np.float32)
+    query /= np.linalg.norm(query)
+    # Cluster centres at varying distance from the query; members are small perturbations
+    centres = query + rng.standard_normal((clusters, dimension)).astype(np.float32) * rng.uniform(0.02, 0.08, (clusters, 1))
+    labels = rng.integers(0, clusters, pool)
+    candidates = centres[labels] + rng.standard_normal((pool, dimension)).astype(np.float32) * 0.005
+    candidates /= np.linalg.norm(candidates, axis=1, keepdims=True)
+    return query, candidates, labels
+
+
+def mmr_loop(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float) -> np.ndarray:
+    """Reference MMR with a Python loop over candidates and picks"""
+    relevance = [float(np.dot(candidate, query)) for candidate in candidates]
+    selected: List[int] = []
+    remaining = list(range(len(candidates)))
+    while remaining and len(selected) < k:
+        best, best_score = None, -np.inf
+        for i in remaining:
+            redundancy = max((float(np.dot(candidates[i], candidates[j])) for j in selected), default=0.0)
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy if selected else relevance[i]
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+        remaining.remove(best)
+    return np.array(selected, dtype=np.int64)
+
+
+def top_k(query: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(candidates @ query), kind='stable')[:k]
+
+
+def timed(call: Callable[[], np.ndarray], repeats: int) -> tuple:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        selection = call()
+        latencies.append(time.perf_counter() - start)
+    millis = np.array(latencies) * 1000
+    return selection, np.percentile(millis, 50), np.percentile(millis, 95)
+
+
+def diversity(candidates: np.ndarray, labels: np.ndarray, selection: np.ndarray) -> tuple:
+    """Distinct clusters covered and mean off-diagonal cosine similarity of the selection"""
+    chosen = candidates[selection]
+    similarity = chosen @ chosen.T
+    n = len(selection)
+    mean_similarity = (similarity.sum() - np.trace(similarity)) / (n * (n - 1)) if n > 1 else 0.0
+    return len(set(labels[selection].tolist())), float(mean_similarity)
+
+
+def formatted(candidates: np.ndarray, labels: np.ndarray, selection: np.ndarray) -> tuple:
+    covered, mean_similarity = diversity(candidates, labels, selection)
+    return covered, f"{mean_similarity:.4f}"
+
+
+def run(pool: int, k: int, dimension: int, clusters: int, lambdas: List[float], repeats: int, loop_repeats: int) -> None:
+    query, candidates, labels = clustered_pool(pool, dimension, clusters)
+
+    table = Table(title=f"MMR over a pool of {pool} ({dimension}-dim, {clusters} near-duplicate clusters), k={k}")
+    table.add_column("Method", style="cyan")
+    table.add_column("Lambda", style="cyan")
+    table.add_column("p50 (ms)", style="yellow")
+    table.add_column("p95 (ms)", style="yellow")
+    table.add_column("Clusters in top-k", style="green")
+    table.add_column("Mean pairwise cosine", style="green")
+
+    selection, p50, p95 = timed(lambda: top_k(query, candidates, k), repeats)
+    table.add_row("top-k by score", "-", f"{p50:.3f}", f"{p95:.3f}", *map(str, formatted(candidates, labels, selection)))
+    for lambda_mult in lambdas:
+        vectorised, p50, p95 = timed(lambda: mmr(query, candidates, k, lambda_mult), repeats)
+        table.add_row("mmr (vectorised)", f"{lambda_mult}", f"{p50:.3f}", f"{p95:.3f}",
+                      *map(str, formatted(candidates, labels, vectorised)))
+        looped, p50, p95 = timed(lambda: mmr_loop(query, candidates, k, lambda_mult), loop_repeats)
+        table.add_row("mmr (Python loop)", f"{lambda_mult}", f"{p50:.3f}", f"{p95:.3f}",
+                      *map(str, formatted(candidates, labels, looped)))
+        if not np.array_equal(vectorised, looped):
+            console.print(f"[red]lambda={lambda_mult}: vectorised and loop MMR selections differ[/red]")
+    console.print(table)
+
+
+"""
+Usage:
+------
+python scripts/benchmark_mmr.py
+python scripts/benchmark_mmr.py --pool 500 --k 50 --dimension 768 --lambdas 0.3 0.5 0.7
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency and diversity of MMR result ranking")
+    parser.add_argument("--pool", type=int, default=500, help="Candidate pool size")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=60, help="Near-duplicate clusters in the pool")
+    parser.add_argument("--lambdas", type=float, nargs="+", default=[0.3, 0.5, 0.7])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--loop-repeats", type=int, default=3, help="Repeats of the slow Python-loop MMR")
+    args = parser.parse_args()
+
+    run(args.pool, args.k, args.dimension, args.clusters, args.lambdas, args.repeats, args.loop_repeats)
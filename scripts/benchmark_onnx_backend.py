@@ -0,0 +1,135 @@
+"""
+File: benchmark_onnx_backend.py
+Directory: scripts/benchmark_onnx_backend.py
+Created: 2026-10-19 10:00 UTC
+Version: 1.0.0
+
+Summary:
+--------
+Accuracy check and throughput benchmark for the EmbeddingService backends:
+PyTorch (baseline), ONNX Runtime fp32 and ONNX Runtime int8 (dynamic quantization).
+
+Purpose:
+--------
+- Report cosine agreement of each ONNX backend against the PyTorch baseline
+  (mean, minimum and 1st percentile over all texts)
+- Report encode throughput (texts/second) for each backend on CPU
+- Fail loudly (non-zero exit) when agreement drops below --min-cosine
+
+Dependencies:
+------------
+- sentence-transformers[onnx]
+- onnxruntime
+- numpy
+- rich (for formatted console output)
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "chatgfp"))
+
+from app.services.embeddings import EmbeddingService
+
+console = Console()
+
+SAMPLE_TEXTS = [
+    "What are the requirements for client money handling?",
+    "Explain the SMCR requirements for core firms",
+    "A firm must act honestly, fairly and professionally in accordance with the best interests of its client.",
+    "COBS 9.2 assessing suitability: the obligations",
+    "SYSC 24 allocation of prescribed responsibilities",
+    "How should firms handle customer complaints?",
+    "PS23/6 Consumer Duty implementation deadlines for closed products",
+    "The firm must segregate client money from its own money in accordance with CASS 7.",
+]
+
+
+def build_corpus(size: int) -> List[str]:
+    """Repeat and vary the sample texts to the requested corpus size"""
+    return [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} (chunk {i})" for i in range(size)]
+
+
+def throughput(service: EmbeddingService, texts: List[str], repeats: int) -> float:
+    """Best-of-N texts/second for encoding the whole corpus"""
+    service.encode(texts[:8])  # warm up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        service.encode(texts)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def cosine_agreement(baseline: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity between two embedding matrices"""
+    baseline = baseline / np.linalg.norm(baseline, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = np.einsum("ij,ij->i", baseline, candidate)
+    return {
+        "mean": float(cosines.mean()),
+        "min": float(cosines.min()),
+        "p1": float(np.percentile(cosines, 1)),
+    }
+
+
+def run(model_name: str, corpus_size: int, repeats: int, quantization_config: str, min_cosine: float) -> int:
+    texts = build_corpus(corpus_size)
+    backends = {
+        "torch": EmbeddingService(model_name, backend="torch"),
+        "onnx fp32": EmbeddingService(model_name, backend="onnx"),
+        "onnx int8": EmbeddingService(
+            model_name, backend="onnx", quantize=True, quantization_config=quantization_config
+        ),
+    }
+
+    baseline = backends["torch"].encode(texts)
+    table = Table(title=f"{model_name}: {corpus_size} texts, CPU")
+    table.add_column("Backend", style="cyan")
+    table.add_column("Texts/s", style="green")
+    table.add_column("Cosine mean", style="yellow")
+    table.add_column("Cosine min", style="yellow")
+    table.add_column("Cosine p1", style="yellow")
+
+    status = 0
+    for name, service in backends.items():
+        rate = throughput(service, texts, repeats)
+        agreement = cosine_agreement(baseline, service.encode(texts))
+        if agreement["min"] < min_cosine:
+            status = 1
+        table.add_row(
+            name, f"{rate:.1f}",
+            f"{agreement['mean']:.5f}", f"{agreement['min']:.5f}", f"{agreement['p1']:.5f}"
+        )
+
+    console.print(table)
+    if status:
+        console.print(f"[red]Cosine agreement below {min_cosine} for at least one backend[/red]")
+    return status
+
+
+"""
+Usage:
+------
+python scripts/benchmark_onnx_backend.py
+python scripts/benchmark_onnx_backend.py --model nlpaueb/legal-bert-base-uncased --quantization-config avx512_vnni
+
+The int8 export is cached under .onnx_cache/ and reused on later runs.
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ONNX Runtime embedding backends")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--corpus-size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--quantization-config", default="avx2")
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+    sys.exit(run(args.model, args.corpus_size, args.repeats, args.quantization_config, args.min_cosine))
@@ -24,6 +24,7 @@ Dependencies:
 - python-dotenv
 - asyncio
 - rich (for formatted console output)
+- sentence-transformers (query embeddings; EMBEDDING_MODEL, default all-MiniLM-L6-v2)
 """
 
 import os
@@ -33,6 +34,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List
 import json
+import numpy as np
+from sentence_transformers import SentenceTransformer
 from rich.console import Console
 from rich.table import Table
 from dotenv import load_dotenv
@@ -50,10 +53,23 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 console = Console()
 
+class QueryEmbedder:
+    """Minimal embedding service for QueryProcessor, loaded once per test run"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    async def get_single_embedding_array(self, text: str) -> np.ndarray:
+        """(1, dim) float32 embedding of text"""
+        embedding = await asyncio.to_thread(self.model.encode, [text], convert_to_numpy=True)
+        return embedding.astype(np.float32)
+
 class RAGSystemTester:
     def __init__(self):
         """Initialize the RAG system tester"""
         load_dotenv()
+        self.embedder = QueryEmbedder(os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
         self.test_queries = [
             "What are the requirements for client money handling?",
             "Explain the SMCR requirements for core firms",
@@ -107,12 +123,12 @@ class RAGSystemTester:
     async def test_query_processor(self) -> Dict:
         """Test query processing functionality"""
         with self.test_section("Query Processor"):
-            processor = QueryProcessor()
+            processor = QueryProcessor(self.embedder)
             results = []
             
             for query in self.test_queries:
                 try:
-                    embedding = processor.generate_embedding(query)
+                    embedding = await processor.generate_embedding(query)
                     results.append({
                         "query": query,
                         "embedding_shape": embedding.shape,
@@ -132,7 +148,7 @@ class RAGSystemTester:
     async def test_rag_service(self) -> Dict:
         """Test complete RAG service functionality"""
         with self.test_section("RAG Service"):
-            service = RAGService()
+            service = RAGService(self.embedder)
             results = []
             
             for query in self.test_queries:
@@ -168,6 +184,7 @@ class RAGSystemTester:
                     "PINECONE_API_KEY": bool(os.getenv("PINECONE_API_KEY")),
                     "PINECONE_ENVIRONMENT": bool(os.getenv("PINECONE_ENVIRONMENT")),
                     "PINECONE_INDEX_NAME": bool(os.getenv("PINECONE_INDEX_NAME")),
+                    "PINECONE_HOST": os.getenv("PINECONE_HOST"),
                     "PINECONE_REGION": bool(os.getenv("PINECONE_REGION"))
                 }
             },
@@ -242,6 +259,10 @@ Usage:
 ------
 python -m scripts.test_rag_system
 
+To run offline, start the local stand-in and point the client at it:
+python -m chatgfp.steps.step_3_embedding.local_pinecone --port 5080 --dimension 384
+PINECONE_HOST=http://localhost:5080 python -m scripts.test_rag_system
+
 Test results and diagnostics will be saved in the test_results directory.
 
 For questions or modifications, contact: [Your Contact Info]
@@ -1,19 +1,96 @@
 # app/main.py
 
+import os
 from fastapi import FastAPI, HTTPException, Depends
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.services.embeddings import EmbeddingService
+from app.services.query_cache import QueryEmbeddingCache
 from app.services.vector_store import VectorStore
+from app.services.sharded_store import ShardedVectorStore, SHARDS_FILE
+from app.services.namespaced_store import NamespacedVectorStore, NamespaceRouter, NAMESPACES_FILE
+from app.services.index_factory import IndexSpec
 from app.services.retriever import Retriever
+from app.services.result_cache import SemanticResultCache
 from app.models.document import Document
 from pydantic import BaseModel
 
 app = FastAPI(title="ChatGFP RAG API")
 
 # Initialize services
-embedding_service = EmbeddingService()
-vector_store = VectorStore(embedding_service)
-retriever = Retriever(vector_store)
+embedding_service = EmbeddingService(
+    backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+    quantize=os.getenv("EMBEDDING_QUANTIZE", "false").lower() == "true",
+    query_cache=QueryEmbeddingCache(int(os.getenv("QUERY_CACHE_BYTES", 32 * 1024 * 1024)))
+)
+vector_store_path = os.getenv("VECTOR_STORE_PATH")
+vector_shards = int(os.getenv("VECTOR_SHARDS", 1))
+vector_store_mmap = os.getenv("VECTOR_STORE_MMAP", "true").lower() == "true"
+vector_namespaces = os.getenv("VECTOR_NAMESPACES", "false").lower() == "true"
+# Switch a flat index to e.g. "ivf:nlist=1024" (or "ivf:nlist=1024,pq_m=48") once it grows
+vector_promotion = IndexSpec.parse(os.getenv("VECTOR_PROMOTE_INDEX")) if os.getenv("VECTOR_PROMOTE_INDEX") else None
+vector_promotion_threshold = int(os.getenv("VECTOR_PROMOTE_AT", 100_000))
+# Fixed shard of some handbook modules under module partitioning, e.g. "COBS=0,SYSC=1"
+vector_shard_modules = {
+    module.strip().upper(): int(shard)
+    for module, _, shard in (entry.partition("=") for entry in os.getenv("VECTOR_SHARD_MODULES", "").split(",") if entry)
+}
+if vector_shards > 1 and vector_store_path and os.path.exists(os.path.join(vector_store_path, SHARDS_FILE)):
+    vector_store = ShardedVectorStore.load(vector_store_path, embedding_service, mmap=vector_store_mmap)
+elif vector_shards > 1:
+    # Partition across worker processes; 'module' keeps each handbook module on one shard
+    vector_store = ShardedVectorStore(
+        embedding_service,
+        shards=vector_shards,
+        partition=os.getenv("VECTOR_SHARD_PARTITION", "hash"),
+        module_shards=vector_shard_modules,
+        projection=os.getenv("VECTOR_PROJECTION") or None,
+        projection_dim=int(os.getenv("VECTOR_PROJECTION_DIM")) if os.getenv("VECTOR_PROJECTION_DIM") else None,
+        index_spec=IndexSpec.parse(os.getenv("VECTOR_INDEX", "flat")),
+        promotion=vector_promotion,
+        promotion_threshold=vector_promotion_threshold
+    )
+elif vector_namespaces and vector_store_path and os.path.exists(os.path.join(vector_store_path, NAMESPACES_FILE)):
+    vector_store = NamespacedVectorStore.load(vector_store_path, embedding_service, mmap=vector_store_mmap)
+elif vector_namespaces:
+    # One index per handbook module; queries search only the modules they are routed to
+    vector_store = NamespacedVectorStore(
+        embedding_service,
+        index_spec=IndexSpec.parse(os.getenv("VECTOR_INDEX", "flat")),
+        promotion=vector_promotion,
+        promotion_threshold=vector_promotion_threshold,
+        router=NamespaceRouter(
+            max_namespaces=int(os.getenv("VECTOR_ROUTE_MAX_NAMESPACES", 2)),
+            margin=float(os.getenv("VECTOR_ROUTE_MARGIN", 0.05))
+        )
+    )
+elif vector_store_path and os.path.exists(os.path.join(vector_store_path, "meta.json")):
+    # Restart from a saved index; mmap keeps it read-only and shared across workers
+    vector_store = VectorStore.load(
+        vector_store_path,
+        embedding_service,
+        mmap=vector_store_mmap
+    )
+else:
+    vector_store = VectorStore(
+        embedding_service,
+        projection=os.getenv("VECTOR_PROJECTION") or None,
+        projection_dim=int(os.getenv("VECTOR_PROJECTION_DIM")) if os.getenv("VECTOR_PROJECTION_DIM") else None,
+        index_spec=IndexSpec.parse(os.getenv("VECTOR_INDEX", "flat")),
+        promotion=vector_promotion,
+        promotion_threshold=vector_promotion_threshold
+    )
+# Paraphrases of recent queries are answered from cache; RESULT_CACHE_BYTES=0 disables it
+result_cache_bytes = int(os.getenv("RESULT_CACHE_BYTES", 16 * 1024 * 1024))
+retriever = Retriever(
+    vector_store,
+    vector_weight=float(os.getenv("HYBRID_VECTOR_WEIGHT", 1.0)),
+    lexical_weight=float(os.getenv("HYBRID_LEXICAL_WEIGHT", 1.0)),
+    result_cache=SemanticResultCache(
+        result_cache_bytes,
+        similarity_threshold=float(os.getenv("RESULT_CACHE_SIMILARITY", 0.95)),
+        ttl_seconds=float(os.getenv("RESULT_CACHE_TTL", 300))
+    ) if result_cache_bytes > 0 else None
+)
 
 # Pydantic models for API
 class DocumentCreate(BaseModel):
@@ -22,29 +99,144 @@ class DocumentCreate(BaseModel):
     source: Optional[str] = None
     metadata: dict = {}
 
-class SearchQuery(BaseModel):
-    query: str
+class SearchOptions(BaseModel):
     limit: Optional[int] = 5
     threshold: Optional[float] = 0.0
+    ef_search: Optional[int] = None
+    nprobe: Optional[int] = None
+    # Candidates per hit re-ranked exactly (compressed indexes: sq8, pq, IVF-PQ)
+    rerank: Optional[int] = None
+    # Metadata filter, e.g. {"section": "SYSC 4"} or {"category": {"$in": ["rules", "guidance"]}}
+    filters: Optional[Dict[str, Any]] = None
+    # Fuse semantic and BM25 keyword rankings (helps exact references like "COBS 9.2")
+    hybrid: bool = False
+    # Threshold mode: every hit above threshold, up to max_results, instead of the top limit
+    max_results: Optional[int] = None
+
+    def search_params(self) -> Optional[dict]:
+        """Per-request index tuning parameters that were set"""
+        params = {
+            name: value
+            for name, value in (("ef_search", self.ef_search), ("nprobe", self.nprobe), ("rerank", self.rerank))
+            if value is not None
+        }
+        return params or None
+
+class SearchQuery(SearchOptions):
+    query: str
+
+class BatchSearchQuery(SearchOptions):
+    queries: List[str]
 
 @app.post("/documents/", response_model=Document)
 async def create_document(document: DocumentCreate):
     """Add a new document to the system"""
     doc = Document(**document.dict())
     # Here we would typically also save to database
-    await retriever.add_documents([doc])
+    try:
+        await retriever.add_documents([doc])
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return doc
+
+@app.put("/documents/{document_id}", response_model=Document)
+async def upsert_document(document_id: int, document: DocumentCreate):
+    """Insert or replace the document with the given id"""
+    doc = Document(id=document_id, **document.dict())
+    try:
+        await retriever.add_documents([doc])
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     return doc
 
+@app.delete("/documents/{document_id}")
+async def delete_document(document_id: int):
+    """Remove a document from the system"""
+    try:
+        deleted = await retriever.delete_documents([document_id])
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return {"deleted": document_id}
+
 @app.post("/search/")
 async def search_documents(query: SearchQuery):
     """Search through documents"""
-    results = await retriever.retrieve(
-        query.query,
-        k=query.limit,
-        score_threshold=query.threshold
-    )
+    try:
+        results = await retriever.retrieve(
+            query.query,
+            k=query.limit,
+            score_threshold=query.threshold,
+            search_params=query.search_params(),
+            filters=query.filters,
+            hybrid=query.hybrid,
+            max_results=query.max_results
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return results
+
+@app.post("/search/batch")
+async def search_documents_batch(query: BatchSearchQuery):
+    """Search for several queries with one batched embedding and index search"""
+    try:
+        results = await retriever.search_many(
+            query.queries,
+            k=query.limit,
+            score_threshold=query.threshold,
+            search_params=query.search_params(),
+            filters=query.filters,
+            hybrid=query.hybrid,
+            max_results=query.max_results
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return results
 
+@app.post("/index/save")
+async def save_index():
+    """Persist the vector store to VECTOR_STORE_PATH"""
+    if not vector_store_path:
+        raise HTTPException(status_code=400, detail="VECTOR_STORE_PATH is not configured")
+    try:
+        vector_store.save(vector_store_path)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "path": vector_store_path,
+        "documents": len(vector_store.documents),
+        "generation": vector_store.generation
+    }
+
+@app.get("/index/shards")
+async def shard_stats():
+    """Per-shard document counts and query latency (sharded stores only)"""
+    if not isinstance(vector_store, ShardedVectorStore):
+        raise HTTPException(status_code=400, detail="Vector store is not sharded")
+    return vector_store.stats()
+
+@app.get("/index/namespaces")
+async def namespace_stats():
+    """Per-namespace document counts and search latency, plus query routing counts (namespaced stores only)"""
+    if not isinstance(vector_store, NamespacedVectorStore):
+        raise HTTPException(status_code=400, detail="Vector store is not namespaced")
+    return vector_store.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit rates and occupancy of the query embedding and semantic result caches"""
+    return {
+        "query_embeddings": embedding_service.query_cache.stats() if embedding_service.query_cache else None,
+        "results": retriever.result_cache.stats() if retriever.result_cache else None
+    }
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop shard worker processes"""
+    if isinstance(vector_store, ShardedVectorStore):
+        vector_store.close()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,293 @@
+import sys
+import json
+import mmap
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from app.models.document import Document
+
+BLOB_FILE = "documents.blob"
+COLUMNS_FILE = "documents.npz"
+SOURCES_FILE = "sources.json"
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _timestamp(value: datetime) -> int:
+    return (value.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+
+def _datetime(value: int) -> datetime:
+    return _EPOCH + int(value) * _MICROSECOND
+
+class DocumentStore:
+    """
+    Columnar document storage indexed by VectorStore label
+
+    Per label, NumPy columns hold the Document.id, the blob offset and byte
+    lengths of title, content and metadata JSON, both timestamps and a
+    dictionary-encoded source. The text itself lives in an append-only blob
+    file read through mmap, so the Python heap only carries the columns and
+    the id -> label map. Document objects are built on access, which for
+    searches means only for the hits returned.
+
+    Rows are never rewritten: replacing or removing a document only moves or
+    drops its id -> label entry, so readers holding an older VectorStore
+    generation can still materialize the labels that generation references.
+    The price is that the blob only grows while the store is open: the text
+    of replaced and removed documents stays in it as dead_bytes. save()
+    writes a compacted blob and load() starts from it, so a process that
+    rewrites much of the corpus should save and reload to reclaim the space.
+
+    Behaves like a read-only mapping of Document.id to Document.
+    """
+
+    def __init__(self, blob_path: Optional[Union[str, Path]] = None, read_only: bool = False):
+        """
+        Args:
+            blob_path: Existing blob file to read; unless read_only, appends go
+                to a private copy so the file stays as saved. A private
+                temporary file is used when omitted
+            read_only: Read blob_path in place
+        """
+        self.read_only = read_only
+        if blob_path is None or not read_only:
+            self._file = tempfile.TemporaryFile()
+            if blob_path is not None:
+                with open(blob_path, "rb") as saved:
+                    shutil.copyfileobj(saved, self._file, length=1024 * 1024)
+        else:
+            self._file = open(blob_path, "rb")
+        self._file.seek(0, 2)
+        self._blob_size = self._file.tell()
+        self._map: Optional[mmap.mmap] = None
+
+        self._ids = np.full(0, -1, dtype=np.int64)            # label -> Document.id, -1 when unused
+        self._offsets = np.zeros(0, dtype=np.int64)
+        self._lengths = np.zeros((0, 3), dtype=np.int32)      # title, content, metadata bytes
+        self._timestamps = np.zeros((0, 2), dtype=np.int64)   # created_at, updated_at (us since epoch)
+        self._sources = np.zeros(0, dtype=np.int32)           # code into _source_values
+        self._source_values: List[Optional[str]] = [None]
+        self._source_codes: Dict[Optional[str], int] = {None: 0}
+        self._labels: Dict[int, int] = {}                     # live Document.id -> label
+        self._live_bytes = 0                                  # blob bytes of live documents
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __contains__(self, document_id: int) -> bool:
+        return document_id in self._labels
+
+    def __getitem__(self, document_id: int) -> Document:
+        return self.get(self._labels[document_id])
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._labels)
+
+    def values(self) -> Iterator[Document]:
+        for label in self._labels.values():
+            yield self.get(label)
+
+    def label(self, document_id: int) -> Optional[int]:
+        """Live label of a document, or None"""
+        return self._labels.get(document_id)
+
+    def document_id(self, label: int) -> Optional[int]:
+        """Document.id stored under label (live or not), or None for unused labels"""
+        if not 0 <= label < len(self._ids):
+            return None
+        document_id = int(self._ids[label])
+        return None if document_id < 0 else document_id
+
+    @property
+    def dead_bytes(self) -> int:
+        """Blob bytes of replaced, removed and never activated rows, reclaimed by save() and load()"""
+        return self._blob_size - self._live_bytes
+
+    def _row_bytes(self, labels: List[int]) -> int:
+        return int(self._lengths[np.asarray(labels, dtype=np.int64)].sum())
+
+    def live_labels(self) -> np.ndarray:
+        """Labels of all live documents, ascending"""
+        return np.sort(np.fromiter(self._labels.values(), dtype=np.int64, count=len(self._labels)))
+
+    def _reserve(self, max_label: int) -> None:
+        if max_label < len(self._ids):
+            return
+        size = max(max_label + 1, 2 * len(self._ids), 1024)
+        grow = size - len(self._ids)
+        self._ids = np.concatenate([self._ids, np.full(grow, -1, dtype=np.int64)])
+        self._offsets = np.concatenate([self._offsets, np.zeros(grow, dtype=np.int64)])
+        self._lengths = np.concatenate([self._lengths, np.zeros((grow, 3), dtype=np.int32)])
+        self._timestamps = np.concatenate([self._timestamps, np.zeros((grow, 2), dtype=np.int64)])
+        self._sources = np.concatenate([self._sources, np.zeros(grow, dtype=np.int32)])
+
+    def _source_code(self, source: Optional[str]) -> int:
+        code = self._source_codes.get(source)
+        if code is None:
+            code = self._source_codes[source] = len(self._source_values)
+            self._source_values.append(source)
+        return code
+
+    def add(self, labels: List[int], documents: List[Document]) -> None:
+        """
+        Store documents under new labels
+
+        The rows are readable by label right away, but the documents are not
+        looked up by id until activate() is called for their labels.
+        """
+        if self.read_only:
+            raise RuntimeError("Document store is read-only")
+        if not labels:
+            return
+        self._reserve(max(labels))
+
+        chunks, lengths, timestamps, sources = [], [], [], []
+        for doc in documents:
+            fields = (
+                doc.title.encode("utf-8"),
+                doc.content.encode("utf-8"),
+                json.dumps(doc.metadata or {}).encode("utf-8"),
+            )
+            chunks.extend(fields)
+            lengths.append([len(field) for field in fields])
+            timestamps.append([_timestamp(doc.created_at), _timestamp(doc.updated_at)])
+            sources.append(self._source_code(doc.source))
+
+        rows = np.asarray(labels, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int32)
+        sizes = lengths.sum(axis=1, dtype=np.int64)
+        self._offsets[rows] = self._blob_size + np.cumsum(sizes) - sizes
+        self._lengths[rows] = lengths
+        self._timestamps[rows] = timestamps
+        self._sources[rows] = sources
+        self._ids[rows] = [doc.id for doc in documents]
+
+        self._file.seek(self._blob_size)
+        self._file.write(b"".join(chunks))
+        self._file.flush()
+        self._blob_size += int(sizes.sum())
+
+    def activate(self, labels: List[int]) -> None:
+        """
+        Make the documents stored under labels live
+
+        A document id that is already live is re-pointed to its new label;
+        the old row stays readable.
+        """
+        ids = self._ids[np.asarray(labels, dtype=np.int64)].tolist()
+        replaced = [self._labels[doc_id] for doc_id in ids if doc_id in self._labels]
+        self._labels.update(zip(ids, labels))
+        self._live_bytes += self._row_bytes(labels) - self._row_bytes(replaced)
+
+    def remove(self, document_id: int) -> int:
+        """Drop a live document; returns the label it was stored under"""
+        label = self._labels.pop(document_id)
+        self._live_bytes -= self._row_bytes([label])
+        return label
+
+    def _blob(self) -> mmap.mmap:
+        """Map of the blob, remapped when appends have outgrown it"""
+        current = self._map
+        if current is None or len(current) < self._blob_size:
+            current = self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return current
+
+    def _fields(self, label: int) -> Tuple[bytes, bytes, bytes]:
+        start = int(self._offsets[label])
+        title, content, metadata = (int(length) for length in self._lengths[label])
+        blob = self._blob()
+        return (
+            blob[start:start + title],
+            blob[start + title:start + title + content],
+            blob[start + title + content:start + title + content + metadata],
+        )
+
+    def content(self, label: int) -> str:
+        """Content of the document under label, without building a Document"""
+        return self._fields(label)[1].decode("utf-8")
+
+    def get(self, label: int) -> Document:
+        """Materialize the Document stored under label"""
+        title, content, metadata = self._fields(label)
+        created_at, updated_at = self._timestamps[label]
+        return Document(
+            id=int(self._ids[label]),
+            title=title.decode("utf-8"),
+            content=content.decode("utf-8"),
+            source=self._source_values[self._sources[label]],
+            metadata=json.loads(metadata),
+            created_at=_datetime(created_at),
+            updated_at=_datetime(updated_at),
+        )
+
+    def items(self) -> Iterator[Tuple[int, Document]]:
+        """(label, Document) for every live document, in label order"""
+        for label in self.live_labels().tolist():
+            yield label, self.get(label)
+
+    def memory_bytes(self) -> int:
+        """Approximate heap held by the columns and id map (the blob is on disk)"""
+        columns = self._ids, self._offsets, self._lengths, self._timestamps, self._sources
+        # Each dict entry also owns two int objects
+        id_map = sys.getsizeof(self._labels) + 2 * 28 * len(self._labels)
+        sources = sum(sys.getsizeof(value) for value in self._source_values) + sys.getsizeof(self._source_codes)
+        return sum(column.nbytes for column in columns) + id_map + sources
+
+    def save(self, directory: Path, labels: Optional[np.ndarray] = None, suffix: str = "") -> List[str]:
+        """
+        Write documents to directory, compacting the blob
+
+        Args:
+            directory: Target directory
+            labels: Labels to write (default: all live documents)
+            suffix: Appended to every file name (e.g. '.tmp') so the caller
+                can rename them into place
+
+        Returns the base file names written.
+        """
+        labels = self.live_labels() if labels is None else np.sort(labels)
+        blob = self._blob() if self._blob_size else b""
+        offsets = np.zeros(len(labels), dtype=np.int64)
+        with open(directory / f"{BLOB_FILE}{suffix}", "wb") as f:
+            position = 0
+            for row, label in enumerate(labels.tolist()):
+                start, size = int(self._offsets[label]), int(self._lengths[label].sum())
+                f.write(blob[start:start + size])
+                offsets[row] = position
+                position += size
+        with open(directory / f"{COLUMNS_FILE}{suffix}", "wb") as f:
+            np.savez(
+                f,
+                labels=labels,
+                ids=self._ids[labels],
+                offsets=offsets,
+                lengths=self._lengths[labels],
+                timestamps=self._timestamps[labels],
+                sources=self._sources[labels],
+            )
+        with open(directory / f"{SOURCES_FILE}{suffix}", "w", encoding="utf-8") as f:
+            json.dump(self._source_values, f)
+        return [BLOB_FILE, COLUMNS_FILE, SOURCES_FILE]
+
+    @classmethod
+    def load(cls, directory: Path, read_only: bool = True) -> "DocumentStore":
+        """Open a store written by save(); a read-only blob is memory-mapped in place, otherwise copied"""
+        store = cls(directory / BLOB_FILE, read_only=read_only)
+        columns = np.load(directory / COLUMNS_FILE)
+        labels = columns["labels"]
+        if len(labels):
+            store._reserve(int(labels.max()))
+        store._ids[labels] = columns["ids"]
+        store._offsets[labels] = columns["offsets"]
+        store._lengths[labels] = columns["lengths"]
+        store._timestamps[labels] = columns["timestamps"]
+        store._sources[labels] = columns["sources"]
+        with open(directory / SOURCES_FILE, encoding="utf-8") as f:
+            store._source_values = json.load(f)
+        store._source_codes = {value: code for code, value in enumerate(store._source_values)}
+        store._labels = dict(zip(columns["ids"].tolist(), labels.tolist()))
+        store._live_bytes = store._row_bytes(list(store._labels.values()))
+        return store
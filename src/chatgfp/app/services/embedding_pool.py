@@ -0,0 +1,150 @@
+import os
+import time
+import logging
+import itertools
+import multiprocessing as mp
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, populated once by _init_worker in each child process
+_worker_service = None
+
+@dataclass
+class PoolProgress:
+    """Progress snapshot reported after each completed shard"""
+    completed: int
+    total: int
+    tokens: int
+    elapsed: float
+
+    @property
+    def texts_per_second(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed else 0.0
+
+def _init_worker(model_name: str, backend: str, quantize: bool, threads_per_worker: int) -> None:
+    """Load the model once per worker process"""
+    global _worker_service
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    from app.services.embeddings import EmbeddingService
+    _worker_service = EmbeddingService(model_name, backend=backend, quantize=quantize)
+
+def _worker_dimension() -> int:
+    return _worker_service.model.get_sentence_embedding_dimension()
+
+def _embed_shard(task: Tuple[str, int, int, List[str]]) -> Tuple[int, int, int]:
+    """Embed one shard and write it straight into the shared output file"""
+    output_path, dimension, start, texts = task
+    embeddings, stats = _worker_service.encode_bucketed(texts)
+    # Map only this shard's rows, and only for this write: every embed_to_memmap
+    # call recreates the file, so a mapping kept between calls could be stale
+    output = np.memmap(
+        output_path, dtype=np.float32, mode='r+',
+        offset=start * dimension * np.dtype(np.float32).itemsize, shape=(len(texts), dimension)
+    )
+    output[:] = embeddings
+    output.flush()
+    del output
+    return start, len(texts), stats.tokens
+
+class EmbeddingPool:
+    """
+    Bulk-ingestion embedding across a pool of worker processes
+
+    Each worker loads its own copy of the model once. The input stream is cut
+    into shards that are embedded in parallel and written back in input order
+    into a memory-mapped float32 output file, so results never travel through
+    pickled queues.
+    """
+
+    def __init__(
+        self,
+        model_name: str = 'all-MiniLM-L6-v2',
+        backend: str = 'torch',
+        quantize: bool = False,
+        processes: Optional[int] = None,
+        shard_size: int = 1024,
+        threads_per_worker: int = 1
+    ):
+        self.model_name = model_name
+        self.processes = processes or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self._pool = mp.get_context('spawn').Pool(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(model_name, backend, quantize, threads_per_worker)
+        )
+        self.dimension: int = self._pool.apply(_worker_dimension)
+
+    def _shards(self, texts: Iterable[str], output_path: str) -> Iterator[Tuple[str, int, int, List[str]]]:
+        iterator = iter(texts)
+        start = 0
+        while True:
+            shard = list(itertools.islice(iterator, self.shard_size))
+            if not shard:
+                return
+            yield output_path, self.dimension, start, shard
+            start += len(shard)
+
+    def embed_to_memmap(
+        self,
+        texts: Iterable[str],
+        output_path: str,
+        total: Optional[int] = None,
+        progress_callback: Optional[Callable[[PoolProgress], None]] = None
+    ) -> np.memmap:
+        """
+        Embed a stream of texts into a memory-mapped (total, dim) float32 file
+
+        Args:
+            texts: Texts to embed; any iterable, consumed lazily shard by shard
+            output_path: File backing the output array (created or overwritten)
+            total: Number of texts; required when texts has no len()
+            progress_callback: Called with a PoolProgress after each shard completes
+        """
+        if total is None:
+            total = len(texts)  # type: ignore[arg-type]
+
+        output = np.memmap(output_path, dtype=np.float32, mode='w+', shape=(total, self.dimension))
+        output.flush()
+
+        started = time.perf_counter()
+        completed = 0
+        tokens = 0
+        for _, count, shard_tokens in self._pool.imap_unordered(_embed_shard, self._shards(texts, output_path)):
+            completed += count
+            tokens += shard_tokens
+            progress = PoolProgress(completed, total, tokens, time.perf_counter() - started)
+            if progress_callback:
+                progress_callback(progress)
+
+        if completed != total:
+            raise ValueError(f"Expected {total} texts but the input stream yielded {completed}")
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Embedded {completed} texts with {self.processes} workers in {elapsed:.1f}s "
+            f"({completed / elapsed if elapsed else 0.0:.1f} texts/s)"
+        )
+        return np.memmap(output_path, dtype=np.float32, mode='r', shape=(total, self.dimension))
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self) -> 'EmbeddingPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,17 +1,218 @@
-from typing import List
+import logging
+import importlib.util
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
 from sentence_transformers import SentenceTransformer
+from app.services.model_registry import model_registry
+from app.services.query_cache import QueryEmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'onnx')
+
+# Loaded by sentence-transformers for the onnx backend (sentence-transformers[onnx])
+ONNX_PACKAGES = ('onnxruntime', 'optimum')
+
+# Inputs at least this large go through length-bucketed batching
+BULK_THRESHOLD = 256
+
+@dataclass
+class BatchingStats:
+    """Token accounting for one bulk embedding call"""
+    texts: int
+    batches: int
+    tokens: int
+    padding_tokens: int
+    unbucketed_padding_tokens: int
+
+    @property
+    def padding_saved(self) -> int:
+        """Padding tokens avoided compared to fixed-size batches in input order"""
+        return self.unbucketed_padding_tokens - self.padding_tokens
 
 class EmbeddingService:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str = 'all-MiniLM-L6-v2',
+        backend: str = 'torch',
+        quantize: bool = False,
+        quantization_config: str = 'avx2',
+        onnx_cache_dir: Optional[str] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None
+    ):
+        """
+        Args:
+            model_name: SentenceTransformer model name or path
+            backend: 'torch' (PyTorch) or 'onnx' (ONNX Runtime, CPU)
+            quantize: Use an int8 dynamically quantized ONNX export (onnx backend only)
+            quantization_config: ONNX Runtime target ('arm64', 'avx2', 'avx512', 'avx512_vnni')
+            onnx_cache_dir: Where quantized exports are written and reused between runs
+            query_cache: Optional cache consulted by the single-query methods
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+        if quantize and backend != 'onnx':
+            raise ValueError("Quantization is only supported with the 'onnx' backend")
+        if backend == 'onnx':
+            # The model loads lazily, so check now rather than fail on first use
+            missing = [package for package in ONNX_PACKAGES if importlib.util.find_spec(package) is None]
+            if missing:
+                raise ImportError(
+                    f"The 'onnx' backend needs {', '.join(missing)}: install sentence-transformers[onnx]"
+                )
+
         self.model_name = model_name
+        self.backend = backend
+        self.quantize = quantize
+        self.query_cache = query_cache
+
+        # Weights are shared process-wide: services with the same configuration
+        # get the same handle, and idle models are evicted and reloaded on demand
+        self._handle = model_registry.handle(
+            (model_name, backend, quantize, quantization_config if quantize else None),
+            partial(
+                self._load_model, model_name, backend, quantize,
+                quantization_config, Path(onnx_cache_dir or '.onnx_cache')
+            )
+        )
+
+    @property
+    def model(self) -> SentenceTransformer:
+        return self._handle.model
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self._handle.dimension
+
+    @staticmethod
+    def _load_model(
+        model_name: str,
+        backend: str,
+        quantize: bool,
+        quantization_config: str,
+        cache_dir: Path
+    ) -> SentenceTransformer:
+        if backend == 'onnx' and quantize:
+            return EmbeddingService._load_quantized_onnx(model_name, quantization_config, cache_dir)
+        return SentenceTransformer(model_name, backend=backend)
+
+    @staticmethod
+    def _load_quantized_onnx(model_name: str, quantization_config: str, cache_dir: Path) -> SentenceTransformer:
+        """Export (once) and load an int8 dynamically quantized ONNX model"""
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        export_dir = cache_dir / model_name.replace('/', '__')
+        file_name = f"onnx/model_qint8_{quantization_config}.onnx"
+        if not (export_dir / file_name).exists():
+            model = SentenceTransformer(model_name, backend='onnx')
+            model.save_pretrained(str(export_dir))
+            export_dynamic_quantized_onnx_model(model, quantization_config, str(export_dir))
+        return SentenceTransformer(str(export_dir), backend='onnx', model_kwargs={'file_name': file_name})
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into a C-contiguous float32 matrix of shape (n, dim)"""
+        embeddings = self.model.encode(texts, convert_to_numpy=True, convert_to_tensor=False)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def token_lengths(self, texts: List[str]) -> np.ndarray:
+        """Tokenized length of each text, truncated to the model's max_seq_length"""
+        encoded = self.model.tokenizer(
+            texts, add_special_tokens=True, truncation=True, max_length=self.model.max_seq_length
+        )
+        return np.fromiter((len(ids) for ids in encoded['input_ids']), dtype=np.int64, count=len(texts))
+
+    def encode_bucketed(
+        self,
+        texts: List[str],
+        max_tokens_per_batch: int = 16384,
+        max_batch_size: int = 256,
+        baseline_batch_size: int = 32
+    ) -> Tuple[np.ndarray, BatchingStats]:
+        """
+        Encode texts in length-homogeneous batches and return them in input order
+
+        Inputs are sorted by tokenized length and grouped so that each batch's
+        padded size (batch size x longest member) stays within max_tokens_per_batch.
+
+        Args:
+            texts: Texts to embed
+            max_tokens_per_batch: Token budget per batch, padding included
+            max_batch_size: Hard cap on texts per batch
+            baseline_batch_size: Batch size used to estimate padding without bucketing
+        """
+        lengths = self.token_lengths(texts)
+        order = np.argsort(lengths, kind='stable')
+
+        # Greedily form batches over the sorted lengths; the last member is the longest
+        batches: List[np.ndarray] = []
+        start = 0
+        for end in range(1, len(order) + 1):
+            size = end - start
+            if end < len(order):
+                next_cost = (size + 1) * lengths[order[end]]
+                if next_cost <= max_tokens_per_batch and size < max_batch_size:
+                    continue
+            batches.append(order[start:end])
+            start = end
+
+        output: Optional[np.ndarray] = None
+        padding_tokens = 0
+        for batch in batches:
+            batch_lengths = lengths[batch]
+            padding_tokens += int(batch_lengths.max() * len(batch) - batch_lengths.sum())
+            embeddings = self.model.encode(
+                [texts[i] for i in batch], batch_size=len(batch),
+                convert_to_numpy=True, convert_to_tensor=False
+            )
+            if output is None:
+                output = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+            output[batch] = embeddings
+
+        unbucketed_padding = 0
+        for offset in range(0, len(texts), baseline_batch_size):
+            chunk = lengths[offset:offset + baseline_batch_size]
+            unbucketed_padding += int(chunk.max() * len(chunk) - chunk.sum())
+
+        stats = BatchingStats(
+            texts=len(texts),
+            batches=len(batches),
+            tokens=int(lengths.sum()),
+            padding_tokens=padding_tokens,
+            unbucketed_padding_tokens=unbucketed_padding
+        )
+        if output is None:
+            output = np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return output, stats
+
+    async def get_embeddings_array(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for a list of texts as a float32 matrix"""
+        if len(texts) < BULK_THRESHOLD:
+            return self.encode(texts)
+
+        embeddings, stats = self.encode_bucketed(texts)
+        logger.info(
+            f"Embedded {stats.texts} texts in {stats.batches} batches: "
+            f"{stats.tokens} tokens, {stats.padding_tokens} padding "
+            f"(vs {stats.unbucketed_padding_tokens} unbucketed)"
+        )
+        return embeddings
+
+    async def get_single_embedding_array(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text as a (1, dim) float32 matrix"""
+        if self.query_cache is None:
+            return self.encode([text])
+        return await self.query_cache.get_or_compute(text, self._encode_query)
+
+    async def _encode_query(self, text: str) -> np.ndarray:
+        return self.encode([text])
 
     async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of texts"""
-        embeddings = self.model.encode(texts, convert_to_tensor=False)
-        return embeddings.tolist()
+        return self.encode(texts).tolist()
 
     async def get_single_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
-        embedding = self.model.encode([text], convert_to_tensor=False)[0]
-        return embedding.tolist()
+        return (await self.get_single_embedding_array(text))[0].tolist()
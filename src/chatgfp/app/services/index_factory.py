@@ -0,0 +1,182 @@
+import logging
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Optional
+import faiss
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ('flat', 'hnsw', 'ivf', 'sq8', 'pq')
+
+# FAISS warns below ~39 training points per IVF list (or PQ centroid)
+MIN_POINTS_PER_LIST = 39
+
+# Centroids per product-quantizer sub-space with 8-bit codes
+PQ_CENTROIDS = 256
+
+# Vectors sampled to fit the per-dimension ranges of a scalar quantizer
+SQ_TRAINING_SIZE = 1000
+
+@dataclass
+class IndexSpec:
+    """
+    Description of the FAISS index VectorStore builds
+
+    kind:
+        'flat' - exact brute-force search (IndexFlatL2)
+        'hnsw' - graph index; m is the graph degree, ef_search the search beam
+        'ivf'  - inverted lists; nlist clusters trained on the data, nprobe probed per query.
+                 With pq_m > 0 vectors are product-quantized to pq_m bytes (IVF-PQ)
+        'sq8'  - exhaustive search over 8-bit scalar-quantized vectors (1 byte per dimension)
+        'pq'   - exhaustive search over product-quantized vectors (pq_m bytes per vector)
+
+    Compressed kinds (sq8, pq, IVF-PQ) fetch rerank candidates per requested
+    hit, which VectorStore re-ranks with exact distances; rerank=0 returns the
+    approximate ranking as is.
+    """
+    kind: str = 'flat'
+    m: int = 32
+    ef_construction: int = 40
+    ef_search: int = 16
+    nlist: int = 1024
+    nprobe: int = 8
+    pq_m: int = 0
+    rerank: int = 4
+
+    def __post_init__(self):
+        if self.kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind '{self.kind}', expected one of {INDEX_KINDS}")
+        if self.kind == 'pq' and not self.pq_m:
+            raise ValueError("A 'pq' index needs pq_m, the number of bytes per vector")
+
+    @classmethod
+    def parse(cls, spec: str) -> 'IndexSpec':
+        """Parse 'kind[:key=value,...]', e.g. 'hnsw:m=32,ef_search=64' or 'ivf:nlist=256'"""
+        kind, _, options = spec.partition(':')
+        known = {f.name for f in fields(cls)}
+        values: Dict[str, Any] = {}
+        for option in filter(None, options.split(',')):
+            key, _, value = option.partition('=')
+            key = key.strip()
+            if key not in known or key == 'kind':
+                raise ValueError(f"Unknown index option '{key}' in '{spec}'")
+            values[key] = int(value)
+        return cls(kind=kind.strip(), **values)
+
+    @property
+    def needs_training(self) -> bool:
+        return self.kind in ('ivf', 'sq8', 'pq')
+
+    @property
+    def training_size(self) -> int:
+        """Vectors to train on before the index is built; 0 for kinds that need no training"""
+        needed = 0
+        if self.kind == 'ivf':
+            needed = self.nlist * MIN_POINTS_PER_LIST
+        if self.kind == 'sq8':
+            needed = SQ_TRAINING_SIZE
+        if self.kind == 'pq' or (self.kind == 'ivf' and self.pq_m):
+            # PQ codebooks need at least PQ_CENTROIDS points and FAISS warns below 39 per centroid
+            needed = max(needed, PQ_CENTROIDS * MIN_POINTS_PER_LIST)
+        return needed
+
+    @property
+    def compressed(self) -> bool:
+        """Whether the index stores lossy codes instead of the vectors"""
+        return self.kind in ('sq8', 'pq') or (self.kind == 'ivf' and self.pq_m > 0)
+
+    def build(self, dimension: int, training_size: Optional[int] = None) -> faiss.Index:
+        """
+        Create an empty index
+
+        Args:
+            dimension: Vector dimension the index stores
+            training_size: Number of training vectors available; IVF shrinks
+                nlist when there are too few to train the requested number of lists
+        """
+        if self.kind == 'hnsw':
+            index = faiss.IndexHNSWFlat(dimension, self.m)
+            index.hnsw.efConstruction = self.ef_construction
+            index.hnsw.efSearch = self.ef_search
+            return index
+
+        if self.kind == 'sq8':
+            return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit)
+
+        if self.kind == 'pq':
+            if dimension % self.pq_m:
+                raise ValueError(f"pq_m={self.pq_m} does not divide the dimension {dimension}")
+            # A single-list IVF-PQ rather than IndexPQ, which does not support ID selectors
+            index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, 1, self.pq_m, 8)
+            index.nprobe = 1
+            return index
+
+        if self.kind == 'ivf':
+            nlist = self.nlist
+            if training_size is not None and training_size < nlist * MIN_POINTS_PER_LIST:
+                nlist = max(1, training_size // MIN_POINTS_PER_LIST)
+                logger.warning(
+                    f"Only {training_size} training vectors for IVF; using nlist={nlist} instead of {self.nlist}"
+                )
+            if self.pq_m:
+                if dimension % self.pq_m:
+                    raise ValueError(f"pq_m={self.pq_m} does not divide the dimension {dimension}")
+                index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist, self.pq_m, 8)
+            else:
+                index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist)
+            index.nprobe = min(self.nprobe, nlist)
+            return index
+
+        return faiss.IndexFlatL2(dimension)
+
+    def empty_like(self, index: faiss.Index) -> faiss.Index:
+        """
+        Create an empty index with the same trained state as index
+
+        Used when rebuilding: IVF keeps its trained coarse quantizer (and IVF-PQ
+        its codebooks, SQ8 its ranges), so the rebuild needs no retraining.
+        """
+        index = faiss.downcast_index(index)
+        if isinstance(index, faiss.IndexIVFPQ):
+            rebuilt = faiss.IndexIVFPQ(
+                faiss.clone_index(index.quantizer), index.d, index.nlist, index.pq.M, index.pq.nbits
+            )
+            rebuilt.pq = index.pq
+            rebuilt.is_trained = True
+            rebuilt.precompute_table()
+            rebuilt.nprobe = index.nprobe
+            return rebuilt
+        if isinstance(index, faiss.IndexScalarQuantizer):
+            rebuilt = faiss.IndexScalarQuantizer(index.d, index.sq.qtype)
+            rebuilt.sq = index.sq
+            rebuilt.is_trained = True
+            return rebuilt
+        if isinstance(index, faiss.IndexIVF):
+            rebuilt = faiss.IndexIVFFlat(faiss.clone_index(index.quantizer), index.d, index.nlist)
+            rebuilt.nprobe = index.nprobe
+            return rebuilt
+        return self.build(index.d)
+
+    def search_parameters(self, overrides: Optional[Dict[str, int]] = None) -> faiss.SearchParameters:
+        """
+        Search parameters for one request, starting from the spec's defaults
+
+        The caller may attach an ID selector (params.sel) and must keep the
+        parameters and selector referenced while the search runs, since FAISS
+        only holds raw pointers. Non-applicable overrides raise ValueError.
+        """
+        overrides = overrides or {}
+        allowed = {'hnsw': {'ef_search'}, 'ivf': {'nprobe'}, 'flat': set(), 'sq8': set(), 'pq': set()}[self.kind]
+        if self.compressed:
+            allowed = allowed | {'rerank'}
+        unknown = set(overrides) - allowed
+        if unknown:
+            raise ValueError(f"Search parameters {sorted(unknown)} do not apply to a '{self.kind}' index")
+
+        tuned = replace(self, **overrides)
+        if self.kind == 'hnsw':
+            return faiss.SearchParametersHNSW(efSearch=tuned.ef_search)
+        if self.kind == 'ivf':
+            return faiss.SearchParametersIVF(nprobe=tuned.nprobe)
+        if self.kind == 'pq':
+            return faiss.SearchParametersIVF(nprobe=1)
+        return faiss.SearchParameters()
@@ -0,0 +1,166 @@
+import re
+import math
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Words, numbers and dotted/slashed identifiers such as 9.2.1r or ps23/6
+_TOKEN = re.compile(r'[a-z0-9]+(?:[./-][a-z0-9]+)*')
+# Handbook module prefixes (COBS, SYSC, ...) joined to a following reference
+_MODULE = re.compile(r'[a-z]{2,6}')
+
+def tokenize(text: str, expand: bool = False) -> List[str]:
+    """
+    Split text into BM25 terms
+
+    A short alphabetic token followed by a numeric one also yields the pair
+    ("cobs 9.2"), so regulatory references match as a unit. With expand=True
+    (used for documents, not queries) a dotted reference also yields its
+    parents, so "COBS 9.2.1R" is found by a query for "COBS 9.2".
+    """
+    words = _TOKEN.findall(text.casefold())
+    terms = list(words)
+    for module, reference in zip(words, words[1:]):
+        if not (_MODULE.fullmatch(module) and reference[0].isdigit()):
+            continue
+        terms.append(f"{module} {reference}")
+        if expand:
+            parts = reference.split('.')
+            terms.extend(f"{module} {'.'.join(parts[:i])}" for i in range(1, len(parts)))
+            stripped = reference.rstrip('abcdefghijklmnopqrstuvwxyz')
+            if stripped != reference:
+                terms.append(f"{module} {stripped}")
+    return terms
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index keyed by VectorStore labels
+
+    Postings are compact typed arrays (int32 labels, uint16 term frequencies)
+    appended to incrementally. Removing a label only marks it dead; postings
+    of dead labels are dropped in bulk once they outnumber the live ones.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._vocabulary: Dict[str, int] = {}
+        self._postings: List[Tuple[array, array]] = []   # term id -> (labels, term frequencies)
+        self._lengths = np.zeros(0, dtype=np.float32)     # label -> document length in terms
+        self._alive = np.zeros(0, dtype=bool)
+        self._term_counts: Dict[int, int] = {}            # live label -> number of distinct terms
+        self.total_length = 0
+        self.live_postings = 0
+        self.dead_postings = 0
+
+    def __len__(self) -> int:
+        return len(self._term_counts)
+
+    def _reserve(self, max_label: int) -> None:
+        if max_label < len(self._alive):
+            return
+        size = max(max_label + 1, 2 * len(self._alive), 1024)
+        self._lengths = np.concatenate([self._lengths, np.zeros(size - len(self._lengths), dtype=np.float32)])
+        self._alive = np.concatenate([self._alive, np.zeros(size - len(self._alive), dtype=bool)])
+
+    def add(self, labels: Iterable[int], texts: Iterable[str]) -> None:
+        """Index texts under the matching labels (labels must be new)"""
+        for label, text in zip(labels, texts):
+            terms = Counter(tokenize(text, expand=True))
+            self._reserve(label)
+            for term, frequency in terms.items():
+                term_id = self._vocabulary.get(term)
+                if term_id is None:
+                    term_id = self._vocabulary[term] = len(self._postings)
+                    self._postings.append((array('i'), array('H')))
+                term_labels, frequencies = self._postings[term_id]
+                term_labels.append(label)
+                frequencies.append(min(frequency, 0xFFFF))
+            length = sum(terms.values())
+            self._lengths[label] = length
+            self._alive[label] = True
+            self._term_counts[label] = len(terms)
+            self.total_length += length
+            self.live_postings += len(terms)
+
+    def remove(self, labels: Iterable[int]) -> None:
+        """Mark labels dead; their postings are dropped at the next compaction"""
+        for label in labels:
+            term_count = self._term_counts.pop(label, None)
+            if term_count is None:
+                continue
+            self._alive[label] = False
+            self.total_length -= int(self._lengths[label])
+            self.live_postings -= term_count
+            self.dead_postings += term_count
+        if self.dead_postings > max(self.live_postings, 1024):
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite every postings list without dead labels"""
+        for term_labels, frequencies in self._postings:
+            labels = np.frombuffer(term_labels, dtype=np.int32)
+            keep = self._alive[labels]
+            if keep.all():
+                continue
+            kept_labels = array('i', labels[keep].tobytes())
+            kept_frequencies = array('H', np.frombuffer(frequencies, dtype=np.uint16)[keep].tobytes())
+            del labels
+            term_labels[:] = kept_labels
+            frequencies[:] = kept_frequencies
+        self.dead_postings = 0
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k (label, BM25 score) pairs for query, best first
+
+        Args:
+            query: Query text
+            k: Number of labels to return
+            allowed: Optional packed little-endian label bitmap (as built by
+                MetadataIndex); labels outside it are skipped
+        """
+        documents = len(self._term_counts)
+        if not documents:
+            return []
+        average_length = self.total_length / documents
+
+        candidate_labels, candidate_scores = [], []
+        for term in set(tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            term_labels, frequencies = self._postings[term_id]
+            labels = np.frombuffer(term_labels, dtype=np.int32)
+            keep = self._alive[labels]
+            labels = labels[keep].astype(np.int64)
+            if not len(labels):
+                continue
+            frequency = np.frombuffer(frequencies, dtype=np.uint16)[keep].astype(np.float32)
+
+            idf = math.log(1 + (documents - len(labels) + 0.5) / (len(labels) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[labels] / average_length)
+            candidate_labels.append(labels)
+            candidate_scores.append(idf * frequency * (self.k1 + 1) / (frequency + norm))
+
+        if not candidate_labels:
+            return []
+        labels, positions = np.unique(np.concatenate(candidate_labels), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(candidate_scores))
+        if allowed is not None:
+            in_range = labels < len(allowed) * 8
+            member = np.zeros(len(labels), dtype=bool)
+            member[in_range] = (allowed[labels[in_range] >> 3] >> (labels[in_range] & 7)) & 1 == 1
+            labels, scores = labels[member], scores[member]
+
+        if len(labels) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            labels, scores = labels[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return list(zip(labels[order].tolist(), scores[order].tolist()))
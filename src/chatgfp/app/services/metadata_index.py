@@ -0,0 +1,148 @@
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Iterable, List, Sequence, Tuple
+import numpy as np
+
+DEFAULT_FIELDS = ('section', 'category', 'source')
+
+# Operators accepted inside a field condition, e.g. {"section": {"$in": [...]}}
+FIELD_OPERATORS = ('$eq', '$ne', '$in', '$nin')
+
+def _set_bits(bitmap: np.ndarray, labels: np.ndarray) -> None:
+    np.bitwise_or.at(bitmap, labels >> 3, (1 << (labels & 7)).astype(np.uint8))
+
+def _clear_bits(bitmap: np.ndarray, labels: np.ndarray) -> None:
+    np.bitwise_and.at(bitmap, labels >> 3, ~(1 << (labels & 7)).astype(np.uint8))
+
+class MetadataIndex:
+    """
+    Inverted index from metadata field values to bitmaps of vector labels
+
+    Bitmaps are packed little-endian (bit i of the map is label i), which is
+    the layout faiss.IDSelectorBitmap reads, so an evaluated filter can be
+    handed to a FAISS search as-is. Only live labels are indexed.
+
+    Filters use the Pinecone-style syntax:
+        {"section": "SYSC 4"}                         equality
+        {"category": {"$in": ["rules", "guidance"]}}  $eq, $ne, $in, $nin
+        {"$and": [...]}, {"$or": [...]}, {"$not": {...}}
+    Several keys in one mapping are ANDed together.
+    """
+
+    def __init__(self, fields: Sequence[str] = DEFAULT_FIELDS):
+        self.fields = tuple(fields)
+        self._bitmaps: Dict[str, Dict[Hashable, np.ndarray]] = {field: {} for field in self.fields}
+        self._live = np.zeros(0, dtype=np.uint8)
+        self._postings: Dict[int, List[Tuple[str, Hashable]]] = {}  # label -> indexed (field, value)
+
+    def _values(self, doc: Any, field: str) -> List[Hashable]:
+        """Indexable values of one field: metadata first, then the Document attribute"""
+        value = doc.metadata.get(field) if doc.metadata else None
+        if value is None:
+            value = getattr(doc, field, None)
+        if value is None:
+            return []
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        return [v for v in values if isinstance(v, Hashable)]
+
+    def _reserve(self, max_label: int) -> None:
+        """Grow every bitmap (geometrically) so max_label fits"""
+        needed = (max_label >> 3) + 1
+        if needed <= len(self._live):
+            return
+        size = max(needed, 2 * len(self._live), 64)
+
+        def grow(bitmap: np.ndarray) -> np.ndarray:
+            return np.concatenate([bitmap, np.zeros(size - len(bitmap), dtype=np.uint8)])
+
+        self._live = grow(self._live)
+        for bitmaps in self._bitmaps.values():
+            for value in bitmaps:
+                bitmaps[value] = grow(bitmaps[value])
+
+    def add(self, labels: Iterable[int], documents: Iterable[Any]) -> None:
+        """Index the metadata of documents, stored under the matching labels"""
+        labels = list(labels)
+        if not labels:
+            return
+        self._reserve(max(labels))
+
+        grouped: Dict[Tuple[str, Hashable], List[int]] = defaultdict(list)
+        for label, doc in zip(labels, documents):
+            postings = [(field, value) for field in self.fields for value in self._values(doc, field)]
+            self._postings[label] = postings
+            for posting in postings:
+                grouped[posting].append(label)
+
+        _set_bits(self._live, np.asarray(labels, dtype=np.int64))
+        for (field, value), members in grouped.items():
+            bitmap = self._bitmaps[field].get(value)
+            if bitmap is None:
+                bitmap = self._bitmaps[field][value] = np.zeros(len(self._live), dtype=np.uint8)
+            _set_bits(bitmap, np.asarray(members, dtype=np.int64))
+
+    def remove(self, labels: Iterable[int]) -> None:
+        """Drop labels from every bitmap"""
+        for label in labels:
+            postings = self._postings.pop(label, None)
+            if postings is None:
+                continue
+            label = np.array([label], dtype=np.int64)
+            _clear_bits(self._live, label)
+            for field, value in postings:
+                _clear_bits(self._bitmaps[field][value], label)
+
+    def evaluate(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Packed bitmap of the live labels matching filters; raises ValueError for bad filters"""
+        if not isinstance(filters, dict) or not filters:
+            raise ValueError(f"Filter must be a non-empty mapping, got {filters!r}")
+        result = self._live.copy()
+        for key, condition in filters.items():
+            result &= self._evaluate_clause(key, condition)
+        return result
+
+    def _evaluate_clause(self, key: str, condition: Any) -> np.ndarray:
+        if key in ('$and', '$or'):
+            if not isinstance(condition, list) or not condition:
+                raise ValueError(f"'{key}' expects a non-empty list of filters")
+            parts = [self.evaluate(part) for part in condition]
+            combine = np.bitwise_and if key == '$and' else np.bitwise_or
+            return combine.reduce(parts)
+        if key == '$not':
+            return self._live & ~self.evaluate(condition)
+        if key.startswith('$'):
+            raise ValueError(f"Unknown filter operator '{key}'")
+        if key not in self._bitmaps:
+            raise ValueError(f"Field '{key}' is not indexed for filtering; indexed fields are {self.fields}")
+
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        result = self._live.copy()
+        for operator, operand in condition.items():
+            if operator not in FIELD_OPERATORS:
+                raise ValueError(f"Unknown operator '{operator}' for field '{key}', expected one of {FIELD_OPERATORS}")
+            if operator in ('$in', '$nin'):
+                if not isinstance(operand, list):
+                    raise ValueError(f"'{operator}' expects a list of values")
+                values = operand
+            else:
+                values = [operand]
+            matched = self._union(key, values)
+            result &= matched if operator in ('$eq', '$in') else ~matched
+        return result
+
+    def _union(self, field: str, values: List[Any]) -> np.ndarray:
+        bitmaps = self._bitmaps[field]
+        result = np.zeros(len(self._live), dtype=np.uint8)
+        for value in values:
+            bitmap = bitmaps.get(value) if isinstance(value, Hashable) else None
+            if bitmap is not None:
+                result |= bitmap
+        return result
+
+    @staticmethod
+    def count(bitmap: np.ndarray) -> int:
+        """Number of labels set in a packed bitmap"""
+        return int(np.unpackbits(bitmap).sum())
+
+    def __len__(self) -> int:
+        return len(self._postings)
@@ -0,0 +1,164 @@
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def model_footprint(model: Any) -> int:
+    """Approximate resident size of a loaded model in bytes"""
+    size = 0
+    if hasattr(model, 'parameters'):
+        size += sum(p.numel() * p.element_size() for p in model.parameters())
+    if hasattr(model, 'buffers'):
+        size += sum(b.numel() * b.element_size() for b in model.buffers())
+    return size
+
+@dataclass
+class ModelEntry:
+    """A loaded model plus its bookkeeping"""
+    key: Hashable
+    model: Any
+    dimension: Optional[int]
+    memory_bytes: int
+    loaded_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    loads: int = 1
+
+class ModelHandle:
+    """
+    Shared, lazily reloading reference to a registry model
+
+    Handles stay valid across evictions: the next access reloads the model.
+    """
+
+    def __init__(self, registry: 'ModelRegistry', key: Hashable, loader: Callable[[], Any]):
+        self.registry = registry
+        self.key = key
+        self.loader = loader
+
+    @property
+    def model(self) -> Any:
+        return self.registry.get(self.key, self.loader)
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self.registry.entry(self.key, self.loader).dimension
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models
+
+    Each model is loaded once on first use and shared by every handle with the
+    same key. Models that have not been used for idle_timeout seconds are
+    evicted by a background sweeper and reloaded on next use.
+    """
+
+    def __init__(self, idle_timeout: float = 1800.0, sweep_interval: float = 60.0):
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._entries: Dict[Hashable, ModelEntry] = {}
+        self._lock = threading.RLock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def handle(self, key: Hashable, loader: Callable[[], Any]) -> ModelHandle:
+        """Return a shared handle for key; loader is called once to load the model"""
+        return ModelHandle(self, key, loader)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the model for key, loading it if needed, and mark it used"""
+        return self.entry(key, loader).model
+
+    def entry(self, key: Hashable, loader: Callable[[], Any]) -> ModelEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available,
+        # but only once per key even under concurrent first use
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.last_used = time.monotonic()
+                    return entry
+
+            started = time.perf_counter()
+            model = loader()
+            dimension = None
+            if hasattr(model, 'get_sentence_embedding_dimension'):
+                dimension = model.get_sentence_embedding_dimension()
+            entry = ModelEntry(key=key, model=model, dimension=dimension, memory_bytes=model_footprint(model))
+            logger.info(
+                f"Loaded model {key} in {time.perf_counter() - started:.1f}s "
+                f"(dim={dimension}, {entry.memory_bytes / 1024 / 1024:.1f} MB)"
+            )
+
+            with self._lock:
+                self._entries[key] = entry
+                self._ensure_sweeper()
+            return entry
+
+    def evict(self, key: Hashable) -> bool:
+        """Drop a model; live handles reload it on next use"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            logger.info(f"Evicted model {key} ({entry.memory_bytes / 1024 / 1024:.1f} MB)")
+        return entry is not None
+
+    def evict_idle(self) -> List[Hashable]:
+        """Evict every model unused for longer than idle_timeout"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if now - entry.last_used > self.idle_timeout]
+        return [key for key in idle if self.evict(key)]
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-model dimension, memory footprint and idle time"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": entry.key,
+                    "dimension": entry.dimension,
+                    "memory_bytes": entry.memory_bytes,
+                    "idle_seconds": now - entry.last_used,
+                    "age_seconds": now - entry.loaded_at,
+                }
+                for entry in self._entries.values()
+            ]
+
+    @property
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.memory_bytes for entry in self._entries.values())
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep, name="model-registry-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            self.evict_idle()
+            with self._lock:
+                if not self._entries:
+                    self._sweeper = None
+                    return
+
+    def clear(self) -> None:
+        """Evict all models and stop the sweeper"""
+        self._stop.set()
+        with self._lock:
+            self._entries.clear()
+
+# Process-wide registry shared by all EmbeddingService instances
+model_registry = ModelRegistry()
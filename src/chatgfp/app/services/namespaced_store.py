@@ -0,0 +1,511 @@
+import re
+import json
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import Counter, deque
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+import numpy as np
+from app.models.document import Document
+from app.services.embeddings import EmbeddingService
+from app.services.index_factory import IndexSpec
+from app.services.sharded_store import LATENCY_WINDOW, handbook_module, section_module
+from app.services.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+NAMESPACES_FILE = "namespaces.json"
+ROUTER_FILE = "router.npz"
+
+# Namespace of chunks without a handbook section
+DEFAULT_NAMESPACE = "OTHER"
+
+# Upper-case tokens in a query that may name a handbook module, e.g. "COBS" in "COBS 9.2"
+_MODULE_TOKEN = re.compile(r'\b[A-Z]{2,6}\b')
+
+def _namespace_directory(directory: Union[str, Path], namespace: str) -> Path:
+    return Path(directory) / f"ns-{namespace}"
+
+class NamespaceRouter:
+    """
+    Picks the namespaces a query needs to search
+
+    In order of precedence:
+        1. namespaces given explicitly by the caller
+        2. a section filter, e.g. {"section": {"$in": ["COBS 9", "COBS 10"]}}
+           routes to the modules of its values
+        3. module names written in the query, e.g. "SYSC" in "SYSC 4 governance"
+        4. a nearest-centroid classifier: the query embedding is compared with
+           the mean embedding of each namespace, and the namespaces within
+           margin of the best are searched, if there are at most max_namespaces
+           of them; otherwise the query is ambiguous and every namespace is searched
+
+    Centroids are running means of the vectors added to each namespace.
+    Replaced and deleted vectors are not subtracted, which only blurs the
+    centroids slightly and is all routing needs.
+    """
+
+    def __init__(self, max_namespaces: int = 2, margin: float = 0.05):
+        """
+        Args:
+            max_namespaces: Most namespaces the classifier may pick for one query
+            margin: Cosine similarity below the best centroid still considered a match
+        """
+        self.max_namespaces = max_namespaces
+        self.margin = margin
+        self._sums: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+        self.decisions: Counter = Counter()
+        self._selected: Deque[int] = deque(maxlen=LATENCY_WINDOW)
+
+    def observe(self, namespace: str, embeddings: np.ndarray) -> None:
+        """Fold newly added embeddings into the namespace centroid"""
+        total = embeddings.sum(axis=0, dtype=np.float64)
+        if namespace in self._sums:
+            self._sums[namespace] += total
+        else:
+            self._sums[namespace] = total
+        self._counts[namespace] = self._counts.get(namespace, 0) + len(embeddings)
+
+    def from_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        """Modules implied by a top-level (or $and) section filter, or None when the filter does not pin them"""
+        if not filters:
+            return None
+        for key, condition in filters.items():
+            if key == '$and' and isinstance(condition, list):
+                for part in condition:
+                    modules = self.from_filters(part) if isinstance(part, dict) else None
+                    if modules is not None:
+                        return modules
+            if key != 'section':
+                continue
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            if set(condition) - {'$eq', '$in'}:
+                continue
+            values = [condition['$eq']] if '$eq' in condition else []
+            if isinstance(condition.get('$in'), list):
+                values += condition['$in']
+            return sorted({section_module(value) or DEFAULT_NAMESPACE for value in values})
+        return None
+
+    def from_query(self, query: str, known: List[str]) -> Optional[List[str]]:
+        """Known namespaces named in the query text"""
+        named = sorted(set(_MODULE_TOKEN.findall(query)) & set(known))
+        return named or None
+
+    def classify(self, query_vector: np.ndarray, known: List[str]) -> Optional[List[str]]:
+        """Namespaces whose centroid is close to the query, or None when the query is ambiguous"""
+        names = [name for name in known if self._counts.get(name)]
+        if len(names) <= 1:
+            return None
+        centroids = np.stack([self._sums[name] / self._counts[name] for name in names]).astype(np.float32)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        query = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+        similarity = centroids @ query
+        selected = [names[i] for i in np.flatnonzero(similarity >= similarity.max() - self.margin)]
+        if len(selected) > self.max_namespaces:
+            return None
+        return selected
+
+    def route(
+        self,
+        query: Optional[str],
+        query_vector: Optional[np.ndarray],
+        filters: Optional[Dict[str, Any]],
+        known: List[str],
+        namespaces: Optional[List[str]] = None
+    ) -> List[str]:
+        """Namespaces to search for one query; every known namespace when nothing narrows it down"""
+        candidates = [
+            ('explicit', lambda: namespaces),
+            ('filter', lambda: self.from_filters(filters)),
+            ('reference', lambda: self.from_query(query, known) if query else None),
+            ('classifier', lambda: self.classify(query_vector, known) if query_vector is not None else None),
+        ]
+        decision, selected = 'all', known
+        for name, rule in candidates:
+            picked = rule()
+            if picked is not None:
+                decision, selected = name, picked
+                break
+        selected = [name for name in selected if name in known]
+        self.decisions[decision] += 1
+        self._selected.append(len(selected))
+        return selected
+
+    def stats(self) -> Dict[str, Any]:
+        """How queries were routed and how many namespaces they searched on average"""
+        return {
+            "decisions": dict(self.decisions),
+            "mean_namespaces": float(np.mean(self._selected)) if self._selected else 0.0
+        }
+
+    def save(self, path: Path) -> None:
+        names = sorted(self._sums)
+        np.savez(
+            path,
+            names=np.array(names, dtype=str),
+            sums=np.stack([self._sums[name] for name in names]) if names else np.zeros((0, 0)),
+            counts=np.array([self._counts[name] for name in names], dtype=np.int64)
+        )
+
+    def load(self, path: Path) -> None:
+        with np.load(path) as data:
+            for name, total, count in zip(data["names"].tolist(), data["sums"], data["counts"]):
+                self._sums[name] = total.astype(np.float64)
+                self._counts[name] = int(count)
+
+class NamespacedVectorStore:
+    """
+    VectorStore split into one store per handbook module (SYSC, COBS, ...)
+
+    Each namespace is a full VectorStore in this process, created when its
+    first document arrives; chunks without a section go to DEFAULT_NAMESPACE.
+    A NamespaceRouter picks the namespaces each query needs, only those are
+    searched (in parallel worker threads), and their top-k lists are merged
+    by score. Scores are comparable across namespaces as long as they share
+    the embedding space, i.e. without a per-namespace projection.
+
+    Per-namespace search latency is recorded (see stats). Exposes the same
+    search/upsert/delete interface as VectorStore, so it can back a Retriever
+    directly.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        index_spec: Optional[IndexSpec] = None,
+        promotion: Optional[IndexSpec] = None,
+        promotion_threshold: int = 100_000,
+        router: Optional[NamespaceRouter] = None
+    ):
+        """
+        Args:
+            embedding_service: Embeds documents and queries for every namespace
+            index_spec: Passed to each namespace's VectorStore
+            promotion, promotion_threshold: Passed to each namespace's VectorStore;
+                namespaces promote independently, by their own size
+            router: Query router (default: NamespaceRouter())
+        """
+        self.embedding_service = embedding_service
+        self.index_spec = index_spec or IndexSpec()
+        self.promotion = promotion
+        self.promotion_threshold = promotion_threshold
+        self.router = router or NamespaceRouter()
+        self.stores: Dict[str, VectorStore] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+
+        # Document.id -> namespace, so replacements and deletes reach the right store
+        self._namespace_of: Dict[int, str] = {}
+        self._next_document_id = 1
+
+    @property
+    def documents(self):
+        """Ids of the stored documents"""
+        return self._namespace_of.keys()
+
+    @property
+    def generation(self) -> Dict[str, int]:
+        """Current generation of each namespace"""
+        return {name: store.generation for name, store in self.stores.items()}
+
+    @property
+    def namespaces(self) -> List[str]:
+        return sorted(self.stores)
+
+    def _store(self, namespace: str) -> VectorStore:
+        if namespace not in self.stores:
+            self.stores[namespace] = VectorStore(
+                self.embedding_service,
+                index_spec=self.index_spec,
+                promotion=self.promotion,
+                promotion_threshold=self.promotion_threshold
+            )
+            self._latencies[namespace] = deque(maxlen=LATENCY_WINDOW)
+        return self.stores[namespace]
+
+    async def add_documents(
+        self,
+        documents: List[Document],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """Add documents to their namespaces; documents whose id is already stored are replaced"""
+        await self.upsert(documents, embeddings)
+
+    async def upsert(
+        self,
+        documents: List[Document],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """Embed documents once and upsert each namespace's share"""
+        if not documents:
+            return
+        if embeddings is None:
+            embeddings = await self.embedding_service.get_embeddings_array([doc.content for doc in documents])
+        elif len(embeddings) != len(documents):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(documents)} documents")
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        routed: Dict[str, List[int]] = {}
+        moved: Dict[str, List[int]] = {}
+        for row, doc in enumerate(documents):
+            if doc.id is None:
+                doc.id = self._next_document_id
+            self._next_document_id = max(self._next_document_id, doc.id + 1)
+            namespace = handbook_module(doc) or DEFAULT_NAMESPACE
+            previous = self._namespace_of.get(doc.id)
+            if previous is not None and previous != namespace:
+                # A chunk whose section changed module moves namespace
+                moved.setdefault(previous, []).append(doc.id)
+            routed.setdefault(namespace, []).append(row)
+
+        for namespace, ids in moved.items():
+            await self.stores[namespace].delete(ids)
+        for namespace, rows in routed.items():
+            await self._store(namespace).upsert([documents[row] for row in rows], embeddings[rows])
+            self.router.observe(namespace, embeddings[rows])
+            self._namespace_of.update((documents[row].id, namespace) for row in rows)
+
+    async def delete(self, document_ids: List[int]) -> int:
+        """Delete documents by id; returns how many were stored"""
+        by_namespace: Dict[str, List[int]] = {}
+        for doc_id in set(document_ids):
+            if doc_id in self._namespace_of:
+                by_namespace.setdefault(self._namespace_of.pop(doc_id), []).append(doc_id)
+        deleted = 0
+        for namespace, ids in by_namespace.items():
+            deleted += await self.stores[namespace].delete(ids)
+        return deleted
+
+    async def search(
+        self,
+        query: str,
+        k: int = 5,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        namespaces: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the namespaces the router picks for the query; see VectorStore.search
+
+        Args:
+            namespaces: Search exactly these namespaces instead of routing
+        """
+        return (await self.search_many([query], k, search_params, filters, namespaces))[0]
+
+    async def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        namespaces: Optional[List[str]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search several queries, each routed on its own; see VectorStore.search_many"""
+        if not queries:
+            return []
+        if not self._namespace_of:
+            return [[] for _ in queries]
+        query_matrix, routes = await self._route_queries(queries, filters, namespaces)
+        return await self._gather(
+            query_matrix, routes, k,
+            lambda store, matrix: store._search_vectors(matrix, k, search_params, filters)
+        )
+
+    async def range_search(
+        self,
+        query: str,
+        score_threshold: float,
+        limit: int = 100,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        namespaces: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Range search the namespaces the router picks; see VectorStore.range_search"""
+        return (await self.range_search_many(
+            [query], score_threshold, limit, search_params, filters, namespaces
+        ))[0]
+
+    async def range_search_many(
+        self,
+        queries: List[str],
+        score_threshold: float,
+        limit: int = 100,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        namespaces: Optional[List[str]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Range search several queries, each routed on its own; see VectorStore.range_search_many"""
+        if not queries:
+            return []
+        if not self._namespace_of:
+            return [[] for _ in queries]
+        query_matrix, routes = await self._route_queries(queries, filters, namespaces)
+        return await self._gather(
+            query_matrix, routes, limit,
+            lambda store, matrix: store._range_search_vectors(matrix, score_threshold, limit, search_params, filters)
+        )
+
+    async def _route_queries(
+        self,
+        queries: List[str],
+        filters: Optional[Dict[str, Any]],
+        namespaces: Optional[List[str]]
+    ) -> Tuple[np.ndarray, List[List[str]]]:
+        """Embed queries in one batch and route each"""
+        if len(queries) == 1:
+            # A single query goes through the query embedding cache
+            query_matrix = await self.embedding_service.get_single_embedding_array(queries[0])
+        else:
+            query_matrix = await self.embedding_service.get_embeddings_array(queries)
+        known = [name for name, store in self.stores.items() if store.ntotal]
+        routes = [
+            self.router.route(query, vector, filters, known, namespaces)
+            for query, vector in zip(queries, query_matrix)
+        ]
+        return query_matrix, routes
+
+    async def _gather(
+        self,
+        query_matrix: np.ndarray,
+        routes: List[List[str]],
+        k: int,
+        search: Callable[[VectorStore, np.ndarray], List[List[Dict[str, Any]]]]
+    ) -> List[List[Dict[str, Any]]]:
+        """Run search on each namespace for the queries routed to it and heap-merge each query's top-k"""
+        rows_of: Dict[str, List[int]] = {}
+        for row, route in enumerate(routes):
+            for namespace in route:
+                rows_of.setdefault(namespace, []).append(row)
+
+        async def search_namespace(namespace: str, rows: List[int]) -> List[List[Dict[str, Any]]]:
+            started = time.perf_counter()
+            # FAISS releases the GIL, so namespaces are searched in parallel threads
+            results = await asyncio.to_thread(search, self.stores[namespace], query_matrix[rows])
+            self._latencies[namespace].append(time.perf_counter() - started)
+            for row in results:
+                for result in row:
+                    result["namespace"] = namespace
+            return results
+
+        per_namespace = await asyncio.gather(*(
+            search_namespace(namespace, rows) for namespace, rows in rows_of.items()
+        ))
+        per_row: List[List[List[Dict[str, Any]]]] = [[] for _ in routes]
+        for rows, results in zip(rows_of.values(), per_namespace):
+            for row, row_results in zip(rows, results):
+                per_row[row].append(row_results)
+        # Each namespace's list is sorted by descending score; merge the sorted lists lazily
+        return [
+            list(itertools.islice(heapq.merge(*lists, key=lambda result: result["score"], reverse=True), k))
+            for lists in per_row
+        ]
+
+    async def lexical_search(
+        self,
+        query: str,
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 search in the namespaces picked from filters or module names in the query
+
+        Each namespace scores with its own term statistics, so scores are
+        comparable only approximately across namespaces.
+        """
+        known = [name for name, store in self.stores.items() if store.ntotal]
+        selected = self.router.from_filters(filters) or self.router.from_query(query, known) or known
+        per_namespace = []
+        for namespace in selected:
+            if namespace not in known:
+                continue
+            results = await self.stores[namespace].lexical_search(query, k, filters)
+            for result in results:
+                result["namespace"] = namespace
+            per_namespace.append(results)
+        return list(itertools.islice(
+            heapq.merge(*per_namespace, key=lambda result: result["score"], reverse=True), k
+        ))
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-namespace document counts and recent search latency percentiles (ms), plus routing counts"""
+        counts = Counter(self._namespace_of.values())
+        report = []
+        for namespace in self.namespaces:
+            latencies = self._latencies[namespace]
+            entry: Dict[str, Any] = {
+                "namespace": namespace,
+                "documents": counts[namespace],
+                "vectors": self.stores[namespace].ntotal,
+                "queries": len(latencies)
+            }
+            if latencies:
+                millis = np.array(latencies) * 1000
+                entry.update(
+                    mean_ms=float(millis.mean()),
+                    p50_ms=float(np.percentile(millis, 50)),
+                    p95_ms=float(np.percentile(millis, 95)),
+                    max_ms=float(millis.max()),
+                )
+            report.append(entry)
+        return {"namespaces": report, "routing": self.router.stats()}
+
+    def save(self, directory: Union[str, Path]) -> None:
+        """Save every namespace to directory/ns-NAME, plus the layout and router centroids"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        saved = []
+        for namespace, store in self.stores.items():
+            if store.ntotal:
+                store.save(_namespace_directory(directory, namespace))
+                saved.append(namespace)
+        self.router.save(directory / f"{ROUTER_FILE}.tmp.npz")
+        with open(directory / f"{NAMESPACES_FILE}.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "namespaces": sorted(saved),
+                "model_name": self.embedding_service.model_name,
+                "index_spec": asdict(self.index_spec),
+                "promotion": asdict(self.promotion) if self.promotion else None,
+                "promotion_threshold": self.promotion_threshold,
+                "max_namespaces": self.router.max_namespaces,
+                "margin": self.router.margin
+            }, f, indent=2)
+        (directory / f"{ROUTER_FILE}.tmp.npz").replace(directory / ROUTER_FILE)
+        (directory / f"{NAMESPACES_FILE}.tmp").replace(directory / NAMESPACES_FILE)
+
+    @classmethod
+    def load(
+        cls,
+        directory: Union[str, Path],
+        embedding_service: EmbeddingService,
+        mmap: bool = True
+    ) -> "NamespacedVectorStore":
+        """Load the namespaces written by save()"""
+        directory = Path(directory)
+        with open(directory / NAMESPACES_FILE, encoding="utf-8") as f:
+            layout = json.load(f)
+        if layout["model_name"] != embedding_service.model_name:
+            raise ValueError(
+                f"Store was built with '{layout['model_name']}', not '{embedding_service.model_name}'"
+            )
+        store = cls(
+            embedding_service,
+            index_spec=IndexSpec(**layout["index_spec"]),
+            promotion=IndexSpec(**layout["promotion"]) if layout["promotion"] else None,
+            promotion_threshold=layout["promotion_threshold"],
+            router=NamespaceRouter(layout["max_namespaces"], layout["margin"])
+        )
+        for namespace in layout["namespaces"]:
+            store.stores[namespace] = VectorStore.load(
+                _namespace_directory(directory, namespace), embedding_service, mmap=mmap
+            )
+            store._latencies[namespace] = deque(maxlen=LATENCY_WINDOW)
+            store._namespace_of.update(dict.fromkeys(store.stores[namespace].documents, namespace))
+        store._next_document_id = max(store._namespace_of, default=0) + 1
+        store.router.load(directory / ROUTER_FILE)
+        return store
@@ -0,0 +1,33 @@
+import numpy as np
+import faiss
+
+PROJECTIONS = ('pca', 'truncate')
+
+# Training vectors per input dimension for a stable PCA covariance estimate
+PCA_POINTS_PER_DIMENSION = 4
+
+def build_projection(kind: str, input_dim: int, output_dim: int) -> faiss.VectorTransform:
+    """
+    Build a dimensionality-reducing transform
+
+    'pca' must be trained on a corpus sample; 'truncate' keeps the first
+    output_dim components (suited to Matryoshka-style models) and needs no training.
+    """
+    if kind not in PROJECTIONS:
+        raise ValueError(f"Unknown projection '{kind}', expected one of {PROJECTIONS}")
+    if not 0 < output_dim <= input_dim:
+        raise ValueError(f"Projection dimension must be in (0, {input_dim}], got {output_dim}")
+
+    if kind == 'pca':
+        return faiss.PCAMatrix(input_dim, output_dim)
+
+    transform = faiss.LinearTransform(input_dim, output_dim, False)
+    faiss.copy_array_to_vector(np.eye(output_dim, input_dim, dtype=np.float32).ravel(), transform.A)
+    transform.is_trained = True
+    return transform
+
+def projection_training_size(kind: str, input_dim: int) -> int:
+    """Vectors to train the projection on; 0 when it needs no training"""
+    if kind == 'pca':
+        return input_dim * PCA_POINTS_PER_DIMENSION
+    return 0
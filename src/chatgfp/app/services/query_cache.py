@@ -0,0 +1,104 @@
+import re
+import sys
+import asyncio
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_query(query: str) -> str:
+    """Fold case, punctuation and whitespace so trivially different queries share a key"""
+    folded = ''.join(
+        ' ' if unicodedata.category(char).startswith('P') else char
+        for char in unicodedata.normalize('NFKC', query).casefold()
+    )
+    return _WHITESPACE.sub(' ', folded).strip()
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU cache of query embeddings, bounded by bytes
+
+    Keys are normalized query strings. Concurrent misses for the same key are
+    coalesced: only the first caller computes the embedding, the others await it.
+    """
+
+    def __init__(self, capacity_bytes: int = 32 * 1024 * 1024):
+        self.capacity_bytes = capacity_bytes
+        self.size_bytes = 0
+        self._entries: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(key: str, value: np.ndarray) -> int:
+        return sys.getsizeof(key) + value.nbytes
+
+    async def get_or_compute(
+        self,
+        query: str,
+        compute: Callable[[str], Awaitable[np.ndarray]]
+    ) -> np.ndarray:
+        """Return the cached embedding for query, computing it once on a miss"""
+        key = normalize_query(query)
+
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = np.ascontiguousarray(await compute(query), dtype=np.float32)
+            value.flags.writeable = False
+            self._put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure does not log a warning
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    def _put(self, key: str, value: np.ndarray) -> None:
+        size = self._entry_size(key, value)
+        if size > self.capacity_bytes:
+            return
+        self._entries[key] = value
+        self.size_bytes += size
+        while self.size_bytes > self.capacity_bytes:
+            old_key, old_value = self._entries.popitem(last=False)
+            self.size_bytes -= self._entry_size(old_key, old_value)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current occupancy"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "capacity_bytes": self.capacity_bytes,
+        }
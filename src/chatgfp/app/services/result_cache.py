@@ -0,0 +1,222 @@
+import sys
+import json
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import faiss
+from app.services.query_cache import normalize_query
+
+# Cached neighbours examined per lookup; entries for other parameters are skipped
+LOOKUP_CANDIDATES = 8
+
+@dataclass
+class _Entry:
+    key: Tuple
+    results: List[Dict[str, Any]]
+    size_bytes: int
+
+def _result_size(result: Dict[str, Any]) -> int:
+    """Approximate heap bytes of one cached result"""
+    doc = result["document"]
+    return sys.getsizeof(result) + sys.getsizeof(doc.content or "") + sys.getsizeof(doc.title or "") + 256
+
+class SemanticResultCache:
+    """
+    Cache of retrieval results keyed by query embedding, bounded by bytes
+
+    Entries hold (query embedding, retrieval parameters) -> results. The
+    unit-normalized embeddings live in a small FAISS inner-product index, so
+    a lookup finds the nearest cached queries; the first one with the same
+    parameters whose cosine similarity is at least similarity_threshold is a
+    hit, which lets paraphrases share results. Hybrid retrieval also depends
+    on the query words, so its entries additionally match on the normalized
+    query text.
+
+    Entries expire after ttl_seconds and are evicted least recently used once
+    capacity_bytes is exceeded. Expired entries are swept on every get and
+    put, so they do not hold capacity until a lookup happens to land on them. Adding or replacing documents can change any
+    ranking and clears the cache; deleting documents only drops the entries
+    whose results contain them.
+    """
+
+    def __init__(
+        self,
+        capacity_bytes: int = 16 * 1024 * 1024,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 300.0
+    ):
+        """
+        Args:
+            capacity_bytes: Upper bound on the cached results and embeddings
+            similarity_threshold: Cosine similarity at which a cached query counts as the same
+            ttl_seconds: Lifetime of an entry
+        """
+        self.capacity_bytes = capacity_bytes
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.size_bytes = 0
+        self._index: Optional[faiss.IndexIDMap2] = None
+        self._entries: 'OrderedDict[int, _Entry]' = OrderedDict()
+        # (expires_at, entry_id) in insertion order, which is expiry order since all share the ttl
+        self._expiry: Deque[Tuple[float, int]] = deque()
+        self._by_document: Dict[int, Set[int]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._hit_similarity = 0.0
+
+    @staticmethod
+    def _key(
+        query: str,
+        k: int,
+        score_threshold: float,
+        search_params: Optional[Dict[str, int]],
+        filters: Optional[Dict[str, Any]],
+        hybrid: bool,
+        max_results: Optional[int]
+    ) -> Tuple:
+        return (
+            k,
+            max_results,
+            score_threshold,
+            json.dumps(search_params, sort_keys=True),
+            json.dumps(filters, sort_keys=True),
+            normalize_query(query) if hybrid else None
+        )
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.ascontiguousarray(embedding, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(vector)
+        return vector
+
+    def get(
+        self,
+        query: str,
+        embedding: np.ndarray,
+        k: int,
+        score_threshold: float = 0.0,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False,
+        max_results: Optional[int] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Cached results for a query close enough to this one with the same parameters, or None"""
+        self._expire()
+        if self._index is None or not self._entries:
+            self.misses += 1
+            return None
+        key = self._key(query, k, score_threshold, search_params, filters, hybrid, max_results)
+        similarities, ids = self._index.search(self._normalize(embedding), min(LOOKUP_CANDIDATES, len(self._entries)))
+        for similarity, entry_id in zip(similarities[0], ids[0]):
+            if entry_id < 0 or similarity < self.similarity_threshold:
+                break
+            entry = self._entries.get(int(entry_id))
+            if entry is None or entry.key != key:
+                continue
+            self._entries.move_to_end(int(entry_id))
+            self.hits += 1
+            self._hit_similarity += float(similarity)
+            # Shallow copies so callers cannot alter the cached ranking
+            return [dict(result) for result in entry.results]
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        query: str,
+        embedding: np.ndarray,
+        k: int,
+        results: List[Dict[str, Any]],
+        score_threshold: float = 0.0,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False,
+        max_results: Optional[int] = None
+    ) -> None:
+        """Cache results for a query; entries larger than the whole capacity are not kept"""
+        self._expire()
+        vector = self._normalize(embedding)
+        size = vector.nbytes + sum(_result_size(result) for result in results)
+        if size > self.capacity_bytes:
+            return
+        if self._index is None:
+            self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+        self._entries[entry_id] = _Entry(
+            key=self._key(query, k, score_threshold, search_params, filters, hybrid, max_results),
+            results=[dict(result) for result in results],
+            size_bytes=size
+        )
+        self._expiry.append((time.monotonic() + self.ttl_seconds, entry_id))
+        for result in results:
+            self._by_document.setdefault(result["document"].id, set()).add(entry_id)
+        self.size_bytes += size
+        while self.size_bytes > self.capacity_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _expire(self) -> None:
+        """Drop every entry past its ttl"""
+        now = time.monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, entry_id = self._expiry.popleft()
+            # Evicted and invalidated entries leave their expiry behind
+            if entry_id in self._entries:
+                self._remove(entry_id)
+                self.expirations += 1
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self.size_bytes -= entry.size_bytes
+        self._index.remove_ids(np.array([entry_id], dtype=np.int64))
+        for result in entry.results:
+            entries = self._by_document.get(result["document"].id)
+            if entries is not None:
+                entries.discard(entry_id)
+                if not entries:
+                    del self._by_document[result["document"].id]
+
+    def invalidate_documents(self, document_ids: Iterable[int]) -> int:
+        """Drop the entries whose results contain any of these documents; returns how many"""
+        stale = set()
+        for doc_id in document_ids:
+            stale |= self._by_document.get(doc_id, set())
+        for entry_id in stale:
+            self._remove(entry_id)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._expiry.clear()
+        self._by_document.clear()
+        if self._index is not None:
+            self._index.reset()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "mean_hit_similarity": self._hit_similarity / self.hits if self.hits else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "capacity_bytes": self.capacity_bytes,
+        }
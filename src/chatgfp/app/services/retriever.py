@@ -1,16 +1,69 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import numpy as np
 from app.models.document import Document
 from app.services.vector_store import VectorStore
+from app.services.result_cache import SemanticResultCache
+
+# Standard reciprocal rank fusion constant; damps the advantage of the very top ranks
+RRF_K = 60
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[Dict[str, Any]]],
+    weights: Dict[str, float],
+    k: int = RRF_K
+) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists by weighted reciprocal rank
+
+    Each document scores sum(weight / (k + rank)) over the lists it appears in.
+    Fused results carry that as "score", the per-list scores under "scores"
+    and the store generation of the first list that ranked them.
+    """
+    fused: Dict[int, Dict[str, Any]] = {}
+    for name, results in rankings.items():
+        weight = weights.get(name, 1.0)
+        for rank, result in enumerate(results, start=1):
+            doc = result["document"]
+            entry = fused.setdefault(
+                doc.id, {"document": doc, "score": 0.0, "scores": {}, "generation": result.get("generation")}
+            )
+            entry["score"] += weight / (k + rank)
+            entry["scores"][name] = result["score"]
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
 
 class Retriever:
-    def __init__(self, vector_store: VectorStore):
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        vector_weight: float = 1.0,
+        lexical_weight: float = 1.0,
+        hybrid_candidates: int = 50,
+        result_cache: Optional[SemanticResultCache] = None
+    ):
+        """
+        Args:
+            vector_store: Store to retrieve from
+            vector_weight: RRF weight of the semantic ranking in hybrid mode
+            lexical_weight: RRF weight of the BM25 ranking in hybrid mode
+            hybrid_candidates: Depth of each ranking fused in hybrid mode
+            result_cache: Optional cache answering retrieve() for paraphrases of
+                recent queries; the query embedding is computed once more for
+                the lookup, so pair it with the embedding service's query cache
+        """
         self.vector_store = vector_store
+        self.weights = {"vector": vector_weight, "lexical": lexical_weight}
+        self.hybrid_candidates = hybrid_candidates
+        self.result_cache = result_cache
 
     async def retrieve(
         self, 
         query: str, 
         k: int = 5,
-        score_threshold: float = 0.0
+        score_threshold: float = 0.0,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False,
+        max_results: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents for a query
@@ -19,17 +72,114 @@ class Retriever:
             query: Search query
             k: Number of documents to retrieve
             score_threshold: Minimum similarity score threshold
+            search_params: Per-request index tuning (ef_search for HNSW, nprobe for IVF)
+            filters: Metadata filter, e.g. {"section": "SYSC 4"}
+            hybrid: Fuse the semantic ranking with a BM25 keyword ranking; the
+                score threshold then applies to the semantic candidates and the
+                returned score is the fused RRF score
+            max_results: Threshold mode: return every document scoring above
+                score_threshold, up to max_results, from a range search of the
+                store instead of its top k (k is then ignored)
         """
-        results = await self.vector_store.search(query, k=k)
-        
-        # Filter by score threshold
-        filtered_results = [
-            result for result in results 
-            if result["score"] > score_threshold
-        ]
-        
+        if self.result_cache is not None:
+            embedding = await self.vector_store.embedding_service.get_single_embedding_array(query)
+            cached = self.result_cache.get(
+                query, embedding, k, score_threshold, search_params, filters, hybrid, max_results
+            )
+            if cached is not None:
+                return cached
+
+        if max_results is not None:
+            filtered_results = await self.vector_store.range_search(
+                query, score_threshold, limit=max_results, search_params=search_params, filters=filters
+            )
+            depth = max_results
+        else:
+            depth = max(k, self.hybrid_candidates) if hybrid else k
+            results = await self.vector_store.search(query, k=depth, search_params=search_params, filters=filters)
+
+            # Filter by score threshold
+            filtered_results = [
+                result for result in results
+                if result["score"] > score_threshold
+            ]
+        if hybrid:
+            filtered_results = (await self._fuse(query, filtered_results, depth, filters))[:max_results or k]
+
+        if self.result_cache is not None:
+            self.result_cache.put(
+                query, embedding, k, filtered_results, score_threshold, search_params, filters, hybrid, max_results
+            )
         return filtered_results
 
-    async def add_documents(self, documents: List[Document]) -> None:
-        """Add documents to the retrieval system"""
-        await self.vector_store.add_documents(documents)
+    async def _fuse(
+        self,
+        query: str,
+        semantic: List[Dict[str, Any]],
+        depth: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        lexical = await self.vector_store.lexical_search(query, k=depth, filters=filters)
+        return reciprocal_rank_fusion({"vector": semantic, "lexical": lexical}, self.weights)
+
+    async def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        score_threshold: float = 0.0,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False,
+        max_results: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve relevant documents for several queries with one batched search
+
+        Args:
+            queries: Search queries
+            k: Number of documents to retrieve per query
+            score_threshold: Minimum similarity score threshold
+            search_params: Per-request index tuning (ef_search for HNSW, nprobe for IVF)
+            filters: Metadata filter applied to every query
+            hybrid: Fuse each semantic ranking with a BM25 ranking (see retrieve)
+            max_results: Threshold mode, as in retrieve
+        """
+        if max_results is not None:
+            depth = max_results
+            batches = await self.vector_store.range_search_many(
+                queries, score_threshold, limit=max_results, search_params=search_params, filters=filters
+            )
+        else:
+            depth = max(k, self.hybrid_candidates) if hybrid else k
+            batches = await self.vector_store.search_many(
+                queries, k=depth, search_params=search_params, filters=filters
+            )
+            batches = [
+                [result for result in results if result["score"] > score_threshold]
+                for results in batches
+            ]
+        if hybrid:
+            return [
+                (await self._fuse(query, results, depth, filters))[:max_results or k]
+                for query, results in zip(queries, batches)
+            ]
+        return batches
+
+    async def add_documents(
+        self,
+        documents: List[Document],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """Add documents to the retrieval system, optionally with precomputed embeddings"""
+        await self.vector_store.add_documents(documents, embeddings)
+        if self.result_cache is not None:
+            # New or changed documents can enter any cached ranking
+            self.result_cache.clear()
+
+    async def delete_documents(self, document_ids: List[int]) -> int:
+        """Remove documents from the retrieval system; returns how many were stored"""
+        deleted = await self.vector_store.delete(document_ids)
+        if self.result_cache is not None:
+            # Rankings without the deleted documents are unaffected
+            self.result_cache.invalidate_documents(document_ids)
+        return deleted
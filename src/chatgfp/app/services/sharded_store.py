@@ -0,0 +1,473 @@
+import re
+import json
+import shutil
+import time
+import zlib
+import heapq
+import asyncio
+import logging
+import itertools
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Union
+import numpy as np
+from app.models.document import Document
+from app.services.embeddings import EmbeddingService
+from app.services.index_factory import IndexSpec
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS = ('hash', 'module')
+
+SHARDS_FILE = "shards.json"
+
+# Recent per-shard round trips kept for latency reporting
+LATENCY_WINDOW = 1000
+
+_MODULE = re.compile(r'[A-Za-z]+')
+
+# Per-shard state, populated once by _init_shard in each worker process
+_shard_store = None
+_shard_loop = None
+
+def section_module(section: Any) -> Optional[str]:
+    """Handbook module of a section reference, e.g. 'SYSC' for 'SYSC 4.1.1R'"""
+    match = _MODULE.match(section) if isinstance(section, str) else None
+    return match.group(0).upper() if match else None
+
+def handbook_module(doc: Document) -> Optional[str]:
+    """Handbook module of a chunk from its section metadata"""
+    return section_module((doc.metadata or {}).get('section'))
+
+def _shard_directory(directory: Union[str, Path], shard: int) -> Path:
+    return Path(directory) / f"shard-{shard}"
+
+def _init_shard(config: Dict[str, Any], directory: Optional[str]) -> None:
+    """Create or load this worker's VectorStore"""
+    global _shard_store, _shard_loop
+    from app.services.vector_store import VectorStore, META_FILE
+    _shard_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_shard_loop)
+    # Shards receive vectors from the parent and never load the model weights
+    service = EmbeddingService(config["model_name"])
+    if directory is not None and (Path(directory) / META_FILE).exists():
+        _shard_store = VectorStore.load(directory, service, mmap=config["mmap"])
+    else:
+        _shard_store = VectorStore(
+            service,
+            projection=config["projection"],
+            projection_dim=config["projection_dim"],
+            index_spec=IndexSpec(**config["index_spec"]),
+            promotion=IndexSpec(**config["promotion"]) if config["promotion"] else None,
+            promotion_threshold=config["promotion_threshold"]
+        )
+
+def _shard_upsert(documents: List[Document], embeddings: np.ndarray) -> None:
+    _shard_loop.run_until_complete(_shard_store.upsert(documents, embeddings))
+
+def _shard_delete(document_ids: List[int]) -> int:
+    return _shard_loop.run_until_complete(_shard_store.delete(document_ids))
+
+def _shard_search(
+    query_matrix: np.ndarray,
+    k: int,
+    search_params: Optional[Dict[str, int]],
+    filters: Optional[Dict[str, Any]]
+) -> List[List[Dict[str, Any]]]:
+    if not _shard_store.ntotal:
+        return [[] for _ in range(len(query_matrix))]
+    return _shard_store._search_vectors(query_matrix, k, search_params, filters)
+
+def _shard_range_search(
+    query_matrix: np.ndarray,
+    score_threshold: float,
+    limit: int,
+    search_params: Optional[Dict[str, int]],
+    filters: Optional[Dict[str, Any]]
+) -> List[List[Dict[str, Any]]]:
+    if not _shard_store.ntotal:
+        return [[] for _ in range(len(query_matrix))]
+    return _shard_store._range_search_vectors(query_matrix, score_threshold, limit, search_params, filters)
+
+def _shard_lexical_search(query: str, k: int, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _shard_loop.run_until_complete(_shard_store.lexical_search(query, k, filters))
+
+def _shard_document_ids() -> List[int]:
+    return list(_shard_store.documents)
+
+def _shard_generation() -> int:
+    return _shard_store.generation
+
+def _shard_save(directory: str) -> bool:
+    """Save this shard; a shard that never received a document writes nothing and returns False"""
+    if not _shard_store.generation:
+        return False
+    _shard_store.save(directory)
+    return True
+
+class ShardedVectorStore:
+    """
+    VectorStore partitioned across local worker processes
+
+    Each shard is a full VectorStore living in its own process. Documents are
+    routed by a stable hash of their id, or by handbook module (SYSC, COBS,
+    ...) so a module's chunks stay together. A module goes to the shard given
+    in module_shards or, when first seen, to the shard holding the fewest
+    documents; the assignment is saved with the store. Queries are embedded
+    once here, fanned out to every shard in parallel, and the per-shard top-k
+    lists are merged with a heap. Round-trip latency is recorded per shard
+    (see stats).
+
+    Exposes the same search/upsert/delete interface as VectorStore, so it can
+    back a Retriever directly.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        shards: int = 4,
+        partition: str = 'hash',
+        projection: Optional[str] = None,
+        projection_dim: Optional[int] = None,
+        index_spec: Optional[IndexSpec] = None,
+        promotion: Optional[IndexSpec] = None,
+        promotion_threshold: int = 100_000,
+        module_shards: Optional[Dict[str, int]] = None,
+        directory: Optional[Union[str, Path]] = None,
+        mmap: bool = True
+    ):
+        """
+        Args:
+            embedding_service: Embeds documents and queries in this process
+            shards: Number of worker processes
+            partition: 'hash' (by document id) or 'module' (by handbook module,
+                falling back to the id hash for chunks without a section)
+            projection, projection_dim, index_spec: Passed to each shard's VectorStore
+            promotion, promotion_threshold: Passed to each shard's VectorStore;
+                shards promote independently, by their own size
+            module_shards: Module partitioning: fixed shard of some modules,
+                e.g. {"COBS": 0, "SYSC": 1}; other modules are balanced
+            directory: Load each shard from directory/shard-N when it was saved there
+            mmap: Memory-map loaded shards (read-only)
+        """
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown partition '{partition}', expected one of {PARTITIONS}")
+        module_shards = dict(module_shards or {})
+        misplaced = {module: shard for module, shard in module_shards.items() if not 0 <= shard < shards}
+        if misplaced:
+            raise ValueError(f"Module shards {misplaced} are outside 0..{shards - 1}")
+        self.embedding_service = embedding_service
+        self.shards = shards
+        self.partition = partition
+        self.module_shards = module_shards
+        self.index_spec = index_spec or IndexSpec()
+        self._config = {
+            "model_name": embedding_service.model_name,
+            "projection": projection,
+            "projection_dim": projection_dim,
+            "index_spec": asdict(self.index_spec),
+            "promotion": asdict(promotion) if promotion else None,
+            "promotion_threshold": promotion_threshold,
+            "mmap": mmap,
+        }
+
+        context = mp.get_context('spawn')
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_init_shard,
+                initargs=(self._config, str(_shard_directory(directory, shard)) if directory else None)
+            )
+            for shard in range(shards)
+        ]
+        self._latencies: List[Deque[float]] = [deque(maxlen=LATENCY_WINDOW) for _ in range(shards)]
+
+        # Document.id -> shard, so replacements and deletes reach the right worker
+        self._shard_of: Dict[int, int] = {}
+        if directory:
+            for shard, ids in enumerate(self._broadcast(_shard_document_ids)):
+                self._shard_of.update(dict.fromkeys(ids, shard))
+        self._next_document_id = max(self._shard_of, default=0) + 1
+
+    @property
+    def documents(self):
+        """Ids of the stored documents"""
+        return self._shard_of.keys()
+
+    @property
+    def generation(self) -> List[int]:
+        """Current generation of each shard"""
+        return self._broadcast(_shard_generation)
+
+    def _broadcast(self, fn, *args) -> list:
+        """Run fn on every shard in parallel and wait for the results"""
+        futures = [executor.submit(fn, *args) for executor in self._executors]
+        return [future.result() for future in futures]
+
+    def _shard_sizes(self) -> List[int]:
+        """Documents stored on each shard"""
+        sizes = [0] * self.shards
+        for shard in self._shard_of.values():
+            sizes[shard] += 1
+        return sizes
+
+    def _route(self, doc: Document, sizes: List[int]) -> int:
+        """Shard of a document; sizes are the shard sizes so far, used to place unseen modules"""
+        module = handbook_module(doc) if self.partition == 'module' else None
+        if module is None:
+            return zlib.crc32(str(doc.id).encode("utf-8")) % self.shards
+        shard = self.module_shards.get(module)
+        if shard is None:
+            shard = self.module_shards[module] = sizes.index(min(sizes))
+        return shard
+
+    async def add_documents(
+        self,
+        documents: List[Document],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """Add documents across the shards; documents whose id is already stored are replaced"""
+        await self.upsert(documents, embeddings)
+
+    async def upsert(
+        self,
+        documents: List[Document],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """Embed documents once, route them to their shards and upsert there in parallel"""
+        if not documents:
+            return
+        if embeddings is None:
+            embeddings = await self.embedding_service.get_embeddings_array([doc.content for doc in documents])
+        elif len(embeddings) != len(documents):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(documents)} documents")
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        routed: Dict[int, List[int]] = {}
+        moved: Dict[int, List[int]] = {}
+        sizes = self._shard_sizes()
+        for row, doc in enumerate(documents):
+            if doc.id is None:
+                doc.id = self._next_document_id
+            self._next_document_id = max(self._next_document_id, doc.id + 1)
+            shard = self._route(doc, sizes)
+            sizes[shard] += 1
+            previous = self._shard_of.get(doc.id)
+            if previous is not None and previous != shard:
+                # Module partitioning: a chunk whose section changed moves shard
+                moved.setdefault(previous, []).append(doc.id)
+            routed.setdefault(shard, []).append(row)
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executors[shard], _shard_delete, ids)
+            for shard, ids in moved.items()
+        ))
+        await asyncio.gather(*(
+            loop.run_in_executor(
+                self._executors[shard], _shard_upsert, [documents[row] for row in rows], embeddings[rows]
+            )
+            for shard, rows in routed.items()
+        ))
+        for shard, rows in routed.items():
+            self._shard_of.update((documents[row].id, shard) for row in rows)
+
+    async def delete(self, document_ids: List[int]) -> int:
+        """Delete documents by id; returns how many were stored"""
+        by_shard: Dict[int, List[int]] = {}
+        for doc_id in set(document_ids):
+            if doc_id in self._shard_of:
+                by_shard.setdefault(self._shard_of[doc_id], []).append(doc_id)
+        loop = asyncio.get_running_loop()
+        deleted = await asyncio.gather(*(
+            loop.run_in_executor(self._executors[shard], _shard_delete, ids)
+            for shard, ids in by_shard.items()
+        ))
+        for ids in by_shard.values():
+            for doc_id in ids:
+                del self._shard_of[doc_id]
+        return sum(deleted)
+
+    async def search(
+        self,
+        query: str,
+        k: int = 5,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search every shard for similar documents; see VectorStore.search"""
+        if not self._shard_of:
+            return []
+        query_array = await self.embedding_service.get_single_embedding_array(query)
+        return (await self._scatter(_shard_search, query_array, k, k, search_params, filters))[0]
+
+    async def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search every shard for several queries at once; see VectorStore.search_many"""
+        if not queries:
+            return []
+        if not self._shard_of:
+            return [[] for _ in queries]
+        query_matrix = await self.embedding_service.get_embeddings_array(queries)
+        return await self._scatter(_shard_search, query_matrix, k, k, search_params, filters)
+
+    async def range_search(
+        self,
+        query: str,
+        score_threshold: float,
+        limit: int = 100,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Range search every shard; see VectorStore.range_search"""
+        return (await self.range_search_many([query], score_threshold, limit, search_params, filters))[0]
+
+    async def range_search_many(
+        self,
+        queries: List[str],
+        score_threshold: float,
+        limit: int = 100,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Range search every shard for several queries; see VectorStore.range_search_many"""
+        if not queries:
+            return []
+        if not self._shard_of:
+            return [[] for _ in queries]
+        query_matrix = await self.embedding_service.get_embeddings_array(queries)
+        return await self._scatter(
+            _shard_range_search, query_matrix, limit, score_threshold, limit, search_params, filters
+        )
+
+    async def _scatter(self, worker, query_matrix: np.ndarray, k: int, *args) -> List[List[Dict[str, Any]]]:
+        """Run worker(query_matrix, *args) on all shards and heap-merge each query's top-k"""
+        loop = asyncio.get_running_loop()
+
+        async def search_shard(shard: int) -> List[List[Dict[str, Any]]]:
+            started = time.perf_counter()
+            results = await loop.run_in_executor(self._executors[shard], worker, query_matrix, *args)
+            self._latencies[shard].append(time.perf_counter() - started)
+            for row in results:
+                for result in row:
+                    result["shard"] = shard
+            return results
+
+        per_shard = await asyncio.gather(*(search_shard(shard) for shard in range(self.shards)))
+        # Each shard's list is sorted by descending score; merge the sorted lists lazily
+        return [
+            list(itertools.islice(heapq.merge(*rows, key=lambda result: result["score"], reverse=True), k))
+            for rows in zip(*per_shard)
+        ]
+
+    async def lexical_search(
+        self,
+        query: str,
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 search on every shard, merged by score
+
+        Each shard scores with its own term statistics, so scores are
+        comparable only approximately across shards.
+        """
+        if not self._shard_of:
+            return []
+        loop = asyncio.get_running_loop()
+        per_shard = await asyncio.gather(*(
+            loop.run_in_executor(executor, _shard_lexical_search, query, k, filters)
+            for executor in self._executors
+        ))
+        for shard, results in enumerate(per_shard):
+            for result in results:
+                result["shard"] = shard
+        return list(itertools.islice(
+            heapq.merge(*per_shard, key=lambda result: result["score"], reverse=True), k
+        ))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-shard document counts and recent round-trip latency percentiles (ms)"""
+        counts = self._shard_sizes()
+        report = []
+        for shard, latencies in enumerate(self._latencies):
+            entry: Dict[str, Any] = {"shard": shard, "documents": counts[shard], "queries": len(latencies)}
+            if latencies:
+                millis = np.array(latencies) * 1000
+                entry.update(
+                    mean_ms=float(millis.mean()),
+                    p50_ms=float(np.percentile(millis, 50)),
+                    p95_ms=float(np.percentile(millis, 95)),
+                    max_ms=float(millis.max()),
+                )
+            report.append(entry)
+        return report
+
+    def save(self, directory: Union[str, Path]) -> None:
+        """
+        Save every shard to directory/shard-N, in parallel, plus the shard layout
+
+        Empty shards are not written (and a stale directory of theirs is
+        removed); they load as empty stores.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        futures = [
+            executor.submit(_shard_save, str(_shard_directory(directory, shard)))
+            for shard, executor in enumerate(self._executors)
+        ]
+        for shard, future in enumerate(futures):
+            if not future.result():
+                shutil.rmtree(_shard_directory(directory, shard), ignore_errors=True)
+        layout = {"shards": self.shards, "partition": self.partition, "module_shards": self.module_shards, **self._config}
+        with open(directory / f"{SHARDS_FILE}.tmp", "w", encoding="utf-8") as f:
+            json.dump(layout, f, indent=2)
+        (directory / f"{SHARDS_FILE}.tmp").replace(directory / SHARDS_FILE)
+
+    @classmethod
+    def load(
+        cls,
+        directory: Union[str, Path],
+        embedding_service: EmbeddingService,
+        mmap: bool = True
+    ) -> "ShardedVectorStore":
+        """Start workers that load the shards written by save()"""
+        with open(Path(directory) / SHARDS_FILE, encoding="utf-8") as f:
+            layout = json.load(f)
+        if layout["model_name"] != embedding_service.model_name:
+            raise ValueError(
+                f"Store was built with '{layout['model_name']}', not '{embedding_service.model_name}'"
+            )
+        return cls(
+            embedding_service,
+            shards=layout["shards"],
+            partition=layout["partition"],
+            projection=layout["projection"],
+            projection_dim=layout["projection_dim"],
+            index_spec=IndexSpec(**layout["index_spec"]),
+            promotion=IndexSpec(**layout["promotion"]) if layout["promotion"] else None,
+            promotion_threshold=layout["promotion_threshold"],
+            module_shards=layout.get("module_shards"),
+            directory=directory,
+            mmap=mmap
+        )
+
+    def close(self) -> None:
+        """Stop the shard processes"""
+        for executor in self._executors:
+            executor.shutdown()
+
+    def __enter__(self) -> 'ShardedVectorStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,89 @@
+import mmap
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional, Sequence, Union
+import numpy as np
+
+VECTORS_FILE = "vectors.f32"
+
+class VectorFile:
+    """
+    Full-precision float32 vectors in a file, one row per VectorStore label
+
+    Row label starts at byte label * dimension * 4, so rows are written once
+    at their label's position and read back through a read-only mmap: the
+    vectors stay in the page cache rather than on the Python heap. Used to
+    re-rank candidates from a compressed index with exact distances, and as
+    the source of exact vectors when such an index is rebuilt.
+    """
+
+    def __init__(self, dimension: int, path: Optional[Union[str, Path]] = None, read_only: bool = False):
+        """
+        Args:
+            dimension: Vector dimension
+            path: Existing file to read; unless read_only, writes go to a
+                private copy so the file stays as saved. A private temporary
+                file is used when omitted
+            read_only: Read path in place
+        """
+        self.dimension = dimension
+        self.read_only = read_only
+        if path is None or not read_only:
+            self._file = tempfile.TemporaryFile()
+            if path is not None:
+                with open(path, "rb") as saved:
+                    shutil.copyfileobj(saved, self._file, length=1024 * 1024)
+        else:
+            self._file = open(path, "rb")
+        self._file.seek(0, 2)
+        self._rows = self._file.tell() // (4 * dimension)
+        self._map: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        """Rows the file spans, unwritten gaps included"""
+        return self._rows
+
+    def write(self, labels: Sequence[int], vectors: np.ndarray) -> None:
+        """Write vectors to the rows of the matching labels"""
+        if self.read_only:
+            raise RuntimeError("Vector file is read-only")
+        labels = np.asarray(labels, dtype=np.int64)
+        if not len(labels):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        order = np.argsort(labels, kind='stable')
+        labels, vectors = labels[order], vectors[order]
+        # Labels are handed out in ranges, so a batch is normally one contiguous write
+        breaks = np.flatnonzero(np.diff(labels) != 1) + 1
+        for run_labels, run_vectors in zip(np.split(labels, breaks), np.split(vectors, breaks)):
+            self._file.seek(int(run_labels[0]) * 4 * self.dimension)
+            self._file.write(run_vectors.tobytes())
+        self._file.flush()
+        self._rows = max(self._rows, int(labels[-1]) + 1)
+
+    def _matrix(self) -> np.ndarray:
+        """(rows, dimension) view of the file, remapped when writes have outgrown it"""
+        current = self._map
+        if current is None or len(current) < self._rows:
+            buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            current = self._map = np.frombuffer(buffer, dtype=np.float32).reshape(-1, self.dimension)
+        return current
+
+    def get(self, labels: np.ndarray) -> np.ndarray:
+        """Vectors for an array of labels (any shape), with a trailing dimension axis"""
+        return self._matrix()[labels]
+
+    def save(self, directory: Path, rows: int, suffix: str = "") -> str:
+        """Copy the first rows rows to directory; returns the base file name written"""
+        self._file.flush()
+        self._file.seek(0)
+        with open(directory / f"{VECTORS_FILE}{suffix}", "wb") as f:
+            shutil.copyfileobj(self._file, f, length=1024 * 1024)
+            f.truncate(rows * 4 * self.dimension)
+        return VECTORS_FILE
+
+    @classmethod
+    def load(cls, directory: Path, dimension: int, read_only: bool = True) -> "VectorFile":
+        """Open a file written by save(); read-only files are memory-mapped in place, others copied"""
+        return cls(dimension, directory / VECTORS_FILE, read_only=read_only)
@@ -1,59 +1,1050 @@
-from typing import List, Optional, Dict, Any
+import json
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import List, Optional, Dict, Any, FrozenSet, Iterable, Sequence, Tuple, Union
 import numpy as np
 import faiss
 from app.models.document import Document
 from app.services.embeddings import EmbeddingService
+from app.services.document_store import DocumentStore
+from app.services.vector_file import VectorFile, VECTORS_FILE
+from app.services.index_factory import IndexSpec
+from app.services.metadata_index import MetadataIndex, DEFAULT_FIELDS
+from app.services.lexical_index import BM25Index
+from app.services.projection import build_projection, projection_training_size
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+DELTA_FILE = "delta.faiss"
+PROJECTION_FILE = "projection.faiss"
+META_FILE = "meta.json"
+
+# First depth tried by iterative-deepening range searches; doubled until the threshold is crossed
+RANGE_SEARCH_DEPTH = 32
+
+# Seconds before a failed promotion is retried; doubled after each further failure
+PROMOTION_RETRY_DELAY = 60.0
+
+def _document_text(doc: Document) -> str:
+    """Text indexed for lexical search"""
+    return f"{doc.title}\n{doc.content}"
+
+@dataclass
+class Generation:
+    """
+    One immutable, searchable state of the store
+
+    Writers never modify a published generation: they build the next one off
+    to the side and publish it with a single attribute assignment, so a reader
+    that took a generation sees a consistent set of vectors for its whole search.
+    """
+    number: int
+    index: faiss.IndexIDMap2                 # base segment, rebuilt by compaction
+    delta: Tuple[faiss.IndexIDMap2, ...]     # recent writes in immutable runs, oldest first
+    tombstones: FrozenSet[int]
+    label_limit: int                         # labels at or above this were not yet written
+    pending: bool = False                    # raw vectors in flat segments, awaiting training
+    _exclusion: Optional[tuple] = field(default=None, repr=False)
+
+    @property
+    def segments(self) -> Tuple[faiss.IndexIDMap2, ...]:
+        return (self.index,) + self.delta
+
+    @property
+    def ntotal(self) -> int:
+        return sum(segment.ntotal for segment in self.segments)
+
+    @property
+    def delta_size(self) -> int:
+        return sum(run.ntotal for run in self.delta)
+
+    def contains(self, label: int) -> bool:
+        """Whether label is a live vector in this generation"""
+        return 0 <= label < self.label_limit and label not in self.tombstones
+
+    def exclusion(self) -> Optional[tuple]:
+        """Selector rejecting tombstoned labels (first element) plus the objects it references"""
+        if self._exclusion is None and self.tombstones:
+            excluded = faiss.IDSelectorBatch(np.fromiter(self.tombstones, dtype=np.int64))
+            self._exclusion = (faiss.IDSelectorNot(excluded), excluded)
+        return self._exclusion
 
 class VectorStore:
-    def __init__(self, embedding_service: EmbeddingService):
+    """
+    FAISS-backed document store keyed by Document.id
+
+    Vectors live in IndexIDMap2 segments under per-vector labels, each mapped
+    to the Document.id it embeds. Upserting a document adds a vector under a
+    fresh label and tombstones the old one; deleting tombstones it. Tombstoned
+    labels are excluded from searches with an ID selector.
+
+    Searches read a Generation: a base index, a delta of recent writes and
+    the tombstone set. The delta is append-only: ingestion indexes each batch
+    as a new run in a worker thread and publishes a new generation with it;
+    queries keep using the one they started with. Published runs are never
+    modified. Instead the new run absorbs older runs of less than twice its
+    size, so a vector is copied O(log n) times before compaction rather than
+    on every write, and a generation holds O(log n) runs. A background
+    compaction merges the delta into a rebuilt base, dropping tombstoned
+    vectors, once the delta exceeds delta_limit or tombstones exceed
+    compaction_threshold of the index.
+
+    Searches can be restricted by metadata: a MetadataIndex keeps a bitmap of
+    live labels per indexed field value, and the evaluated filter is passed to
+    FAISS as an ID selector so only qualifying vectors are scored.
+
+    A BM25 index over title and content is kept under the same labels for
+    lexical and hybrid retrieval (see lexical_search and Retriever).
+
+    Documents are kept in a columnar DocumentStore, also indexed by label,
+    with their text in a memory-mapped blob; search results build Document
+    objects only for the hits returned.
+
+    A flat store given a promotion spec switches itself to that index (IVF or
+    IVF-PQ) once it holds promotion_threshold documents: the new index is
+    trained and populated in a background thread while searches continue on
+    the flat one, then published as a new generation. A failed promotion is
+    retried after PROMOTION_RETRY_DELAY seconds, doubled with each failure.
+
+    With a compressed index (SQ8, PQ or IVF-PQ) the full-precision vectors are
+    also written to a memory-mapped VectorFile. Searches fetch rerank
+    candidates per hit from the compressed index and re-rank them with exact
+    distances, and rebuilds re-encode the exact vectors.
+
+    An index that must be trained (IVF, SQ8, PQ) and a PCA projection are
+    not trained on whatever the first write happens to deliver. Until
+    training_size vectors have arrived, the store is pending: writes are
+    buffered unprojected in a flat delta and searched exactly. The write that
+    completes the sample trains both on the buffer and publishes the index
+    as the base in one generation.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        projection: Optional[str] = None,
+        projection_dim: Optional[int] = None,
+        index_spec: Optional[IndexSpec] = None,
+        compaction_threshold: float = 0.2,
+        metadata_fields: Sequence[str] = DEFAULT_FIELDS,
+        delta_limit: int = 50_000,
+        promotion: Optional[IndexSpec] = None,
+        promotion_threshold: int = 100_000,
+        promotion_sample: int = 100_000,
+        training_size: Optional[int] = None
+    ):
+        """
+        Args:
+            embedding_service: Service used to embed documents and queries
+            projection: Optional dimensionality reduction ('pca' or 'truncate')
+                applied to stored and query vectors
+            projection_dim: Target dimension of the projection
+            index_spec: FAISS index type and parameters (flat, HNSW or IVF);
+                defaults to exact flat search
+            compaction_threshold: Fraction of tombstoned vectors that triggers
+                a background rebuild
+            metadata_fields: Metadata fields indexed for search filters; a field
+                missing from Document.metadata falls back to the Document attribute
+                of that name (e.g. source)
+            delta_limit: Vectors the delta runs may hold before they are
+                merged into the base index
+            promotion: Index to switch a flat store to once it grows, e.g.
+                IndexSpec('ivf', nlist=1024) or IndexSpec('ivf', pq_m=48)
+            promotion_threshold: Live documents that trigger the promotion
+            promotion_sample: Maximum vectors sampled to train the promoted index
+            training_size: Vectors buffered before an index or projection that
+                needs training is trained and built; defaults to what index_spec
+                (IndexSpec.training_size) and the projection ask for. Ignored
+                after an explicit train()
+        """
+        if (projection is None) != (projection_dim is None):
+            raise ValueError("projection and projection_dim must be given together")
+        if promotion is not None and promotion.kind == 'flat':
+            raise ValueError("A flat index cannot be promoted to another flat index")
         self.embedding_service = embedding_service
-        self.index: Optional[faiss.Index] = None
-        self.documents: List[Document] = []
+        self.projection = projection
+        self.projection_dim = projection_dim
+        self.index_spec = index_spec or IndexSpec()
+        self.compaction_threshold = compaction_threshold
+        self.delta_limit = delta_limit
+        self.promotion = promotion
+        self.promotion_threshold = promotion_threshold
+        self.promotion_sample = promotion_sample
+        self.training_size = training_size
+        self.transform: Optional[faiss.VectorTransform] = None
+        self.documents = DocumentStore()
+        self.metadata_index = MetadataIndex(metadata_fields)
+        self.lexical_index = BM25Index()
         self.dimension: Optional[int] = None
+        self.read_only = False
+        self.vectors: Optional[VectorFile] = None
+
+        self._generation: Optional[Generation] = None
+        self._next_label = 0
+        self._next_document_id = 1
+
+        # One writer at a time on the event loop; the thread lock serialises the
+        # publishing of generations between writers and the compaction thread.
+        # Readers take neither.
+        self._write_lock = asyncio.Lock()
+        self._lock = threading.RLock()
+        self._compaction: Optional[threading.Thread] = None
+        self._promotion: Optional[threading.Thread] = None
+        self._promotion_failures = 0
+        self._promotion_retry_at = 0.0
+        # Held by whichever of compaction and promotion is rebuilding the base
+        self._compaction_lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Number of the generation currently served (0 before the first write)"""
+        return self._generation.number if self._generation is not None else 0
+
+    @property
+    def index(self) -> Optional[faiss.IndexIDMap2]:
+        """Base index of the current generation"""
+        return self._generation.index if self._generation is not None else None
+
+    @property
+    def ntotal(self) -> int:
+        """Vectors in the current generation, tombstoned ones included"""
+        return self._generation.ntotal if self._generation is not None else 0
+
+    def _publish(
+        self,
+        index: faiss.IndexIDMap2,
+        delta: Tuple[faiss.IndexIDMap2, ...],
+        tombstones: FrozenSet[int],
+        pending: bool = False
+    ) -> Generation:
+        """Make a new generation current (caller holds the lock)"""
+        generation = Generation(
+            number=self.generation + 1,
+            index=index,
+            delta=delta,
+            tombstones=tombstones,
+            label_limit=self._next_label,
+            pending=pending
+        )
+        self._generation = generation
+        return generation
+
+    def _create_index(self, dimension: int, training_size: Optional[int] = None) -> faiss.IndexIDMap2:
+        """Create the empty projection and index for embeddings of the given dimension"""
+        self.dimension = dimension
+        if self.projection is not None:
+            self.transform = build_projection(self.projection, dimension, self.projection_dim)
+        storage = self.index_spec.build(self.projection_dim or dimension, training_size)
+        if any(spec is not None and spec.compressed and spec.rerank for spec in (self.index_spec, self.promotion)):
+            self.vectors = VectorFile(self.projection_dim or dimension)
+        return faiss.IndexIDMap2(storage)
+
+    def _training_sample_size(self) -> int:
+        """Vectors to buffer before training the projection and index; 0 when nothing needs training"""
+        needed = self.index_spec.training_size
+        if self.projection is not None:
+            needed = max(needed, projection_training_size(self.projection, self.dimension))
+        if not needed:
+            return 0
+        return self.training_size or needed
+
+    def _start(self, dimension: int) -> Generation:
+        """First generation: an empty index, or an empty flat buffer when something must be trained first"""
+        self.dimension = dimension
+        if self._training_sample_size():
+            return self._publish(faiss.IndexIDMap2(faiss.IndexFlatL2(dimension)), (), frozenset(), pending=True)
+        return self._publish(self._create_index(dimension), (), frozenset())
 
-    async def add_documents(self, documents: List[Document]) -> None:
-        """Add documents to the vector store"""
+    def _project(self, embeddings: np.ndarray) -> np.ndarray:
+        """Apply the projection, if any, to a float32 matrix"""
+        if self.transform is None:
+            return embeddings
+        return self.transform.apply(embeddings)
+
+    def _project_queries(self, generation: Generation, query_matrix: np.ndarray) -> np.ndarray:
+        """Queries in the space of generation's vectors, which are raw while it is pending"""
+        return query_matrix if generation.pending else self._project(query_matrix)
+
+    def _rerank_depth(self, generation: Generation, search_params: Optional[Dict[str, int]]) -> int:
+        """Candidates per hit to re-rank exactly; 0 unless generation holds compressed codes"""
+        spec = self.index_spec
+        if not spec.compressed or self.vectors is None or generation.pending:
+            return 0
+        return (search_params or {}).get('rerank', spec.rerank)
+
+    def _selector(self, generation: Generation, filters: Optional[Dict[str, Any]]) -> Optional[tuple]:
+        """
+        Label selector for one search: live in generation and, with filters,
+        matching the metadata filter. The first element is the selector; the
+        rest must stay referenced while the search runs.
+        """
+        exclusion = generation.exclusion()
+        if not filters:
+            return exclusion
+        allowed = faiss.IDSelectorBitmap(self.metadata_index.evaluate(filters))
+        if exclusion is None:
+            return (allowed,)
+        return (faiss.IDSelectorAnd(allowed, exclusion[0]), allowed) + exclusion
+
+    def _search_parameters(
+        self,
+        index: faiss.IndexIDMap2,
+        overrides: Optional[Dict[str, int]],
+        selector: Optional[tuple] = None
+    ) -> tuple:
+        """
+        Build per-request FAISS search parameters for one segment
+
+        Returns the parameters plus every object they point to; the whole
+        tuple must stay referenced while the search runs.
+        """
+        params = self.index_spec.search_parameters(overrides)
+        if selector is None:
+            return (params,)
+        # Labels are external ids; translate so the storage index can test positions
+        translated = faiss.IDSelectorTranslated(index.id_map, selector[0])
+        params.sel = translated
+        return (params, translated) + selector
+
+    def train(self, embeddings: np.ndarray) -> None:
+        """
+        Train the projection (PCA) and index (IVF centroids) on a representative sample
+
+        Must be called before the first add; otherwise writes are buffered
+        until training_size vectors have arrived, and those are the sample.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self.read_only or self.ntotal:
+                raise RuntimeError("Cannot retrain an index that already holds vectors")
+            index = self._create_index(embeddings.shape[1], len(embeddings))
+            self._train(index, embeddings)
+            self._publish(index, (), frozenset())
+
+    def _train(self, index: faiss.IndexIDMap2, embeddings: np.ndarray) -> None:
+        if self.transform is not None and not self.transform.is_trained:
+            self.transform.train(embeddings)
+        if not index.is_trained:
+            index.train(self._project(embeddings))
+
+    async def add_documents(
+        self,
+        documents: List[Document],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Add documents to the vector store; documents whose id is already stored are replaced
+
+        Args:
+            documents: Documents to index; ids are assigned to documents without one
+            embeddings: Precomputed (len(documents), dim) embeddings, e.g. from an
+                EmbeddingPool bulk run; computed here when omitted
+        """
+        await self.upsert(documents, embeddings)
+
+    async def upsert(
+        self,
+        documents: List[Document],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Insert documents, or replace the stored vector and document for existing ids
+
+        The FAISS work runs in a worker thread and builds a new delta run, so
+        searches continue on the current generation until the new one is
+        published.
+        """
         if not documents:
             return
+        if self.read_only:
+            raise RuntimeError("Vector store was loaded memory-mapped and is read-only")
+
+        # Get embeddings for all documents as a contiguous float32 matrix
+        if embeddings is None:
+            texts = [doc.content for doc in documents]
+            embeddings = await self.embedding_service.get_embeddings_array(texts)
+        elif len(embeddings) != len(documents):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(documents)} documents")
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.dimension is not None and embeddings.shape[1] != self.dimension:
+            raise ValueError(f"Embeddings have dimension {embeddings.shape[1]}, store expects {self.dimension}")
+
+        async with self._write_lock:
+            # A document repeated within the batch keeps its last version
+            latest: Dict[int, int] = {}
+            for row, doc in enumerate(documents):
+                if doc.id is None:
+                    doc.id = self._next_document_id
+                self._next_document_id = max(self._next_document_id, doc.id + 1)
+                latest[doc.id] = row
+            rows = list(latest.values())
+            retired = [self.documents.label(doc_id) for doc_id in latest if doc_id in self.documents]
+
+            labels = list(range(self._next_label, self._next_label + len(rows)))
+            self._next_label += len(rows)
+
+            # Rows must be readable once a generation holds their labels; the
+            # documents only become visible by id, filter and keyword after the
+            # vectors are published, so a failed write leaves no orphans
+            added = [documents[row] for row in rows]
+            self.documents.add(labels, added)
+
+            await asyncio.to_thread(self._write_vectors, embeddings[rows], labels, retired)
+
+            self.documents.activate(labels)
+            self.metadata_index.add(labels, added)
+            self.lexical_index.add(labels, (_document_text(doc) for doc in added))
+            self.metadata_index.remove(retired)
+            self.lexical_index.remove(retired)
+
+        self._maybe_compact()
+        self._maybe_promote()
+
+    def _write_vectors(self, embeddings: np.ndarray, labels: List[int], retired: List[int]) -> None:
+        """Add vectors as a delta run (or a first base) and publish them with retired labels tombstoned"""
+        with self._lock:
+            current = self._generation
+            if current is None:
+                current = self._start(embeddings.shape[1])
+            ids = np.asarray(labels, dtype=np.int64)
+            tombstones = current.tombstones.union(retired)
+            if current.pending:
+                self._buffer(current, embeddings, ids, tombstones)
+                return
+
+            vectors = self._project(embeddings)
+            if self.vectors is not None:
+                self.vectors.write(ids, vectors)
+
+            if not current.delta and not current.index.ntotal:
+                base = faiss.IndexIDMap2(self.index_spec.empty_like(current.index.index))
+                base.add_with_ids(vectors, ids)
+                self._publish(base, (), tombstones)
+                return
+
+            self._publish(current.index, self._append_run(current, vectors, ids), tombstones)
+
+    def _run_storage(self, generation: Generation) -> faiss.Index:
+        """Empty storage for a delta run of generation: raw flat while pending, else like the base"""
+        if generation.pending:
+            return faiss.IndexFlatL2(self.dimension)
+        return self.index_spec.empty_like(generation.index.index)
+
+    def _merge_runs(self, generation: Generation, runs: Iterable[faiss.IndexIDMap2]) -> faiss.IndexIDMap2:
+        """A new delta run holding the vectors of runs in order"""
+        merged = faiss.IndexIDMap2(self._run_storage(generation))
+        for run in runs:
+            labels, vectors = self._stored_vectors(run, 0, run.ntotal)
+            merged.add_with_ids(vectors, labels)
+        return merged
+
+    def _append_run(self, current: Generation, vectors: np.ndarray, ids: np.ndarray) -> Tuple[faiss.IndexIDMap2, ...]:
+        """
+        current's delta runs plus one holding vectors (caller holds the lock)
+
+        Readers search published runs without a lock, so they are never added
+        to; the new run replaces the older runs it absorbs. Absorbing every
+        older run smaller than twice its size leaves each run at least twice
+        the next, like a binary counter.
+        """
+        run = faiss.IndexIDMap2(self._run_storage(current))
+        run.add_with_ids(vectors, ids)
+        runs = list(current.delta)
+        while runs and runs[-1].ntotal < 2 * run.ntotal:
+            run = self._merge_runs(current, (runs.pop(), run))
+        return tuple(runs) + (run,)
+
+    def _buffer(self, current: Generation, embeddings: np.ndarray, ids: np.ndarray, tombstones: FrozenSet[int]) -> None:
+        """
+        Add raw vectors to the flat buffer of a pending store (caller holds the lock)
+
+        The buffer is made of delta runs like any other, so a write does not
+        copy what earlier writes buffered. Once the buffer holds a full
+        training sample of live vectors, the projection and index are trained
+        on them and built as the new base.
+        """
+        delta = self._append_run(current, embeddings, ids)
+        if sum(run.ntotal for run in delta) - len(tombstones) < self._training_sample_size():
+            self._publish(current.index, delta, tombstones, pending=True)
+            return
 
-        # Get embeddings for all documents
-        texts = [doc.content for doc in documents]
-        embeddings = await self.embedding_service.get_embeddings(texts)
-        
-        # Initialize FAISS index if needed
-        if self.index is None:
-            self.dimension = len(embeddings[0])
-            self.index = faiss.IndexFlatL2(self.dimension)
+        buffered = [self._stored_vectors(run, 0, run.ntotal) for run in delta]
+        labels = np.concatenate([run_labels for run_labels, _ in buffered])
+        vectors = np.concatenate([run_vectors for _, run_vectors in buffered])
+        del buffered
+        keep = ~np.isin(labels, np.fromiter(tombstones, dtype=np.int64, count=len(tombstones)))
+        labels, vectors = labels[keep], vectors[keep]
+        started = time.perf_counter()
+        index = self._create_index(self.dimension, len(vectors))
+        self._train(index, vectors)
+        vectors = self._project(vectors)
+        if self.vectors is not None:
+            self.vectors.write(labels, vectors)
+        index.add_with_ids(vectors, labels)
+        published = self._publish(index, (), frozenset())
+        logger.info(
+            f"Trained {self.index_spec} on {len(labels)} buffered vectors in "
+            f"{time.perf_counter() - started:.1f}s; serving it from generation {published.number}"
+        )
 
-        # Add to FAISS index
-        embeddings_array = np.array(embeddings).astype('float32')
-        self.index.add(embeddings_array)
-        self.documents.extend(documents)
+    async def delete(self, document_ids: List[int]) -> int:
+        """Delete documents by id; returns how many were stored"""
+        if self.read_only:
+            raise RuntimeError("Vector store was loaded memory-mapped and is read-only")
+        async with self._write_lock:
+            retired = [self.documents.remove(doc_id) for doc_id in set(document_ids) if doc_id in self.documents]
+            if retired:
+                with self._lock:
+                    current = self._generation
+                    self._publish(current.index, current.delta, current.tombstones.union(retired), current.pending)
+                self.metadata_index.remove(retired)
+                self.lexical_index.remove(retired)
+        self._maybe_compact()
+        return len(retired)
+
+    @property
+    def tombstone_ratio(self) -> float:
+        if not self.ntotal:
+            return 0.0
+        return len(self._generation.tombstones) / self.ntotal
+
+    def _maybe_compact(self) -> None:
+        """Start a background compaction once the delta is large or enough vectors are tombstoned"""
+        current = self._generation
+        if current is None or current.pending:
+            # A pending store is rebuilt by training, which drops its tombstones
+            return
+        if self.tombstone_ratio <= self.compaction_threshold and current.delta_size <= self.delta_limit:
+            return
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self.compact, name="vector-store-compaction", daemon=True)
+            self._compaction.start()
+
+    def _stored_vectors(self, index: faiss.IndexIDMap2, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Labels and (projected) stored vectors for index positions [start, end)"""
+        labels = faiss.vector_to_array(index.id_map)[start:end]
+        if self.vectors is not None:
+            # Exact vectors, so rebuilding a compressed index does not re-encode its own codes
+            return labels, self.vectors.get(labels)
+        storage = faiss.downcast_index(index.index)
+        return labels, storage.reconstruct_n(start, end - start)
+
+    def _written_since(self, snapshot: Generation, current: Generation) -> Tuple[np.ndarray, np.ndarray]:
+        """Labels and stored vectors current holds that were written after snapshot, for replay"""
+        # Only the first write of an empty store goes to the base; otherwise the delta has them
+        segments = current.delta if current.index is snapshot.index else current.segments
+        labels, vectors = [], []
+        for segment in segments:
+            # Labels are assigned in write order and runs keep it, so later writes are a suffix
+            start = int(np.searchsorted(faiss.vector_to_array(segment.id_map), snapshot.label_limit))
+            if start < segment.ntotal:
+                segment_labels, segment_vectors = self._stored_vectors(segment, start, segment.ntotal)
+                labels.append(segment_labels)
+                vectors.append(segment_vectors)
+        if not labels:
+            return np.empty(0, dtype=np.int64), np.empty((0, current.index.d), dtype=np.float32)
+        return np.concatenate(labels), np.concatenate(vectors)
+
+    def compact(self) -> None:
+        """
+        Merge the delta into a rebuilt base index without tombstoned vectors
+
+        The rebuild works from a snapshot generation, off the lock. Writes
+        published in the meantime carry labels beyond the snapshot's, so their
+        vectors are replayed into the rebuilt base before it is published.
+        """
+        with self._compaction_lock:
+            with self._lock:
+                snapshot = self._generation
+                if snapshot is None or snapshot.pending or (not snapshot.tombstones and not snapshot.delta):
+                    return
+            dropped = snapshot.tombstones
+
+            rebuilt = faiss.IndexIDMap2(self.index_spec.empty_like(snapshot.index.index))
+            for segment in snapshot.segments:
+                labels, vectors = self._stored_vectors(segment, 0, segment.ntotal)
+                keep = ~np.isin(labels, np.fromiter(dropped, dtype=np.int64, count=len(dropped)))
+                rebuilt.add_with_ids(vectors[keep], labels[keep])
+                del vectors
+
+            with self._lock:
+                current = self._generation
+                # Replay vectors written since the snapshot
+                labels, vectors = self._written_since(snapshot, current)
+                rebuilt.add_with_ids(vectors, labels)
+                published = self._publish(rebuilt, (), current.tombstones - dropped)
+        logger.info(
+            f"Compacted vector store into generation {published.number}: "
+            f"dropped {len(dropped)} tombstoned vectors, {rebuilt.ntotal} remain"
+        )
+
+    def _maybe_promote(self) -> None:
+        """Start the background promotion once a flat store reaches promotion_threshold documents"""
+        if (
+            self.promotion is None
+            or self.read_only
+            or self.index_spec.kind != 'flat'
+            or len(self.documents) < self.promotion_threshold
+        ):
+            return
+        with self._lock:
+            if (
+                self._generation.pending
+                or self._promotion is not None
+                or time.monotonic() < self._promotion_retry_at
+            ):
+                return
+            self._promotion = threading.Thread(target=self.promote, name="vector-store-promotion", daemon=True)
+            self._promotion.start()
+
+    def _time_search(self, index: faiss.IndexIDMap2, spec: IndexSpec, queries: np.ndarray, k: int = 10) -> float:
+        """Mean milliseconds per query of a search on index"""
+        params = spec.search_parameters()
+        start = time.perf_counter()
+        index.search(queries, k, params=params)
+        return (time.perf_counter() - start) / len(queries) * 1000
+
+    def promote(self) -> None:
+        """
+        Rebuild the store as the promotion index and swap it in
+
+        Like compaction, the rebuild works from a snapshot generation off the
+        lock and replays the vectors written since before publishing, so the
+        flat index keeps serving until the swap. Tombstoned vectors are dropped.
+        """
+        spec = self.promotion
+        try:
+            with self._compaction_lock:
+                with self._lock:
+                    snapshot = self._generation
+                    if snapshot is None or self.index_spec.kind != 'flat':
+                        return
+                dropped = snapshot.tombstones
+                started = time.perf_counter()
+
+                labels, vectors = [], []
+                for segment in snapshot.segments:
+                    segment_labels, segment_vectors = self._stored_vectors(segment, 0, segment.ntotal)
+                    keep = ~np.isin(segment_labels, np.fromiter(dropped, dtype=np.int64, count=len(dropped)))
+                    labels.append(segment_labels[keep])
+                    vectors.append(segment_vectors[keep])
+                labels, vectors = np.concatenate(labels), np.concatenate(vectors)
+
+                rng = np.random.default_rng(0)
+                sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), self.promotion_sample), replace=False))]
+                queries = sample[rng.choice(len(sample), min(len(sample), 100), replace=False)]
+                promoted = faiss.IndexIDMap2(spec.build(vectors.shape[1], len(sample)))
+                promoted.train(sample)
+                promoted.add_with_ids(vectors, labels)
+                del vectors, sample
+
+                flat_ms = self._time_search(snapshot.index, self.index_spec, queries)
+                promoted_ms = self._time_search(promoted, spec, queries)
+
+                with self._lock:
+                    current = self._generation
+                    # Replay vectors written since the snapshot
+                    labels, vectors = self._written_since(snapshot, current)
+                    promoted.add_with_ids(vectors, labels)
+                    # Switch the spec first: readers still on a flat generation accept
+                    # IVF search parameters, an IVF generation needs them
+                    self.index_spec = spec
+                    published = self._publish(promoted, (), current.tombstones - dropped)
+        except Exception:
+            with self._lock:
+                delay = PROMOTION_RETRY_DELAY * 2 ** self._promotion_failures
+                self._promotion_failures += 1
+                self._promotion_retry_at = time.monotonic() + delay
+                self._promotion = None
+            logger.exception(
+                f"Promotion of the vector store to {spec} failed; staying on the flat index "
+                f"and retrying in {delay:.0f}s"
+            )
+            return
+        logger.info(
+            f"Promoted vector store to {spec} in generation {published.number}: "
+            f"{promoted.ntotal} vectors in {time.perf_counter() - started:.1f}s, "
+            f"search latency {flat_ms:.3f} ms -> {promoted_ms:.3f} ms per query"
+        )
 
     async def search(
-        self, 
-        query: str, 
-        k: int = 5
+        self,
+        query: str,
+        k: int = 5,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
-        """Search for similar documents"""
-        if not self.index or not self.documents:
+        """
+        Search for similar documents
+
+        Args:
+            query: Search query
+            k: Number of documents to return
+            search_params: Per-request index tuning, e.g. {"ef_search": 128} for
+                HNSW or {"nprobe": 32} for IVF
+            filters: Metadata filter, e.g. {"section": "SYSC 4"} or
+                {"$or": [{"category": "rules"}, {"source": {"$in": [...]}}]};
+                see MetadataIndex for the syntax
+
+        Each result carries the number of the generation that served it.
+        """
+        if not self.ntotal:
             return []
 
-        # Get query embedding
-        query_embedding = await self.embedding_service.get_single_embedding(query)
-        query_array = np.array([query_embedding]).astype('float32')
+        # Get query embedding as a (1, dim) float32 matrix
+        query_array = await self.embedding_service.get_single_embedding_array(query)
+        return self._search_vectors(query_array, k, search_params, filters)[0]
+
+    async def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries at once
 
-        # Search in FAISS
-        distances, indices = self.index.search(query_array, k)
-        
-        # Format results
+        All queries are embedded in one batch and answered by a single FAISS
+        search over the (n, dim) query matrix. Results are in query order;
+        filters applies to every query.
+        """
+        if not queries:
+            return []
+        if not self.ntotal:
+            return [[] for _ in queries]
+
+        query_matrix = await self.embedding_service.get_embeddings_array(queries)
+        return self._search_vectors(query_matrix, k, search_params, filters)
+
+    async def range_search(
+        self,
+        query: str,
+        score_threshold: float,
+        limit: int = 100,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Every document scoring above score_threshold, best first, at most limit
+
+        Args:
+            query: Search query
+            score_threshold: Minimum similarity score (exclusive), as in search results
+            limit: Cap on the hits returned
+            search_params: Per-request index tuning, as for search
+            filters: Metadata filter, as for search
+        """
+        return (await self.range_search_many([query], score_threshold, limit, search_params, filters))[0]
+
+    async def range_search_many(
+        self,
+        queries: List[str],
+        score_threshold: float,
+        limit: int = 100,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """range_search for several queries embedded in one batch"""
+        if not queries:
+            return []
+        if not self.ntotal:
+            return [[] for _ in queries]
+        query_matrix = await self.embedding_service.get_embeddings_array(queries)
+        return self._range_search_vectors(query_matrix, score_threshold, limit, search_params, filters)
+
+    async def lexical_search(
+        self,
+        query: str,
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """BM25 keyword search over document titles and content; score is the BM25 score"""
+        generation = self._generation
+        if generation is None:
+            return []
+        allowed = self.metadata_index.evaluate(filters) if filters else None
         results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx < len(self.documents):  # Ensure valid index
-                doc = self.documents[idx]
+        for label, score in self.lexical_index.search(query, k, allowed):
+            if generation.contains(label):
                 results.append({
-                    "document": doc,
-                    "score": float(1 / (1 + dist))  # Convert distance to similarity score
+                    "document": self.documents.get(label),
+                    "score": score,
+                    "generation": generation.number
                 })
-        
         return results
+
+    def _search_vectors(
+        self,
+        query_matrix: np.ndarray,
+        k: int,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Run one FAISS search per segment for an (n, dim) query matrix, merge and format each row"""
+        generation = self._generation
+        query_matrix = self._project_queries(generation, query_matrix)
+        selector = self._selector(generation, filters)
+        rerank = self._rerank_depth(generation, search_params)
+        candidates = k * rerank if rerank else k
+
+        distances, labels = [], []
+        for segment in generation.segments:
+            params = self._search_parameters(segment, search_params, selector)
+            segment_distances, segment_labels = segment.search(query_matrix, candidates, params=params[0])
+            distances.append(segment_distances)
+            labels.append(segment_labels)
+        if len(distances) > 1:
+            distances, labels = np.hstack(distances), np.hstack(labels)
+            order = np.argsort(distances, axis=1, kind='stable')[:, :candidates]
+            distances = np.take_along_axis(distances, order, axis=1)
+            labels = np.take_along_axis(labels, order, axis=1)
+        else:
+            distances, labels = distances[0], labels[0]
+        if rerank:
+            distances, labels = self._rerank(query_matrix, labels, k)
+
+        return [
+            self._format(generation, row_distances, row_labels)
+            for row_distances, row_labels in zip(distances, labels)
+        ]
+
+    def _format(self, generation: Generation, distances: np.ndarray, labels: np.ndarray) -> List[Dict[str, Any]]:
+        """Result entries for one query's (distance, label) pairs"""
+        results = []
+        for dist, label in zip(distances, labels):
+            if label >= 0:  # FAISS pads with -1
+                results.append({
+                    "document": self.documents.get(int(label)),
+                    "score": float(1 / (1 + dist)),  # Convert distance to similarity score
+                    "generation": generation.number
+                })
+        return results
+
+    def _range_search_vectors(
+        self,
+        query_matrix: np.ndarray,
+        score_threshold: float,
+        limit: int,
+        search_params: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Hits scoring above score_threshold for an (n, dim) query matrix, best first, at most limit per row
+
+        Scores are 1 / (1 + squared L2 distance), so the threshold is a FAISS
+        range search radius of 1 / score_threshold - 1. Flat, IVF and
+        compressed indexes without re-ranking answer the range search
+        directly. HNSW range search is bounded by its candidate list and
+        re-ranked results need exact distances, so those deepen a k-NN
+        search instead until the threshold is crossed or limit is reached.
+        """
+        if score_threshold <= 0:
+            return self._search_vectors(query_matrix, limit, search_params, filters)
+        generation = self._generation
+        if self.index_spec.kind == 'hnsw' or self._rerank_depth(generation, search_params):
+            return self._deepening_search(query_matrix, score_threshold, limit, search_params, filters)
+
+        projected = self._project_queries(generation, query_matrix)
+        selector = self._selector(generation, filters)
+        radius = 1 / score_threshold - 1
+        parts: List[List[Tuple[np.ndarray, np.ndarray]]] = [[] for _ in range(len(projected))]
+        for segment in generation.segments:
+            params = self._search_parameters(segment, search_params, selector)
+            lims, distances, labels = segment.range_search(projected, radius, params=params[0])
+            for row in range(len(projected)):
+                parts[row].append((distances[lims[row]:lims[row + 1]], labels[lims[row]:lims[row + 1]]))
+
+        all_results = []
+        for row_parts in parts:
+            distances = np.concatenate([part[0] for part in row_parts])
+            labels = np.concatenate([part[1] for part in row_parts])
+            order = np.argsort(distances, kind='stable')[:limit]
+            all_results.append(self._format(generation, distances[order], labels[order]))
+        return all_results
+
+    def _deepening_search(
+        self,
+        query_matrix: np.ndarray,
+        score_threshold: float,
+        limit: int,
+        search_params: Optional[Dict[str, int]],
+        filters: Optional[Dict[str, Any]]
+    ) -> List[List[Dict[str, Any]]]:
+        """Range search by k-NN searches of doubling depth, repeated only for rows whose every hit qualified"""
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(query_matrix)
+        pending = np.arange(len(query_matrix))
+        depth = min(limit, RANGE_SEARCH_DEPTH)
+        while len(pending):
+            params = search_params
+            if self.index_spec.kind == 'hnsw':
+                # A beam no wider than the result list misses qualifying neighbours
+                ef_search = (search_params or {}).get('ef_search', self.index_spec.ef_search)
+                params = {**(search_params or {}), 'ef_search': max(ef_search, 2 * depth)}
+            deeper = []
+            for row, hits in zip(pending, self._search_vectors(query_matrix[pending], depth, params, filters)):
+                qualifying = [hit for hit in hits if hit["score"] > score_threshold]
+                if len(qualifying) == depth < limit:
+                    deeper.append(row)
+                else:
+                    results[row] = qualifying
+            pending = np.array(deeper, dtype=np.int64)
+            depth = min(limit, depth * 2)
+        return results
+
+    def _rerank(self, query_matrix: np.ndarray, labels: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact squared L2 distances of candidate labels (-1 padded) against the VectorFile, best k per row"""
+        valid = labels >= 0
+        vectors = self.vectors.get(np.where(valid, labels, 0))
+        distances = np.square(vectors - query_matrix[:, None, :]).sum(axis=2)
+        distances[~valid] = np.inf
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(labels, order, axis=1)
+
+    def save(self, directory: Union[str, Path]) -> None:
+        """
+        Persist the current generation (index, delta, projection, exact vectors, document columns and blob)
+
+        Files are written to temporary names and renamed into place, so a
+        concurrent load never sees a half-written store. Tombstoned vectors are
+        saved as-is and stay excluded after loading.
+        """
+        if self._generation is None:
+            raise RuntimeError("Nothing to save: the vector store is empty")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            generation = self._generation
+            stored = np.concatenate([faiss.vector_to_array(segment.id_map) for segment in generation.segments])
+            live = stored[~np.isin(stored, np.fromiter(generation.tombstones, dtype=np.int64))]
+            meta = {
+                "dimension": self.dimension,
+                "count": len(live),
+                "model_name": self.embedding_service.model_name,
+                "projection": self.projection,
+                "projection_dim": self.projection_dim,
+                "index_spec": asdict(self.index_spec),
+                "next_label": generation.label_limit,
+                "metadata_fields": list(self.metadata_index.fields),
+                "generation": generation.number,
+                "pending": generation.pending,
+                "training_size": self.training_size,
+            }
+
+            faiss.write_index(generation.index, str(directory / f"{INDEX_FILE}.tmp"))
+            if generation.delta:
+                # Saved as one run
+                delta = generation.delta[0] if len(generation.delta) == 1 else self._merge_runs(generation, generation.delta)
+                faiss.write_index(delta, str(directory / f"{DELTA_FILE}.tmp"))
+            if self.transform is not None:
+                faiss.write_VectorTransform(self.transform, str(directory / f"{PROJECTION_FILE}.tmp"))
+            names = self.documents.save(directory, labels=live, suffix=".tmp")
+            if self.vectors is not None:
+                names.append(self.vectors.save(directory, generation.label_limit, suffix=".tmp"))
+            with open(directory / f"{META_FILE}.tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+
+        names += [INDEX_FILE, META_FILE]
+        if generation.delta:
+            names.append(DELTA_FILE)
+        else:
+            (directory / DELTA_FILE).unlink(missing_ok=True)
+        if self.transform is not None:
+            names.append(PROJECTION_FILE)
+        if self.vectors is None:
+            (directory / VECTORS_FILE).unlink(missing_ok=True)
+        for name in names:
+            (directory / f"{name}.tmp").replace(directory / name)
+
+    @classmethod
+    def load(
+        cls,
+        directory: Union[str, Path],
+        embedding_service: EmbeddingService,
+        mmap: bool = True
+    ) -> "VectorStore":
+        """
+        Load a store written by save()
+
+        With mmap=True the index data is memory-mapped read-only instead of
+        copied onto the heap, so restarts are near-instant and workers on the
+        same node share the page cache. Such a store cannot be added to;
+        load with mmap=False to keep ingesting. That reads the indexes and
+        copies the document blob and exact vectors to private files, so the
+        saved directory stays unchanged until the next save().
+        """
+        directory = Path(directory)
+        with open(directory / META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["model_name"] != embedding_service.model_name:
+            raise ValueError(
+                f"Store was built with '{meta['model_name']}', not '{embedding_service.model_name}'"
+            )
+
+        store = cls(
+            embedding_service,
+            projection=meta["projection"],
+            projection_dim=meta["projection_dim"],
+            index_spec=IndexSpec(**meta["index_spec"]),
+            metadata_fields=meta.get("metadata_fields", DEFAULT_FIELDS),
+            training_size=meta.get("training_size")
+        )
+        store.dimension = meta["dimension"]
+        # A pending store saved its raw buffer in flat indexes and has no projection yet
+        pending = meta.get("pending", False)
+
+        io_flags = 0
+        if mmap:
+            # IVF inverted lists and flat code arrays are mapped by different flags
+            if store.index_spec.kind in ('ivf', 'pq') and not pending:
+                io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            else:
+                io_flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+            store.read_only = True
+        index = faiss.read_index(str(directory / INDEX_FILE), io_flags)
+        # The delta is small and always read onto the heap
+        delta = (faiss.read_index(str(directory / DELTA_FILE)),) if (directory / DELTA_FILE).exists() else ()
+        if store.projection is not None and not pending:
+            store.transform = faiss.read_VectorTransform(str(directory / PROJECTION_FILE))
+
+        store.documents = DocumentStore.load(directory, read_only=store.read_only)
+        if (directory / VECTORS_FILE).exists():
+            store.vectors = VectorFile.load(
+                directory, store.projection_dim or store.dimension, read_only=store.read_only
+            )
+        if len(store.documents) != meta["count"]:
+            raise ValueError(f"Inconsistent vector store files in {directory}")
+
+        live_labels = store.documents.live_labels()
+        segments = (index,) + delta
+        all_labels = np.concatenate([faiss.vector_to_array(segment.id_map) for segment in segments])
+        tombstones = frozenset(all_labels[~np.isin(all_labels, live_labels)].tolist())
+        # Filter bitmaps and BM25 postings are rebuilt from the documents rather than persisted
+        for start in range(0, len(live_labels), 10_000):
+            labels = live_labels[start:start + 10_000].tolist()
+            live = [store.documents.get(label) for label in labels]
+            store.metadata_index.add(labels, live)
+            store.lexical_index.add(labels, (_document_text(doc) for doc in live))
+        store._next_label = meta["next_label"]
+        store._next_document_id = max(store.documents, default=0) + 1
+        store._generation = Generation(
+            number=meta.get("generation", 1),
+            index=index,
+            delta=delta,
+            tombstones=tombstones,
+            label_limit=store._next_label,
+            pending=pending
+        )
+        logger.info(
+            f"Loaded {len(store.documents)} documents from {directory} at generation {store.generation} "
+            f"({store.documents.memory_bytes() / max(len(store.documents), 1):.0f} heap bytes per document)"
+        )
+        return store
@@ -2,7 +2,7 @@
 File: rag_service.py
 Directory: src/chatgfp/core/services/rag_service.py
 Created: 2024-11-03 16:20 UTC
-Version: 1.0.0
+Version: 1.1.0
 
 Summary:
 --------
@@ -31,6 +31,7 @@ Related Files:
 Version History:
 --------------
 - 1.0.0 (2024-11-03): Initial implementation
+- 1.1.0 (2026-10-19): Takes the embedding service QueryProcessor embeds queries with
 """
 
 from typing import List, Dict, Optional, Any
@@ -38,7 +39,7 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 import logging
 from fastapi import HTTPException
-from ..steps.step_4_retrieval.query_processor import QueryProcessor, QueryContext
+from ...steps.step_4_retrieval.query_processor import QueryProcessor, QueryContext, QueryEmbedder
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -59,9 +60,14 @@ class RAGResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
 
 class RAGService:
-    def __init__(self):
-        """Initialize RAG service with query processor"""
-        self.query_processor = QueryProcessor()
+    def __init__(self, embedding_service: QueryEmbedder):
+        """
+        Initialize RAG service with query processor
+
+        Args:
+            embedding_service: Embeds queries (e.g. the app's shared EmbeddingService)
+        """
+        self.query_processor = QueryProcessor(embedding_service)
         logger.info("RAG Service initialized")
 
     async def process_query(
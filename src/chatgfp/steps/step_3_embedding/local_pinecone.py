@@ -0,0 +1,409 @@
+"""
+File: local_pinecone.py
+Directory: src/chatgfp/steps/step_3_embedding/local_pinecone.py
+Created: 2026-10-19 18:00 UTC
+Version: 1.1.0
+
+Summary:
+--------
+Local stand-in for a Pinecone index, backed by FAISS. Implements the subset
+of Pinecone's REST data-plane API that PineconeClient uses, so the RAG path
+can be exercised, load-tested and benchmarked on one machine without network
+access to Pinecone.
+
+Purpose:
+--------
+- POST /vectors/upsert, POST /query, GET /vectors/fetch, POST /vectors/delete
+- POST (or GET) /describe_index_stats
+- Namespaces, each an exact FAISS index (cosine, dotproduct or euclidean)
+- Pinecone metadata filters ($eq, $ne, $gt, $gte, $lt, $lte, $in, $nin,
+  $exists, $and, $or) applied as FAISS ID selectors
+- Optional injected query latency (a fraction of queries stall), to exercise
+  client timeouts and hedged requests against a long tail
+
+Not emulated: sparse vectors, update, list, pod/serverless limits and auth
+(the Api-Key header is accepted and ignored). Cosine indexes store, and so
+fetch returns, unit-normalized values.
+
+Dependencies:
+------------
+- fastapi
+- uvicorn
+- faiss-cpu
+- numpy
+
+Environment Variables:
+---------------------
+- LOCAL_PINECONE_DIMENSION (default 384)
+- LOCAL_PINECONE_METRIC (cosine, dotproduct or euclidean; default cosine)
+- LOCAL_PINECONE_SLOW_FRACTION, LOCAL_PINECONE_SLOW_MS (injected query tail; default off)
+
+Version History:
+--------------
+- 1.0.0 (2026-10-19): Initial implementation
+- 1.1.0 (2026-10-19): Injected query latency for tail-latency testing
+"""
+
+from typing import List, Dict, Optional, Any, Iterable
+import os
+import time
+import random
+import argparse
+import threading
+import logging
+import numpy as np
+import faiss
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, Field
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRICS = ('cosine', 'dotproduct', 'euclidean')
+
+_COMPARISONS = {
+    '$eq': lambda value, target: value == target,
+    '$ne': lambda value, target: value != target,
+    '$gt': lambda value, target: value > target,
+    '$gte': lambda value, target: value >= target,
+    '$lt': lambda value, target: value < target,
+    '$lte': lambda value, target: value <= target,
+    '$in': lambda value, target: value in target,
+    '$nin': lambda value, target: value not in target,
+}
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    """Whether one metadata value satisfies a field condition"""
+    if not isinstance(condition, dict):
+        condition = {'$eq': condition}
+    for operator, target in condition.items():
+        if operator == '$exists':
+            if (value is not None) != bool(target):
+                return False
+            continue
+        compare = _COMPARISONS.get(operator)
+        if compare is None:
+            raise ValueError(f"Unsupported filter operator '{operator}'")
+        if value is None:
+            # Missing fields only satisfy the negative operators
+            if operator not in ('$ne', '$nin'):
+                return False
+            continue
+        # A list field matches $eq/$in when any element does, and $ne/$nin when none does
+        values = value if isinstance(value, list) else [value]
+        try:
+            if operator in ('$ne', '$nin'):
+                if not all(compare(v, target) for v in values):
+                    return False
+            elif not any(compare(v, target) for v in values):
+                return False
+        except TypeError:
+            return False
+    return True
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone metadata filter against one vector's metadata"""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == '$and':
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key.startswith('$'):
+            raise ValueError(f"Unsupported filter operator '{key}'")
+        elif not _matches_condition(metadata.get(key), condition):
+            return False
+    return True
+
+class NamespaceIndex:
+    """Vectors of one namespace: an exact FAISS index plus id and metadata maps"""
+
+    def __init__(self, dimension: int, metric: str):
+        self.dimension = dimension
+        self.metric = metric
+        storage = faiss.IndexFlatL2(dimension) if metric == 'euclidean' else faiss.IndexFlatIP(dimension)
+        self.index = faiss.IndexIDMap2(storage)
+        self.labels: Dict[str, int] = {}            # vector id -> FAISS label
+        self.ids: Dict[int, str] = {}               # FAISS label -> vector id
+        self.metadata: Dict[int, Dict[str, Any]] = {}
+        self._next_label = 0
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {vectors.shape[-1]} does not match the index dimension {self.dimension}")
+        if self.metric == 'cosine':
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _remove_labels(self, labels: Iterable[int]) -> None:
+        labels = np.fromiter(labels, dtype=np.int64)
+        if not len(labels):
+            return
+        self.index.remove_ids(faiss.IDSelectorBatch(labels))
+        for label in labels.tolist():
+            del self.labels[self.ids.pop(label)]
+            del self.metadata[label]
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, metadata: List[Optional[Dict[str, Any]]]) -> None:
+        vectors = self._prepare(vectors)
+        # A repeated id keeps its last record
+        latest = {vector_id: row for row, vector_id in enumerate(ids)}
+        self._remove_labels(self.labels[vector_id] for vector_id in latest if vector_id in self.labels)
+        rows = list(latest.values())
+        labels = np.arange(self._next_label, self._next_label + len(rows), dtype=np.int64)
+        self._next_label += len(rows)
+        self.index.add_with_ids(vectors[rows], labels)
+        for label, row in zip(labels.tolist(), rows):
+            self.labels[ids[row]] = label
+            self.ids[label] = ids[row]
+            self.metadata[label] = metadata[row] or {}
+
+    def matching_labels(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        return np.fromiter(
+            (label for label, metadata in self.metadata.items() if matches_filter(metadata, filter)),
+            dtype=np.int64
+        )
+
+    def query(
+        self,
+        vector: np.ndarray,
+        top_k: int,
+        filter: Optional[Dict[str, Any]],
+        include_values: bool,
+        include_metadata: bool
+    ) -> List[Dict[str, Any]]:
+        if not len(self):
+            return []
+        query = self._prepare(vector.reshape(1, -1))
+        params = None
+        if filter:
+            allowed = self.matching_labels(filter)
+            if not len(allowed):
+                return []
+            selector = faiss.IDSelectorBatch(allowed)
+            params = faiss.SearchParameters(sel=selector)
+        scores, labels = self.index.search(query, min(top_k, len(self)), params=params)
+
+        matches = []
+        for score, label in zip(scores[0].tolist(), labels[0].tolist()):
+            if label < 0:
+                continue
+            match: Dict[str, Any] = {"id": self.ids[label], "score": score}
+            if include_values:
+                match["values"] = self.index.reconstruct(label).tolist()
+            if include_metadata:
+                match["metadata"] = self.metadata[label]
+            matches.append(match)
+        return matches
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        vectors = {}
+        for vector_id in ids:
+            label = self.labels.get(vector_id)
+            if label is not None:
+                vectors[vector_id] = {
+                    "id": vector_id,
+                    "values": self.index.reconstruct(label).tolist(),
+                    "metadata": self.metadata[label]
+                }
+        return vectors
+
+    def delete(self, ids: Optional[List[str]], filter: Optional[Dict[str, Any]]) -> None:
+        if ids:
+            self._remove_labels(self.labels[vector_id] for vector_id in set(ids) if vector_id in self.labels)
+        if filter:
+            self._remove_labels(self.matching_labels(filter).tolist())
+
+class LocalPineconeIndex:
+    """All namespaces of one stand-in index; calls are serialised by one lock"""
+
+    def __init__(self, dimension: int, metric: str = 'cosine'):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+        self.dimension = dimension
+        self.metric = metric
+        self.namespaces: Dict[str, NamespaceIndex] = {}
+        self._lock = threading.Lock()
+
+    def namespace(self, name: str, create: bool = False) -> Optional[NamespaceIndex]:
+        index = self.namespaces.get(name)
+        if index is None and create:
+            index = self.namespaces[name] = NamespaceIndex(self.dimension, self.metric)
+        return index
+
+    def stats(self, filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._lock:
+            counts = {
+                name: len(index) if not filter else len(index.matching_labels(filter))
+                for name, index in self.namespaces.items()
+                if len(index)
+            }
+        return {
+            "namespaces": {name: {"vectorCount": count} for name, count in counts.items()},
+            "dimension": self.dimension,
+            "indexFullness": 0.0,
+            "totalVectorCount": sum(counts.values()),
+            "metric": self.metric
+        }
+
+# Request bodies, using Pinecone's field names
+class VectorRecord(BaseModel):
+    id: str
+    values: List[float]
+    metadata: Optional[Dict[str, Any]] = None
+
+class UpsertRequest(BaseModel):
+    vectors: List[VectorRecord]
+    namespace: str = ""
+
+class QueryRequest(BaseModel):
+    vector: Optional[List[float]] = None
+    id: Optional[str] = None
+    topK: int = Field(10, ge=1, le=10_000)
+    filter: Optional[Dict[str, Any]] = None
+    namespace: str = ""
+    includeValues: bool = False
+    includeMetadata: bool = False
+
+class DeleteRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    deleteAll: bool = False
+    namespace: str = ""
+    filter: Optional[Dict[str, Any]] = None
+
+class DescribeIndexStatsRequest(BaseModel):
+    filter: Optional[Dict[str, Any]] = None
+
+def create_app(dimension: int, metric: str = 'cosine', slow_fraction: float = 0.0, slow_ms: float = 0.0) -> FastAPI:
+    """
+    FastAPI app serving one in-memory stand-in index
+
+    Args:
+        dimension: Vector dimension
+        metric: cosine, dotproduct or euclidean
+        slow_fraction: Fraction of queries delayed by slow_ms before they are served
+        slow_ms: Injected delay in milliseconds
+    """
+    app = FastAPI(title="Local Pinecone stand-in")
+    store = LocalPineconeIndex(dimension, metric)
+    app.state.index = store
+
+    # Handlers are sync so FastAPI runs them in its thread pool, off the event loop
+
+    @app.post("/vectors/upsert")
+    def upsert(request: UpsertRequest):
+        if not request.vectors:
+            return {"upsertedCount": 0}
+        try:
+            with store._lock:
+                store.namespace(request.namespace, create=True).upsert(
+                    [record.id for record in request.vectors],
+                    np.array([record.values for record in request.vectors], dtype=np.float32),
+                    [record.metadata for record in request.vectors]
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"upsertedCount": len(request.vectors)}
+
+    @app.post("/query")
+    def query(request: QueryRequest):
+        if (request.vector is None) == (request.id is None):
+            raise HTTPException(status_code=400, detail="Exactly one of vector and id is required")
+        if slow_fraction and random.random() < slow_fraction:
+            # Outside the lock: a stalled query must not hold up the others
+            time.sleep(slow_ms / 1000)
+        try:
+            with store._lock:
+                index = store.namespace(request.namespace)
+                if index is None:
+                    return {"matches": [], "namespace": request.namespace}
+                if request.id is not None:
+                    stored = index.fetch([request.id])
+                    if not stored:
+                        return {"matches": [], "namespace": request.namespace}
+                    vector = np.array(stored[request.id]["values"], dtype=np.float32)
+                else:
+                    vector = np.array(request.vector, dtype=np.float32)
+                matches = index.query(
+                    vector, request.topK, request.filter, request.includeValues, request.includeMetadata
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"matches": matches, "namespace": request.namespace}
+
+    @app.get("/vectors/fetch")
+    def fetch(ids: List[str] = Query(...), namespace: str = ""):
+        with store._lock:
+            index = store.namespace(namespace)
+            vectors = index.fetch(ids) if index is not None else {}
+        return {"vectors": vectors, "namespace": namespace}
+
+    @app.post("/vectors/delete")
+    def delete(request: DeleteRequest):
+        try:
+            with store._lock:
+                if request.deleteAll:
+                    store.namespaces.pop(request.namespace, None)
+                else:
+                    index = store.namespace(request.namespace)
+                    if index is not None:
+                        index.delete(request.ids, request.filter)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {}
+
+    @app.post("/describe_index_stats")
+    def describe_index_stats(request: Optional[DescribeIndexStatsRequest] = None):
+        try:
+            return store.stats(request.filter if request else None)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @app.get("/describe_index_stats")
+    def describe_index_stats_get():
+        return store.stats()
+
+    return app
+
+"""
+File Location and Purpose:
+-------------------------
+This file should be placed in:
+src/chatgfp/steps/step_3_embedding/local_pinecone.py
+
+Usage:
+------
+python -m chatgfp.steps.step_3_embedding.local_pinecone --port 5080 --dimension 384
+python -m chatgfp.steps.step_3_embedding.local_pinecone --slow-fraction 0.05 --slow-ms 200
+PINECONE_HOST=http://localhost:5080 python -m scripts.test_rag_system
+
+State lives in memory and is lost when the process stops.
+"""
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Pinecone-compatible vector service backed by FAISS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5080)
+    parser.add_argument("--dimension", type=int, default=int(os.getenv("LOCAL_PINECONE_DIMENSION", 384)))
+    parser.add_argument("--metric", default=os.getenv("LOCAL_PINECONE_METRIC", "cosine"), choices=METRICS)
+    parser.add_argument("--slow-fraction", type=float, default=float(os.getenv("LOCAL_PINECONE_SLOW_FRACTION", 0)),
+                        help="Fraction of queries to delay")
+    parser.add_argument("--slow-ms", type=float, default=float(os.getenv("LOCAL_PINECONE_SLOW_MS", 0)),
+                        help="Delay added to those queries")
+    args = parser.parse_args()
+
+    logger.info(f"Serving a {args.dimension}-dim {args.metric} stand-in index on {args.host}:{args.port}")
+    uvicorn.run(
+        create_app(args.dimension, args.metric, args.slow_fraction, args.slow_ms),
+        host=args.host, port=args.port, log_level="warning"
+    )
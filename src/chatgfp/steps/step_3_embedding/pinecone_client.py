@@ -2,7 +2,7 @@
 File: pinecone_client.py
 Directory: src/chatgfp/steps/step_3_embedding/pinecone_client.py
 Created: 2024-11-03 15:45 UTC
-Version: 1.0.0
+Version: 1.3.0
 
 Summary:
 --------
@@ -16,37 +16,675 @@ Purpose:
 - Performs vector similarity search for relevant FCA handbook content
 - Handles result processing and context aggregation
 - Provides health monitoring and logging capabilities
+- Streams bulk upserts in size-aware batches with several requests in flight,
+  per-batch retries and a resumable checkpoint
+- Async queries (aquery) over a pooled keep-alive httpx client, hedged with
+  a duplicate request once the first exceeds the recent p95 latency
+
+The client speaks Pinecone's REST data-plane API directly over a keep-alive
+session, so PINECONE_HOST can point either at a Pinecone index host or at the
+local stand-in (step_3_embedding/local_pinecone.py) for offline testing.
 
 Dependencies:
 ------------
-- pinecone-client
+- requests
+- httpx (async queries)
 - tenacity
 - numpy
 
 Environment Variables Required:
 -----------------------------
 - PINECONE_API_KEY
-- PINECONE_ENVIRONMENT
-- PINECONE_INDEX_NAME
+- PINECONE_HOST (index host, e.g. https://<index>-<project>.svc.<environment>.pinecone.io
+  or http://localhost:5080 for the local stand-in)
+- PINECONE_INDEX_NAME (reported in health checks)
 
 Version History:
 --------------
 - 1.0.0 (2024-11-03): Initial implementation
+- 1.1.0 (2026-10-19): REST data-plane client (upsert, query, fetch, delete,
+  namespaces, index stats) usable against the local stand-in
+- 1.2.0 (2026-10-19): Pipelined bulk_upsert with checkpointing and throughput report
+- 1.3.0 (2026-10-19): Async hedged queries with hedge rate and latency metrics
 """
 
-from typing import List, Dict, Optional, Any, Tuple
-import pinecone
+from typing import List, Dict, Optional, Any, Tuple, Iterable, Iterator
 import numpy as np
 import os
+import json
+import time
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
+from pathlib import Path
 import logging
-from dataclasses import dataclass
-from tenacity import retry, stop_after_attempt, wait_exponential
+from dataclasses import dataclass, field
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import AsyncRetrying, Retrying, retry, retry_if_exception, stop_after_attempt, wait_exponential
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-[... rest of the implementation remains the same ...]
+API_VERSION = "2024-07"
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Pinecone upsert limits: 2 MB per request and 1000 vectors per request
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_BATCH_VECTORS = 1000
+
+# Recent query latencies kept for the hedge delay and query_stats
+LATENCY_WINDOW = 1000
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return (
+        isinstance(error, requests.HTTPError)
+        and error.response is not None
+        and error.response.status_code in RETRYABLE_STATUS
+    )
+
+@dataclass
+class SearchResult:
+    """One match returned by a similarity query"""
+    id: str
+    score: float
+    text: str
+    source: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    values: Optional[List[float]] = None
+
+    @classmethod
+    def from_match(cls, match: Dict[str, Any]) -> 'SearchResult':
+        metadata = match.get('metadata') or {}
+        return cls(
+            id=match['id'],
+            score=float(match.get('score', 0.0)),
+            text=metadata.get('text', ''),
+            source=metadata.get('source', 'Unknown'),
+            metadata=metadata,
+            values=match.get('values') or None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Source entry in the shape RAGService expects"""
+        return {
+            'id': self.id,
+            'score': self.score,
+            'text': self.text,
+            'source': self.source,
+            'metadata': self.metadata
+        }
+
+@dataclass
+class BulkUpsertReport:
+    """Outcome of a bulk_upsert run"""
+    vectors: int = 0
+    batches: int = 0
+    bytes_sent: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    resumed_from: int = 0
+
+    @property
+    def vectors_per_second(self) -> float:
+        return self.vectors / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes_sent / 1024 / 1024 / self.seconds if self.seconds else 0.0
+
+@dataclass
+class _Batch:
+    sequence: int
+    count: int
+    body: bytes
+
+class PineconeClient:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        host: Optional[str] = None,
+        index_name: Optional[str] = None,
+        namespace: str = "",
+        timeout: float = 10.0,
+        pool_size: int = 16,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        max_hedge_rate: float = 0.1
+    ):
+        """
+        Initialize the client
+
+        Args:
+            api_key: Pinecone API key (default: PINECONE_API_KEY)
+            host: Index host URL (default: PINECONE_HOST)
+            index_name: Index name, for reporting (default: PINECONE_INDEX_NAME)
+            namespace: Namespace used when a call does not name one
+            timeout: Per-request timeout in seconds
+            pool_size: Keep-alive connections kept per host (bounds useful concurrency)
+            hedge_quantile: Latency quantile after which aquery sends a duplicate request
+            hedge_min_samples: Queries observed before hedging starts
+            max_hedge_rate: Fraction of recent queries allowed to hedge, so a slow
+                service is not sent twice the load
+        """
+        self.api_key = api_key or os.getenv("PINECONE_API_KEY", "")
+        host = host or os.getenv("PINECONE_HOST")
+        if not host:
+            raise ValueError("PINECONE_HOST is not set: pass the index host or the local stand-in URL")
+        if not host.startswith(("http://", "https://")):
+            host = f"https://{host}"
+        self.host = host.rstrip("/")
+        self.index_name = index_name or os.getenv("PINECONE_INDEX_NAME", "")
+        self.namespace = namespace
+        self.timeout = timeout
+
+        # One session: connections are kept alive and reused between calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Api-Key": self.api_key,
+            "Content-Type": "application/json",
+            "X-Pinecone-API-Version": API_VERSION
+        })
+
+        # Async client, created on first use inside the event loop that uses it
+        self.pool_size = pool_size
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self._attempt_latencies: deque = deque(maxlen=LATENCY_WINDOW)   # single requests, for the delay
+        self._query_latencies: deque = deque(maxlen=LATENCY_WINDOW)     # aquery calls, as callers see them
+        self._recent_hedges: deque = deque(maxlen=LATENCY_WINDOW)
+        self._query_counts = {"queries": 0, "hedged": 0, "hedge_wins": 0}
+        logger.info(f"Pinecone client initialized for {self.host}")
+
+    @retry(
+        retry=retry_if_exception(_is_retryable),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=0.5, max=8),
+        reraise=True
+    )
+    def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """Send one request, retrying connection errors, 429 and 5xx responses"""
+        response = self.session.request(method, f"{self.host}{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    def _namespace(self, namespace: Optional[str]) -> str:
+        return self.namespace if namespace is None else namespace
+
+    def upsert(
+        self,
+        vectors: List[Tuple[str, Any, Optional[Dict[str, Any]]]],
+        namespace: Optional[str] = None
+    ) -> int:
+        """
+        Insert or overwrite vectors
+
+        Args:
+            vectors: (id, values, metadata) tuples; metadata may be None
+            namespace: Target namespace (default: the client's)
+
+        Returns:
+            Number of vectors upserted
+        """
+        records = []
+        for vector_id, values, metadata in vectors:
+            record = {"id": str(vector_id), "values": np.asarray(values, dtype=np.float32).tolist()}
+            if metadata:
+                record["metadata"] = metadata
+            records.append(record)
+        body = self._request(
+            "POST", "/vectors/upsert",
+            json={"vectors": records, "namespace": self._namespace(namespace)}
+        )
+        return body.get("upsertedCount", len(records))
+
+    def _batches(
+        self,
+        records: Iterable[Tuple[str, Any, Optional[Dict[str, Any]]]],
+        namespace: str,
+        max_batch_size: int,
+        max_batch_bytes: int
+    ) -> Iterator[_Batch]:
+        """Encode records and cut them into request bodies within both limits"""
+        head = b'{"vectors":['
+        tail = f'],"namespace":{json.dumps(namespace)}}}'.encode()
+        encoded: List[bytes] = []
+        size = len(head) + len(tail)
+        sequence = 0
+        for vector_id, values, metadata in records:
+            record = {"id": str(vector_id), "values": np.asarray(values, dtype=np.float32).tolist()}
+            if metadata:
+                record["metadata"] = metadata
+            chunk = json.dumps(record, separators=(",", ":")).encode()
+            if len(head) + len(chunk) + len(tail) > max_batch_bytes:
+                raise ValueError(f"Vector {vector_id} alone exceeds the {max_batch_bytes} byte request limit")
+            # One byte per record for the separating comma
+            if encoded and (len(encoded) == max_batch_size or size + len(chunk) + 1 > max_batch_bytes):
+                yield _Batch(sequence, len(encoded), head + b",".join(encoded) + tail)
+                sequence += 1
+                encoded, size = [], len(head) + len(tail)
+            encoded.append(chunk)
+            size += len(chunk) + 1
+        if encoded:
+            yield _Batch(sequence, len(encoded), head + b",".join(encoded) + tail)
+
+    def _send_batch(self, batch: _Batch, max_attempts: int, report: BulkUpsertReport) -> _Batch:
+        """POST one encoded batch, retrying it on its own"""
+        def count_retry(state) -> None:
+            report.retries += 1
+            logger.warning(
+                f"Retrying upsert batch {batch.sequence} (attempt {state.attempt_number}): "
+                f"{state.outcome.exception()}"
+            )
+
+        for attempt in Retrying(
+            retry=retry_if_exception(_is_retryable),
+            stop=stop_after_attempt(max_attempts),
+            wait=wait_exponential(multiplier=0.5, max=30),
+            before_sleep=count_retry,
+            reraise=True
+        ):
+            with attempt:
+                response = self.session.post(f"{self.host}/vectors/upsert", data=batch.body, timeout=self.timeout)
+                response.raise_for_status()
+        return batch
+
+    @staticmethod
+    def _write_checkpoint(path: Path, namespace: str, completed: int) -> None:
+        temporary = path.with_name(f"{path.name}.tmp")
+        temporary.write_text(json.dumps({"namespace": namespace, "completed": completed}), encoding="utf-8")
+        temporary.replace(path)
+
+    def bulk_upsert(
+        self,
+        records: Iterable[Tuple[str, Any, Optional[Dict[str, Any]]]],
+        namespace: Optional[str] = None,
+        concurrency: int = 4,
+        max_batch_size: int = MAX_BATCH_VECTORS,
+        max_batch_bytes: int = MAX_REQUEST_BYTES,
+        max_attempts: int = 5,
+        checkpoint_path: Optional[str] = None,
+        log_every: int = 50
+    ) -> BulkUpsertReport:
+        """
+        Stream (id, values, metadata) records into the index
+
+        Records are encoded and cut into batches that respect both the vector
+        count and request size limits, and up to concurrency batches are in
+        flight while the next ones are encoded. Each batch is retried on its
+        own (connection errors, 429, 5xx) with exponential backoff.
+
+        With checkpoint_path, the number of leading records known to be stored
+        is written as batches complete. Rerunning with the same records and
+        checkpoint skips them; batches that had completed past that point are
+        upserted again, which is harmless. The checkpoint is removed once the
+        run finishes.
+
+        Args:
+            records: Iterable of (id, values, metadata); metadata may be None
+            namespace: Target namespace (default: the client's)
+            concurrency: Requests in flight at once
+            max_batch_size: Vectors per request
+            max_batch_bytes: Encoded bytes per request
+            max_attempts: Attempts per batch before the run fails
+            checkpoint_path: JSON file used to resume an interrupted run
+            log_every: Log progress every this many batches
+
+        Returns:
+            BulkUpsertReport with counts, retries and throughput
+        """
+        namespace = self._namespace(namespace)
+        report = BulkUpsertReport()
+        checkpoint = Path(checkpoint_path) if checkpoint_path else None
+        if checkpoint is not None and checkpoint.exists():
+            state = json.loads(checkpoint.read_text(encoding="utf-8"))
+            if state["namespace"] != namespace:
+                raise ValueError(f"Checkpoint {checkpoint} belongs to namespace '{state['namespace']}'")
+            report.resumed_from = state["completed"]
+            records = itertools.islice(records, report.resumed_from, None)
+            logger.info(f"Resuming bulk upsert after {report.resumed_from} records")
+
+        batch_counts: Dict[int, int] = {}   # submitted batch -> records, until the checkpoint passes it
+        finished: set = set()
+        next_sequence = 0
+        completed = report.resumed_from
+        start = time.perf_counter()
+
+        def settle(futures: Iterable[Future], raise_errors: bool = True) -> None:
+            """Account for finished requests and advance the checkpoint over the completed prefix"""
+            nonlocal next_sequence, completed
+            error = None
+            for future in futures:
+                if future.cancelled() or future.exception() is not None:
+                    error = error or (None if future.cancelled() else future.exception())
+                    continue
+                batch = future.result()
+                finished.add(batch.sequence)
+                report.vectors += batch.count
+                report.batches += 1
+                report.bytes_sent += len(batch.body)
+                if report.batches % log_every == 0:
+                    rate = report.vectors / (time.perf_counter() - start)
+                    logger.info(f"Upserted {report.vectors} vectors in {report.batches} batches ({rate:.0f} vectors/s)")
+            advanced = next_sequence in finished
+            while next_sequence in finished:
+                finished.discard(next_sequence)
+                completed += batch_counts.pop(next_sequence)
+                next_sequence += 1
+            if advanced and checkpoint is not None:
+                self._write_checkpoint(checkpoint, namespace, completed)
+            if error is not None and raise_errors:
+                raise error
+
+        in_flight: set = set()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                for batch in self._batches(records, namespace, max_batch_size, max_batch_bytes):
+                    batch_counts[batch.sequence] = batch.count
+                    in_flight.add(executor.submit(self._send_batch, batch, max_attempts, report))
+                    if len(in_flight) >= concurrency:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        settle(done)
+                done, in_flight = wait(in_flight).done, set()
+                settle(done)
+            except BaseException:
+                # Let requests already sent finish so the checkpoint is as far along as possible
+                for future in in_flight:
+                    future.cancel()
+                settle(wait(in_flight).done, raise_errors=False)
+                raise
+            finally:
+                report.seconds = time.perf_counter() - start
+
+        if checkpoint is not None:
+            checkpoint.unlink(missing_ok=True)
+        logger.info(
+            f"Bulk upsert finished: {report.vectors} vectors in {report.batches} batches, "
+            f"{report.vectors_per_second:.0f} vectors/s, {report.retries} retries"
+        )
+        return report
+
+    def query(
+        self,
+        vector: Any,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None,
+        include_metadata: bool = True,
+        include_values: bool = False
+    ) -> List[SearchResult]:
+        """
+        Similarity search for one query vector
+
+        Args:
+            vector: Query embedding
+            top_k: Number of matches
+            filter: Pinecone metadata filter, e.g. {"section": {"$in": ["COBS 9"]}}
+            namespace: Namespace to search (default: the client's)
+            include_metadata: Return match metadata (needed for text and source)
+            include_values: Return the stored vectors
+        """
+        payload = self._query_payload(vector, top_k, filter, namespace, include_metadata, include_values)
+        body = self._request("POST", "/query", json=payload)
+        return [SearchResult.from_match(match) for match in body.get("matches", [])]
+
+    def _query_payload(
+        self,
+        vector: Any,
+        top_k: int,
+        filter: Optional[Dict[str, Any]],
+        namespace: Optional[str],
+        include_metadata: bool,
+        include_values: bool
+    ) -> Dict[str, Any]:
+        payload = {
+            "vector": np.asarray(vector, dtype=np.float32).tolist(),
+            "topK": top_k,
+            "namespace": self._namespace(namespace),
+            "includeMetadata": include_metadata,
+            "includeValues": include_values
+        }
+        if filter:
+            payload["filter"] = filter
+        return payload
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Pooled keep-alive client bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            # Connections cannot move between loops; one left behind by a finished loop is dropped
+            self._async_client = httpx.AsyncClient(
+                base_url=self.host,
+                headers=dict(self.session.headers),
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    async def _arequest(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """Async _request: the same retry policy over the pooled httpx client"""
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception(_is_retryable),
+            stop=stop_after_attempt(3),
+            wait=wait_exponential(multiplier=0.5, max=8),
+            reraise=True
+        ):
+            with attempt:
+                response = await self.async_client.request(method, path, **kwargs)
+                response.raise_for_status()
+        return response.json() if response.content else {}
+
+    async def _timed_query(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        body = await self._arequest("POST", "/query", json=payload)
+        self._attempt_latencies.append(time.perf_counter() - start)
+        return body
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging a query, or None while hedging is off"""
+        if len(self._attempt_latencies) < self.hedge_min_samples:
+            return None
+        if self._recent_hedges and sum(self._recent_hedges) / len(self._recent_hedges) >= self.max_hedge_rate:
+            return None
+        return float(np.quantile(self._attempt_latencies, self.hedge_quantile))
+
+    async def _hedged_query(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send the query; if it outlasts hedge_delay, send it again and take the first success"""
+        start = time.perf_counter()
+        primary = asyncio.create_task(self._timed_query(payload))
+        pending = {primary}
+        error: Optional[BaseException] = None
+        try:
+            # Inside the try, so a caller cancelled or timed out while waiting stops the request
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done:
+                self._recent_hedges.append(0)
+                return primary.result()
+
+            self._recent_hedges.append(1)
+            self._query_counts["hedged"] += 1
+            hedge = asyncio.create_task(self._timed_query(payload))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if task is hedge:
+                        self._query_counts["hedge_wins"] += 1
+                        # The losing primary still counts, censored at the time it was abandoned
+                        self._attempt_latencies.append(time.perf_counter() - start)
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def aquery(
+        self,
+        vector: Any,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None,
+        include_metadata: bool = True,
+        include_values: bool = False,
+        hedge: bool = True
+    ) -> List[SearchResult]:
+        """
+        Async similarity search for one query vector
+
+        Uses the pooled async client. With hedge, a duplicate request is sent
+        when the first has taken longer than the hedge_quantile of recent
+        request latencies, and whichever answers first is returned.
+
+        Args:
+            vector: Query embedding
+            top_k: Number of matches
+            filter: Pinecone metadata filter
+            namespace: Namespace to search (default: the client's)
+            include_metadata: Return match metadata (needed for text and source)
+            include_values: Return the stored vectors
+            hedge: Allow a hedged duplicate request
+        """
+        payload = self._query_payload(vector, top_k, filter, namespace, include_metadata, include_values)
+        start = time.perf_counter()
+        body = await (self._hedged_query(payload) if hedge else self._timed_query(payload))
+        self._query_latencies.append(time.perf_counter() - start)
+        self._query_counts["queries"] += 1
+        return [SearchResult.from_match(match) for match in body.get("matches", [])]
+
+    def query_stats(self) -> Dict[str, Any]:
+        """Hedge rate and latency percentiles of recent aquery calls"""
+        counts = self._query_counts
+        delay = self.hedge_delay()
+        stats = {
+            **counts,
+            "hedge_rate": counts["hedged"] / counts["queries"] if counts["queries"] else 0.0,
+            "hedge_win_rate": counts["hedge_wins"] / counts["hedged"] if counts["hedged"] else 0.0,
+            "hedge_delay_ms": None if delay is None else delay * 1000
+        }
+        if self._query_latencies:
+            millis = np.array(self._query_latencies) * 1000
+            stats.update({
+                "p50_ms": float(np.percentile(millis, 50)),
+                "p95_ms": float(np.percentile(millis, 95)),
+                "p99_ms": float(np.percentile(millis, 99)),
+                "max_ms": float(millis.max())
+            })
+        return stats
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Stored vectors and metadata by id; unknown ids are absent from the result"""
+        body = self._request(
+            "GET", "/vectors/fetch",
+            params={"ids": [str(i) for i in ids], "namespace": self._namespace(namespace)}
+        )
+        return body.get("vectors", {})
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> None:
+        """Delete vectors by id, by metadata filter, or every vector in the namespace"""
+        if not (ids or delete_all or filter):
+            raise ValueError("Pass ids, filter or delete_all=True")
+        payload: Dict[str, Any] = {"namespace": self._namespace(namespace)}
+        if ids:
+            payload["ids"] = [str(i) for i in ids]
+        if delete_all:
+            payload["deleteAll"] = True
+        if filter:
+            payload["filter"] = filter
+        self._request("POST", "/vectors/delete", json=payload)
+
+    def describe_index_stats(self, filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Dimension, total vector count and per-namespace vector counts"""
+        return self._request("POST", "/describe_index_stats", json={"filter": filter} if filter else {})
+
+    def aggregate_context(
+        self,
+        results: List[SearchResult],
+        max_chars: int = 4000,
+        min_score: float = 0.0
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Join match texts, best first, into one context string
+
+        Args:
+            results: Matches from query()
+            max_chars: Stop adding matches once the context would exceed this
+            min_score: Skip matches scoring below this
+
+        Returns:
+            Context string and the source entries it was built from
+        """
+        parts, sources, length = [], [], 0
+        for result in sorted(results, key=lambda r: r.score, reverse=True):
+            if result.score < min_score or not result.text:
+                continue
+            if parts and length + len(result.text) > max_chars:
+                break
+            parts.append(result.text)
+            sources.append(result.to_dict())
+            length += len(result.text)
+        return "\n\n".join(parts), sources
+
+    def get_health_check(self) -> Dict[str, Any]:
+        """Round-trip an index stats call and report status, latency and counts"""
+        start = time.perf_counter()
+        try:
+            stats = self.describe_index_stats()
+        except requests.RequestException as e:
+            logger.error(f"Pinecone health check failed: {str(e)}")
+            return {
+                "status": "unhealthy",
+                "host": self.host,
+                "index_name": self.index_name,
+                "error": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        return {
+            "status": "healthy",
+            "host": self.host,
+            "index_name": self.index_name,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "dimension": stats.get("dimension"),
+            "total_vector_count": stats.get("totalVectorCount", 0),
+            "namespaces": stats.get("namespaces", {}),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.session.close()
+
+    async def aclose(self) -> None:
+        """Close the async client's pooled connections"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
 
 """
 File Location and Purpose:
@@ -54,15 +692,14 @@ File Location and Purpose:
 This file should be placed in:
 src/chatgfp/steps/step_3_embedding/pinecone_client.py
 
-This module serves as the interface between the ChatGFP application and the 
+This module serves as the interface between the ChatGFP application and the
 Pinecone vector database containing pre-embedded FCA Handbook content.
 
 Next Steps:
 ----------
 1. Implement unit tests in: tests/step_3_embedding/test_pinecone_client.py
 2. Add integration tests for Pinecone connection
-3. Implement query processing component
-4. Add monitoring and alerting for Pinecone health checks
+3. Add monitoring and alerting for Pinecone health checks
 
 For questions or modifications, contact: [Your Contact Info]
-"""
\ No newline at end of file
+"""
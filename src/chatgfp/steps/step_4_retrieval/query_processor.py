@@ -0,0 +1,169 @@
+"""
+File: query_processor.py
+Directory: src/chatgfp/steps/step_4_retrieval/query_processor.py
+Created: 2026-10-19 18:30 UTC
+Version: 1.3.1
+
+Summary:
+--------
+Turns a user question into a vector search against the Pinecone index and
+returns the retrieved FCA Handbook context with its sources. Used by
+RAGService (core/services/rag_service.py).
+
+Purpose:
+--------
+- Embed queries through the embedding service it is given (normally the
+  app's shared EmbeddingService, app/services/embeddings.py), so the model is
+  loaded once per process and repeated queries hit its query embedding cache
+- Detect handbook references (e.g. "COBS 9.2") and the question type
+- Query PineconeClient with optional metadata filters and aggregate context
+- Optionally diversify matches with MMR (ResultRanker) before aggregation
+
+Dependencies:
+------------
+- numpy
+- PineconeClient (step_3_embedding/pinecone_client.py)
+- ResultRanker (step_4_retrieval/result_ranker.py)
+
+Environment Variables:
+---------------------
+- PINECONE_HOST, PINECONE_API_KEY (see PineconeClient)
+
+Version History:
+--------------
+- 1.0.0 (2026-10-19): Initial implementation
+- 1.1.0 (2026-10-19): Hedged async queries (PineconeClient.aquery)
+- 1.2.0 (2026-10-19): MMR diversification of matches
+- 1.3.0 (2026-10-19): Embed through EmbeddingService instead of a private model
+- 1.3.1 (2026-10-19): Embedding service is a constructor dependency, not imported from app
+"""
+
+from typing import List, Dict, Optional, Any, Tuple, Protocol
+import re
+import logging
+from dataclasses import dataclass
+import numpy as np
+from ..step_3_embedding.pinecone_client import PineconeClient
+from .result_ranker import ResultRanker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Handbook module followed by a reference, e.g. "COBS 9.2.1R" or "SYSC 4"
+HANDBOOK_REFERENCE = re.compile(r'\b([A-Z]{2,6})\s+(\d+(?:\.\d+)*[A-Z]?)\b')
+
+# Checked in order; the first question type with a matching cue wins
+QUESTION_TYPES = {
+    'obligation': ('must', 'required', 'requirement', 'obliged', 'need to'),
+    'definition': ('what is', 'what are', 'define', 'meaning of'),
+    'procedure': ('how do', 'how should', 'how to', 'how can', 'steps'),
+    'explanation': ('explain', 'why', 'describe'),
+}
+
+class QueryEmbedder(Protocol):
+    """What QueryProcessor needs of an embedding service (EmbeddingService provides it)"""
+    model_name: str
+
+    async def get_single_embedding_array(self, text: str) -> np.ndarray:
+        """(1, dim) float32 embedding of text"""
+        ...
+
+@dataclass
+class QueryContext:
+    """Per-query retrieval options"""
+    query: str
+    metadata_filters: Optional[Dict[str, Any]] = None
+    top_k: int = 5
+    namespace: Optional[str] = None
+    min_score: float = 0.0
+
+class QueryProcessor:
+    def __init__(
+        self,
+        embedding_service: QueryEmbedder,
+        client: Optional[PineconeClient] = None,
+        top_k: int = 5,
+        max_context_chars: int = 4000,
+        ranker: Optional[ResultRanker] = None
+    ):
+        """
+        Args:
+            embedding_service: Embeds queries, e.g. the app's EmbeddingService;
+                its model must match the one used to build the index
+            client: Vector service client (default: PineconeClient from the environment)
+            top_k: Matches retrieved per query unless the QueryContext says otherwise
+            max_context_chars: Upper bound on the aggregated context
+            ranker: Diversifies a pool of ranker.pool_size matches down to top_k (MMR)
+        """
+        self.embedding_service = embedding_service
+        self.model_name = embedding_service.model_name
+        self.client = client or PineconeClient()
+        self.top_k = top_k
+        self.max_context_chars = max_context_chars
+        self.ranker = ranker
+
+    async def generate_embedding(self, query: str) -> np.ndarray:
+        """Normalized float32 embedding of one query"""
+        # The cached array is shared with other callers, so normalize a copy
+        embedding = (await self.embedding_service.get_single_embedding_array(query))[0]
+        return embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+    def analyze_query_intent(self, query: str) -> Dict[str, Any]:
+        """Handbook references, modules and question type found in the query"""
+        references = [f"{module} {reference}" for module, reference in HANDBOOK_REFERENCE.findall(query)]
+        lowered = query.lower()
+        question_type = next(
+            (name for name, cues in QUESTION_TYPES.items() if any(cue in lowered for cue in cues)),
+            'general'
+        )
+        return {
+            'references': references,
+            'modules': sorted({reference.split()[0] for reference in references}),
+            'question_type': question_type,
+            'length': len(query.split())
+        }
+
+    async def process_query(
+        self,
+        query: str,
+        conversation_id: Optional[str] = None,
+        context: Optional[QueryContext] = None
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Retrieve context for a query
+
+        Args:
+            query: User question
+            conversation_id: Conversation the query belongs to (logged only)
+            context: Filters, namespace and top_k for this query
+
+        Returns:
+            Aggregated context text and its source entries
+        """
+        context = context or QueryContext(query=query, top_k=self.top_k)
+        embedding = await self.generate_embedding(query)
+        results = await self.client.aquery(
+            embedding,
+            top_k=max(context.top_k, self.ranker.pool_size) if self.ranker else context.top_k,
+            filter=context.metadata_filters,
+            namespace=context.namespace,
+            include_values=self.ranker is not None
+        )
+        if self.ranker is not None:
+            results = self.ranker.rerank(embedding, results, context.top_k)
+        logger.info(f"Query for conversation {conversation_id} retrieved {len(results)} matches")
+        return self.client.aggregate_context(results, self.max_context_chars, context.min_score)
+
+"""
+File Location and Purpose:
+-------------------------
+This file should be placed in:
+src/chatgfp/steps/step_4_retrieval/query_processor.py
+
+Next Steps:
+----------
+1. Implement unit tests in: tests/step_4/test_query_processor.py
+2. Use detected handbook references as metadata filters
+
+For questions or modifications, contact: [Your Contact Info]
+"""
@@ -0,0 +1,150 @@
+"""
+File: result_ranker.py
+Directory: src/chatgfp/steps/step_4_retrieval/result_ranker.py
+Created: 2026-10-19 21:30 UTC
+Version: 1.1.0
+
+Summary:
+--------
+Diversifies retrieved FCA Handbook chunks with maximal marginal relevance
+(MMR), so the top-k is not filled with near-duplicate chunks of the same
+section. Used by QueryProcessor (step_4_retrieval/query_processor.py).
+
+Purpose:
+--------
+- Select k of a candidate pool by MMR: each pick maximizes
+  lambda * relevance - (1 - lambda) * max similarity to the picks so far
+- Compute all pairwise similarities as one NumPy matrix product; the greedy
+  selection then only updates a vector per pick
+- Rerank PineconeClient SearchResults fetched with their values, turning
+  euclidean distances into similarities (1 / (1 + d)) so that a closer match
+  always counts as more relevant
+
+Dependencies:
+------------
+- numpy
+- PineconeClient (step_3_embedding/pinecone_client.py)
+
+Version History:
+--------------
+- 1.0.0 (2026-10-19): Initial implementation
+- 1.1.0 (2026-10-19): Index metric argument; euclidean scores are distances
+"""
+
+from typing import List, Optional
+import logging
+import numpy as np
+from ..step_3_embedding.pinecone_client import SearchResult
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pinecone index metrics; only euclidean scores are distances (lower is closer)
+METRICS = ('cosine', 'dotproduct', 'euclidean')
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+def mmr(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    relevance: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Indices of k candidates chosen by maximal marginal relevance, in pick order
+
+    Args:
+        query_vector: (d,) query embedding
+        candidate_vectors: (n, d) candidate embeddings
+        k: Number of candidates to select
+        lambda_mult: 1.0 ranks by relevance only, 0.0 by diversity only
+        relevance: (n,) relevance scores (default: cosine similarity to the query)
+    """
+    candidates = _unit_rows(candidate_vectors)
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if relevance is None:
+        relevance = candidates @ _unit_rows(query_vector)
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    # Every pairwise cosine similarity in one product; each pick reads one row
+    similarity = candidates @ candidates.T
+    weighted = lambda_mult * relevance
+    selected = np.empty(k, dtype=np.int64)
+    selected[0] = int(np.argmax(relevance))
+    closest = similarity[selected[0]].copy()   # max similarity of each candidate to the picks
+    taken = np.zeros(n, dtype=bool)
+    taken[selected[0]] = True
+    for i in range(1, k):
+        scores = weighted - (1 - lambda_mult) * closest
+        scores[taken] = -np.inf
+        pick = int(np.argmax(scores))
+        selected[i] = pick
+        taken[pick] = True
+        np.maximum(closest, similarity[pick], out=closest)
+    return selected
+
+def relevance_scores(scores: np.ndarray, metric: str = 'cosine') -> np.ndarray:
+    """Index scores as similarities, higher meaning more relevant"""
+    scores = np.asarray(scores, dtype=np.float32)
+    if metric == 'euclidean':
+        return 1.0 / (1.0 + np.maximum(scores, 0.0))
+    return scores
+
+class ResultRanker:
+    def __init__(self, lambda_mult: float = 0.5, pool_size: int = 100, metric: str = 'cosine'):
+        """
+        Args:
+            lambda_mult: Trade-off between relevance (1.0) and diversity (0.0)
+            pool_size: Candidates to retrieve and diversify per query
+            metric: Metric of the index the results come from (cosine,
+                dotproduct or euclidean)
+        """
+        if not 0.0 <= lambda_mult <= 1.0:
+            raise ValueError(f"lambda_mult must be between 0 and 1, got {lambda_mult}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+        self.lambda_mult = lambda_mult
+        self.pool_size = pool_size
+        self.metric = metric
+
+    def rerank(self, query_vector: np.ndarray, results: List[SearchResult], k: int) -> List[SearchResult]:
+        """
+        Diversify results, which must carry their vectors (query with include_values=True)
+
+        Relevance is each result's own score (as a similarity for euclidean
+        indexes), so MMR trades off the ranking the index produced; the
+        original order is kept when vectors are missing.
+        """
+        if len(results) <= 1:
+            return results[:k]
+        if any(result.values is None for result in results):
+            logger.warning("Results were fetched without values; skipping MMR")
+            return results[:k]
+        order = mmr(
+            query_vector,
+            np.array([result.values for result in results], dtype=np.float32),
+            k,
+            self.lambda_mult,
+            relevance=relevance_scores([result.score for result in results], self.metric)
+        )
+        return [results[i] for i in order]
+
+"""
+File Location and Purpose:
+-------------------------
+This file should be placed in:
+src/chatgfp/steps/step_4_retrieval/result_ranker.py
+
+Next Steps:
+----------
+1. Implement unit tests in: tests/step_4/test_result_ranker.py
+2. Benchmark: python scripts/benchmark_mmr.py
+
+For questions or modifications, contact: [Your Contact Info]
+"""
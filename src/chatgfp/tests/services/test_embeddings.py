@@ -0,0 +1,17 @@
+import importlib.util
+import pytest
+from app.services.embeddings import EmbeddingService
+
+def test_onnx_backend_without_onnxruntime_fails_at_construction(monkeypatch):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name, *args: None if name == "onnxruntime" else find_spec(name, *args))
+
+    with pytest.raises(ImportError, match="onnxruntime"):
+        EmbeddingService("all-MiniLM-L6-v2", backend="onnx")
+    # The torch backend does not need it
+    EmbeddingService("all-MiniLM-L6-v2", backend="torch")
+
+@pytest.mark.parametrize("options", [{"backend": "tensorflow"}, {"backend": "torch", "quantize": True}])
+def test_invalid_backend_options_are_rejected(options):
+    with pytest.raises(ValueError):
+        EmbeddingService("all-MiniLM-L6-v2", **options)
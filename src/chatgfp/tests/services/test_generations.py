@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from app.services.vector_store import VectorStore
+from tests.conftest import Document, make_documents
+
+def test_published_generation_is_not_modified_by_later_writes(embedding_service):
+    store = VectorStore(embedding_service, compaction_threshold=1.0)
+    asyncio.run(store.upsert(make_documents(3)))
+    asyncio.run(store.upsert(make_documents(2, start=4)))
+    snapshot = store._generation
+    snapshot_delta = snapshot.delta_size
+    replaced_label, deleted_label = store.documents.label(1), store.documents.label(2)
+
+    asyncio.run(store.upsert([Document(id=1, title="Rule 1", content="rewritten rule")]))
+    asyncio.run(store.delete([2]))
+
+    assert store.generation == snapshot.number + 2
+    assert snapshot.delta_size == snapshot_delta
+    assert snapshot.tombstones == frozenset()
+    assert snapshot.contains(replaced_label) and snapshot.contains(deleted_label)
+    assert not snapshot.contains(store.documents.label(1))
+    # Rows are never rewritten, so the snapshot still reads the old versions
+    assert store.documents.get(replaced_label).content == make_documents(1)[0].content
+    assert store.documents.get(deleted_label).id == 2
+    assert not store._generation.contains(replaced_label)
+
+def test_failed_vector_write_leaves_no_orphans(embedding_service, monkeypatch):
+    store = VectorStore(embedding_service)
+    asyncio.run(store.upsert(make_documents(3, section="COBS 9")))
+    generation = store.generation
+
+    def fail(*args):
+        raise MemoryError("index full")
+    monkeypatch.setattr(store, "_write_vectors", fail)
+    with pytest.raises(MemoryError):
+        asyncio.run(store.upsert([
+            Document(id=2, title="Rule 2", content="replacement never stored", metadata={"section": "SYSC 4"}),
+            Document(id=9, title="Rule 9", content="orphan candidate", metadata={"section": "SYSC 4"}),
+        ]))
+
+    assert store.generation == generation
+    assert 9 not in store.documents
+    assert store.documents[2].content == make_documents(2)[1].content
+    assert store.metadata_index.count(store.metadata_index.evaluate({"section": "SYSC 4"})) == 0
+    assert asyncio.run(store.lexical_search("orphan candidate")) == []
+    assert asyncio.run(store.lexical_search("replacement never stored")) == []
+
+    monkeypatch.undo()
+    asyncio.run(store.upsert([Document(id=9, title="Rule 9", content="stored later", metadata={"section": "SYSC 4"})]))
+    assert store.documents[9].content == "stored later"
+    hits = asyncio.run(store.search("stored later", k=1, filters={"section": "SYSC 4"}))
+    assert [hit["document"].id for hit in hits] == [9]
+
+def test_single_document_writes_never_modify_published_runs(embedding_service):
+    store = VectorStore(embedding_service, compaction_threshold=1.0)
+    asyncio.run(store.upsert(make_documents(1)))
+    published = []
+    for doc_id in range(2, 102):
+        asyncio.run(store.upsert(make_documents(1, start=doc_id)))
+        generation = store._generation
+        published.append((generation, [run.ntotal for run in generation.delta]))
+
+    for generation, sizes in published:
+        assert [run.ntotal for run in generation.delta] == sizes
+    # Runs merge like a binary counter: 100 single writes leave 64 + 32 + 4
+    assert [run.ntotal for run in store._generation.delta] == [64, 32, 4]
+    hits = asyncio.run(store.search(make_documents(1, start=50)[0].content, k=1))
+    assert hits[0]["document"].id == 50
@@ -0,0 +1,109 @@
+import asyncio
+import faiss
+import pytest
+from app.services.index_factory import IndexSpec
+from app.services.vector_store import VectorStore
+from tests.conftest import make_documents, random_embeddings
+
+def _add_one_by_one(store, embeddings, start=1):
+    for row in range(len(embeddings)):
+        asyncio.run(store.upsert(make_documents(1, start=start + row), embeddings[row:row + 1]))
+
+def _nearest(store, queries):
+    return [hits[0]["document"].id for hits in store._search_vectors(queries, k=1)]
+
+def test_training_sizes_follow_the_index_kind():
+    assert IndexSpec().training_size == 0
+    assert IndexSpec('hnsw').training_size == 0
+    assert IndexSpec('sq8').training_size == 1000
+    assert IndexSpec('pq', pq_m=8).training_size == 256 * 39
+    assert IndexSpec('ivf', nlist=16).training_size == 16 * 39
+    assert IndexSpec('ivf', nlist=16, pq_m=8).training_size == 256 * 39
+
+@pytest.mark.parametrize("spec", [IndexSpec('sq8'), IndexSpec('pq', pq_m=4)])
+def test_compressed_index_waits_for_a_training_sample(embedding_service, spec):
+    store = VectorStore(embedding_service, index_spec=spec, training_size=300)
+    embeddings = random_embeddings(300)
+
+    _add_one_by_one(store, embeddings[:299])
+    assert store._generation.pending
+    # Buffered in flat runs, one per set bit of 299
+    delta = store._generation.delta
+    assert [run.ntotal for run in delta] == [256, 32, 8, 2, 1]
+    assert all(isinstance(faiss.downcast_index(run.index), faiss.IndexFlatL2) for run in delta)
+    # Buffered vectors are searched exactly
+    assert _nearest(store, embeddings[:20]) == list(range(1, 21))
+
+    _add_one_by_one(store, embeddings[299:], start=300)
+    generation = store._generation
+    assert not generation.pending
+    assert generation.delta == () and generation.index.ntotal == 300
+    assert generation.index.is_trained
+    assert _nearest(store, embeddings[:20]) == list(range(1, 21))
+
+def test_vectors_deleted_while_pending_are_not_trained_on(embedding_service):
+    store = VectorStore(embedding_service, index_spec=IndexSpec('sq8'), training_size=100)
+    embeddings = random_embeddings(110)
+    _add_one_by_one(store, embeddings[:60])
+    asyncio.run(store.delete(list(range(1, 11))))
+
+    _add_one_by_one(store, embeddings[60:99], start=61)
+    assert store._generation.pending
+    _add_one_by_one(store, embeddings[99:110], start=100)
+
+    generation = store._generation
+    assert not generation.pending
+    assert generation.index.ntotal == 100 and not generation.tombstones
+    assert set(_nearest(store, embeddings[:10])).isdisjoint(range(1, 11))
+
+def test_explicit_train_skips_the_buffer(embedding_service):
+    store = VectorStore(embedding_service, index_spec=IndexSpec('sq8'))
+    store.train(random_embeddings(500, seed=3))
+    embeddings = random_embeddings(3)
+    _add_one_by_one(store, embeddings)
+
+    assert not store._generation.pending
+    assert store.ntotal == 3
+    assert _nearest(store, embeddings) == [1, 2, 3]
+    with pytest.raises(RuntimeError):
+        store.train(random_embeddings(500, seed=4))
+
+def test_pending_store_round_trips(embedding_service, tmp_path):
+    store = VectorStore(embedding_service, index_spec=IndexSpec('sq8'), training_size=50)
+    embeddings = random_embeddings(50)
+    _add_one_by_one(store, embeddings[:10])
+    store.save(tmp_path)
+
+    loaded = VectorStore.load(tmp_path, embedding_service, mmap=False)
+    assert loaded._generation.pending
+    assert _nearest(loaded, embeddings[:10]) == list(range(1, 11))
+    _add_one_by_one(loaded, embeddings[10:], start=11)
+    assert not loaded._generation.pending
+    assert loaded._generation.index.ntotal == 50
+
+def test_ivf_store_trains_its_full_nlist_from_single_document_writes(embedding_service):
+    spec = IndexSpec('ivf', nlist=4, nprobe=4)
+    store = VectorStore(embedding_service, index_spec=spec)
+    embeddings = random_embeddings(spec.training_size)
+
+    _add_one_by_one(store, embeddings[:-1])
+    assert store._generation.pending
+    _add_one_by_one(store, embeddings[-1:], start=spec.training_size)
+
+    assert not store._generation.pending
+    assert faiss.extract_index_ivf(store._generation.index.index).nlist == 4
+    assert _nearest(store, embeddings[:20]) == list(range(1, 21))
+
+def test_pca_projection_waits_for_enough_vectors(embedding_service):
+    store = VectorStore(embedding_service, projection='pca', projection_dim=8)
+    embeddings = random_embeddings(128)
+
+    _add_one_by_one(store, embeddings[:5])
+    assert store._generation.pending and store.transform is None
+    assert _nearest(store, embeddings[:5]) == [1, 2, 3, 4, 5]
+
+    _add_one_by_one(store, embeddings[5:], start=6)
+    assert not store._generation.pending
+    assert store.transform.is_trained
+    assert store._generation.index.d == 8
+    assert _nearest(store, embeddings[:20]) == list(range(1, 21))
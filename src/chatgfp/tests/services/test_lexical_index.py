@@ -0,0 +1,56 @@
+import numpy as np
+from app.services.lexical_index import BM25Index, tokenize
+
+def test_reference_is_kept_whole_and_paired_with_its_module():
+    assert tokenize("cobs 9.2.1r") == ["cobs", "9.2.1r", "cobs 9.2.1r"]
+    assert tokenize("COBS 9.2.1R") == tokenize("cobs 9.2.1r")
+
+def test_document_references_also_index_their_parents():
+    assert tokenize("See COBS 9.2.1R and PS23/6.", expand=True) == [
+        "see", "cobs", "9.2.1r", "and", "ps23/6",
+        "cobs 9.2.1r", "cobs 9", "cobs 9.2", "cobs 9.2.1",
+    ]
+
+def test_only_a_module_followed_by_a_number_pairs():
+    assert tokenize("9.2 cobs") == ["9.2", "cobs"]
+    # Words longer than a module prefix do not pair either
+    assert tokenize("assessment 2024") == ["assessment", "2024"]
+
+def _index(texts):
+    index = BM25Index()
+    index.add(range(len(texts)), texts)
+    return index
+
+TEXTS = [
+    "COBS 9.2.1R a firm must obtain information on the client's knowledge",
+    "COBS 9 suitability chapter overview",
+    "SYSC 9.2 record keeping of orders",
+    "COBS 10.2.1R appropriateness for non-advised services",
+]
+
+def test_full_reference_ranks_its_rule_first():
+    labels = [label for label, _ in _index(TEXTS).search("cobs 9.2.1r", 4)]
+    assert labels[0] == 0
+
+def test_parent_reference_finds_child_rules():
+    labels = [label for label, _ in _index(TEXTS).search("What does COBS 9.2 require?", 4)]
+    # Only COBS 9.2.1R indexed the pair "cobs 9.2", so it beats the other COBS chunks
+    assert labels.index(0) < min(labels.index(1), labels.index(3))
+
+def test_removed_and_filtered_labels_are_not_returned():
+    index = _index(TEXTS)
+    index.remove([0])
+    assert 0 not in [label for label, _ in index.search("cobs 9.2.1r", 4)]
+
+    allowed = np.zeros(1, dtype=np.uint8)
+    allowed[0] |= 1 << 3
+    assert [label for label, _ in index.search("cobs", 4, allowed)] == [3]
+
+def test_compaction_drops_dead_postings_without_changing_scores():
+    index = _index(TEXTS)
+    index.remove([1])
+    before = index.search("cobs 9.2.1r suitability", 4)
+    index.compact()
+
+    assert index.dead_postings == 0
+    assert index.search("cobs 9.2.1r suitability", 4) == before
@@ -0,0 +1,67 @@
+import asyncio
+import numpy as np
+import pytest
+from app.services.metadata_index import MetadataIndex
+from app.services.vector_store import VectorStore
+from tests.conftest import Document
+
+def documents():
+    return [
+        Document(id=1, title="a", content="a", source="handbook", metadata={"section": "COBS 9", "category": "rules"}),
+        Document(id=2, title="b", content="b", source="handbook", metadata={"section": "COBS 9", "category": "guidance"}),
+        Document(id=3, title="c", content="c", source="policy", metadata={"section": "SYSC 4", "category": ["rules", "guidance"]}),
+        Document(id=4, title="d", content="d", source="policy", metadata={"section": "SYSC 4"}),
+        Document(id=5, title="e", content="e", source="handbook", metadata={"section": "PRIN 2", "category": "rules"}),
+    ]
+
+@pytest.fixture
+def index():
+    index = MetadataIndex()
+    stored = documents()
+    index.add(range(len(stored)), stored)
+    return index
+
+def matching(index, filters):
+    """Labels selected by filters"""
+    bits = np.unpackbits(index.evaluate(filters), bitorder='little')
+    return np.flatnonzero(bits).tolist()
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"section": "COBS 9"}, [0, 1]),
+    ({"section": {"$eq": "SYSC 4"}}, [2, 3]),
+    ({"section": {"$ne": "SYSC 4"}}, [0, 1, 4]),
+    ({"category": {"$in": ["guidance"]}}, [1, 2]),
+    ({"category": {"$nin": ["rules"]}}, [1, 3]),
+    ({"section": "COBS 9", "category": "rules"}, [0]),
+    ({"$or": [{"section": "PRIN 2"}, {"category": "guidance"}]}, [1, 2, 4]),
+    ({"$and": [{"source": "policy"}, {"category": "rules"}]}, [2]),
+    ({"$not": {"source": "handbook"}}, [2, 3]),
+    ({"section": "MAR 1"}, []),
+])
+def test_filters_select_the_matching_labels(index, filters, expected):
+    assert matching(index, filters) == expected
+
+def test_removed_labels_never_match(index):
+    index.remove([0, 2])
+
+    assert matching(index, {"category": "rules"}) == [4]
+    assert matching(index, {"$not": {"section": "COBS 9"}}) == [3, 4]
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"chapter": "COBS"},
+    {"$xor": []},
+    {"$or": []},
+    {"section": {"$gt": "COBS"}},
+    {"section": {"$in": "COBS 9"}},
+])
+def test_invalid_filters_raise(index, filters):
+    with pytest.raises(ValueError):
+        index.evaluate(filters)
+
+def test_store_search_only_scores_filtered_documents(embedding_service):
+    store = VectorStore(embedding_service)
+    asyncio.run(store.upsert(documents()))
+
+    hits = asyncio.run(store.search("a", k=5, filters={"category": "guidance"}))
+    assert sorted(hit["document"].id for hit in hits) == [2, 3]
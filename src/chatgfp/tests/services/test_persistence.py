@@ -0,0 +1,86 @@
+import json
+import asyncio
+import hashlib
+import pytest
+from app.services.index_factory import IndexSpec
+from app.services.vector_store import VectorStore
+from tests.conftest import Document, HashEmbeddingService, make_documents, random_embeddings
+
+def _checksums(directory):
+    return {path.name: hashlib.md5(path.read_bytes()).hexdigest() for path in directory.iterdir()}
+
+def _ranking(store, query):
+    return [(hit["document"].id, round(hit["score"], 5)) for hit in asyncio.run(store.search(query, k=5))]
+
+@pytest.fixture
+def saved_store(embedding_service, tmp_path):
+    store = VectorStore(embedding_service)
+    asyncio.run(store.upsert(make_documents(30, section="COBS 9")))
+    asyncio.run(store.upsert([Document(id=5, title="Rule 5", content="updated text on topic1")]))
+    asyncio.run(store.delete([7]))
+    store.save(tmp_path)
+    return store, tmp_path
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip_serves_the_same_results(saved_store, embedding_service, mmap):
+    store, directory = saved_store
+    loaded = VectorStore.load(directory, embedding_service, mmap=mmap)
+
+    assert loaded.read_only is mmap
+    assert sorted(loaded.documents) == sorted(store.documents)
+    assert loaded.documents[5].content == "updated text on topic1"
+    assert _ranking(loaded, "chunk about topic1") == _ranking(store, "chunk about topic1")
+    assert [hit["document"].id for hit in asyncio.run(loaded.lexical_search("clause7"))] == []
+    # Document 7 was deleted and the replacement of 5 carries no section
+    filtered = asyncio.run(loaded.search("chunk", k=50, filters={"section": "COBS 9"}))
+    assert sorted(hit["document"].id for hit in filtered) == [i for i in range(1, 31) if i not in (5, 7)]
+
+def test_mmap_load_is_read_only(saved_store, embedding_service):
+    _, directory = saved_store
+    loaded = VectorStore.load(directory, embedding_service)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(loaded.upsert(make_documents(1, start=100)))
+    with pytest.raises(RuntimeError):
+        asyncio.run(loaded.delete([1]))
+
+def test_writable_load_leaves_the_saved_files_unchanged(saved_store, embedding_service):
+    _, directory = saved_store
+    before = _checksums(directory)
+    loaded = VectorStore.load(directory, embedding_service, mmap=False)
+
+    asyncio.run(loaded.upsert(make_documents(5, start=40)))
+    asyncio.run(loaded.upsert([Document(id=1, title="Rule 1", content="changed after load")]))
+    asyncio.run(loaded.delete([2]))
+
+    assert _checksums(directory) == before
+    assert loaded.documents[1].content == "changed after load"
+    assert VectorStore.load(directory, embedding_service).documents[1].content == make_documents(1)[0].content
+
+def test_compressed_store_round_trips_with_exact_vectors(embedding_service, tmp_path):
+    store = VectorStore(embedding_service, index_spec=IndexSpec('sq8'), training_size=64)
+    embeddings = random_embeddings(100)
+    asyncio.run(store.upsert(make_documents(100), embeddings))
+    store.save(tmp_path)
+
+    for mmap in (True, False):
+        loaded = VectorStore.load(tmp_path, embedding_service, mmap=mmap)
+        assert loaded.vectors is not None
+        hits = loaded._search_vectors(embeddings[:10], k=1)
+        assert [row[0]["document"].id for row in hits] == list(range(1, 11))
+
+def test_load_rejects_another_model(saved_store):
+    _, directory = saved_store
+    with pytest.raises(ValueError):
+        VectorStore.load(directory, HashEmbeddingService(model_name="other-model"))
+
+def test_save_reclaims_the_text_of_replaced_and_deleted_documents(saved_store, embedding_service):
+    store, directory = saved_store
+    # Document 5 was replaced and 7 deleted after the first write
+    assert store.documents.dead_bytes > 0
+
+    loaded = VectorStore.load(directory, embedding_service, mmap=False)
+    assert loaded.documents.dead_bytes == 0
+    deleted = loaded.documents[8]
+    asyncio.run(loaded.delete([8]))
+    assert loaded.documents.dead_bytes == len(f"{deleted.title}{deleted.content}{json.dumps(deleted.metadata)}".encode())
@@ -0,0 +1,44 @@
+from app.services import result_cache
+from app.services.result_cache import SemanticResultCache
+from tests.conftest import make_documents, random_embeddings
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def _results(start):
+    return [{"document": doc, "score": 1.0} for doc in make_documents(2, start=start)]
+
+def test_expired_entries_are_swept_without_a_matching_lookup(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    cache = SemanticResultCache(ttl_seconds=60)
+    embeddings = random_embeddings(4)
+    for row in range(3):
+        cache.put(f"query {row}", embeddings[row], 5, _results(10 * row))
+
+    clock.now += 61
+    cache.put("query 3", embeddings[3], 5, _results(30))
+
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["expirations"] == 3
+    assert stats["size_bytes"] == next(iter(cache._entries.values())).size_bytes
+    assert cache.get("query 3", embeddings[3], 5)[0]["document"].id == 30
+    assert cache.invalidate_documents([1, 11, 21]) == 0
+
+def test_evicted_entries_are_not_expired_twice(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    embeddings = random_embeddings(3)
+    cache = SemanticResultCache(ttl_seconds=60)
+    cache.put("query 0", embeddings[0], 5, _results(0))
+    cache.capacity_bytes = cache.size_bytes * 3 // 2
+    cache.put("query 1", embeddings[1], 5, _results(10))
+    assert cache.stats()["evictions"] == 1
+
+    clock.now += 61
+    assert cache.get("query 1", embeddings[1], 5) is None
+    assert cache.stats()["expirations"] == 1 and cache.size_bytes == 0
@@ -0,0 +1,51 @@
+import json
+import asyncio
+import pytest
+from app.services.sharded_store import SHARDS_FILE, ShardedVectorStore
+from tests.conftest import DOCUMENT_STAND_IN, Document
+
+def _chunks(module, count, start):
+    return [
+        Document(id=doc_id, title=f"{module} {doc_id}", content=f"{module.lower()} rule {doc_id}",
+                 metadata={"section": f"{module} {doc_id % 5 + 1}.1"})
+        for doc_id in range(start, start + count)
+    ]
+
+def test_module_routing_honours_fixed_shards_and_balances_the_rest(embedding_service):
+    store = ShardedVectorStore(embedding_service, shards=3, partition='module', module_shards={"COBS": 2})
+    try:
+        sizes = [0, 0, 0]
+        for doc in _chunks("COBS", 4, 1) + _chunks("SYSC", 2, 10) + _chunks("PRIN", 1, 20):
+            shard = store._route(doc, sizes)
+            sizes[shard] += 1
+
+        assert store.module_shards == {"COBS": 2, "SYSC": 0, "PRIN": 1}
+        assert sizes == [2, 1, 4]
+        # Chunks without a section fall back to the id hash
+        assert 0 <= store._route(Document(id=99, title="x", content="y"), sizes) < 3
+    finally:
+        store.close()
+
+def test_module_shards_must_name_existing_shards(embedding_service):
+    with pytest.raises(ValueError):
+        ShardedVectorStore(embedding_service, shards=2, partition='module', module_shards={"COBS": 2})
+
+@pytest.mark.skipif(DOCUMENT_STAND_IN, reason="shard workers import the SQLModel Document, which this SQLModel release cannot build")
+def test_save_skips_empty_shards_and_load_restores_the_layout(embedding_service, tmp_path):
+    with ShardedVectorStore(embedding_service, shards=3, partition='module', module_shards={"COBS": 0, "SYSC": 1}) as store:
+        asyncio.run(store.upsert(_chunks("COBS", 10, 1) + _chunks("SYSC", 10, 100)))
+        (tmp_path / "shard-2").mkdir()   # left over from an earlier save
+        store.save(tmp_path)
+
+    assert not (tmp_path / "shard-2").exists()
+    layout = json.loads((tmp_path / SHARDS_FILE).read_text(encoding="utf-8"))
+    assert layout["module_shards"] == {"COBS": 0, "SYSC": 1}
+
+    with ShardedVectorStore.load(tmp_path, embedding_service, mmap=False) as loaded:
+        assert sorted(loaded.documents) == list(range(1, 11)) + list(range(100, 110))
+        assert [entry["documents"] for entry in loaded.stats()] == [10, 10, 0]
+        hits = asyncio.run(loaded.search("sysc rule 105", k=1))
+        assert hits[0]["document"].id == 105
+        # The next unseen module fills the empty shard
+        asyncio.run(loaded.upsert(_chunks("CASS", 3, 200)))
+        assert loaded.module_shards["CASS"] == 2
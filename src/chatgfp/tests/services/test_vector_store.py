@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import faiss
+import numpy as np
+from app.services.index_factory import IndexSpec
+from app.services.vector_store import VectorStore
+from tests.conftest import Document, make_documents, random_embeddings
+
+def test_upsert_assigns_ids_and_finds_documents(embedding_service):
+    store = VectorStore(embedding_service)
+    documents = [Document(title="A", content="client money rules"), Document(title="B", content="senior managers regime")]
+    asyncio.run(store.upsert(documents))
+
+    assert [doc.id for doc in documents] == [1, 2]
+    assert len(store.documents) == 2
+    results = asyncio.run(store.search("senior managers regime", k=1))
+    assert results[0]["document"].id == 2
+    assert results[0]["document"].content == "senior managers regime"
+
+def test_replace_tombstones_the_old_vector(embedding_service):
+    store = VectorStore(embedding_service)
+    asyncio.run(store.upsert(make_documents(5)))
+    old_label = store.documents.label(3)
+
+    asyncio.run(store.upsert([Document(id=3, title="Rule 3", content="replaced wording on complaints")]))
+
+    assert len(store.documents) == 5
+    assert store.ntotal == 6
+    assert store._generation.tombstones == {old_label}
+    assert store.documents[3].content == "replaced wording on complaints"
+    results = asyncio.run(store.search("replaced wording on complaints", k=5))
+    assert [result["document"].id for result in results].count(3) == 1
+    assert results[0]["document"].content == "replaced wording on complaints"
+
+def test_repeated_id_in_one_batch_keeps_the_last_version(embedding_service):
+    store = VectorStore(embedding_service)
+    asyncio.run(store.upsert([
+        Document(id=7, title="Old", content="first version"),
+        Document(id=7, title="New", content="second version"),
+    ]))
+
+    assert store.ntotal == 1
+    assert store.documents[7].title == "New"
+
+def test_delete_excludes_until_compaction_drops(embedding_service):
+    store = VectorStore(embedding_service, compaction_threshold=1.0)
+    asyncio.run(store.upsert(make_documents(10)))
+
+    assert asyncio.run(store.delete([2, 4, 99])) == 2
+    assert 2 not in store.documents
+    assert store.ntotal == 10
+    assert store.tombstone_ratio == 0.2
+    found = {result["document"].id for result in asyncio.run(store.search("chunk about topic", k=10))}
+    assert found == {1, 3, 5, 6, 7, 8, 9, 10}
+    assert asyncio.run(store.lexical_search("clause2")) == []
+
+    store.compact()
+    assert store.ntotal == 8
+    assert not store._generation.tombstones
+    assert store._generation.delta == ()
+    found = {result["document"].id for result in asyncio.run(store.search("chunk about topic", k=10))}
+    assert found == {1, 3, 5, 6, 7, 8, 9, 10}
+
+def test_compaction_replays_writes_published_during_the_rebuild(embedding_service):
+    store = VectorStore(embedding_service, compaction_threshold=1.0)
+    asyncio.run(store.upsert(make_documents(20), random_embeddings(20)))
+    asyncio.run(store.delete([1, 2, 3]))
+    late = random_embeddings(5, seed=1)
+    label_of_4 = store.documents.label(4)
+
+    # Write while compaction reads its snapshot, as ingestion would on the event loop
+    read_snapshot = store._stored_vectors
+    written = []
+    def write_during_rebuild(index, start, end):
+        if not written:
+            written.append(True)
+            asyncio.run(store.upsert(make_documents(5, start=21), late))
+            asyncio.run(store.delete([4]))
+        return read_snapshot(index, start, end)
+    store._stored_vectors = write_during_rebuild
+    store.compact()
+
+    generation = store._generation
+    assert generation.delta == ()
+    # Compaction dropped what the snapshot had tombstoned; the later delete stays a tombstone
+    assert generation.tombstones == {label_of_4}
+    assert generation.ntotal == 22
+    for row, doc_id in enumerate(range(21, 26)):
+        hits = store._search_vectors(late[row:row + 1], k=1)[0]
+        assert hits[0]["document"].id == doc_id
+        assert np.isclose(hits[0]["score"], 1.0)
+
+def test_compaction_replays_later_writes_merged_into_earlier_runs(embedding_service):
+    store = VectorStore(embedding_service, compaction_threshold=1.0)
+    embeddings = random_embeddings(14)
+    asyncio.run(store.upsert(make_documents(10), embeddings[:10]))
+    for row in (10, 11):
+        asyncio.run(store.upsert(make_documents(1, start=row + 1), embeddings[row:row + 1]))
+    asyncio.run(store.delete([1]))
+
+    read_snapshot = store._stored_vectors
+    written = []
+    def write_during_rebuild(index, start, end):
+        if not written:
+            written.append(True)
+            for row in (12, 13):
+                asyncio.run(store.upsert(make_documents(1, start=row + 1), embeddings[row:row + 1]))
+        return read_snapshot(index, start, end)
+    store._stored_vectors = write_during_rebuild
+    store.compact()
+
+    generation = store._generation
+    # The late writes were merged with the snapshot's run of two; only they are replayed
+    assert generation.ntotal == 13 and generation.delta == ()
+    assert sorted(faiss.vector_to_array(generation.index.id_map).tolist()) == list(range(1, 14))
+    for row in range(1, 14):
+        hits = store._search_vectors(embeddings[row:row + 1], k=1)[0]
+        assert hits[0]["document"].id == row + 1
+
+def _wait_for_promotion():
+    for thread in threading.enumerate():
+        if thread.name == "vector-store-promotion":
+            thread.join()
+
+def test_failed_promotion_is_retried_after_a_delay(embedding_service, monkeypatch):
+    store = VectorStore(embedding_service, promotion=IndexSpec('ivf', nlist=2), promotion_threshold=100)
+    embeddings = random_embeddings(120)
+    time_search = store._time_search
+    def fail_once(*args):
+        monkeypatch.setattr(store, "_time_search", time_search)
+        raise MemoryError("no room for the promoted index")
+    monkeypatch.setattr(store, "_time_search", fail_once)
+
+    asyncio.run(store.upsert(make_documents(100), embeddings[:100]))
+    _wait_for_promotion()
+    assert store.index_spec.kind == 'flat' and store._promotion is None
+    # Not retried before the delay has passed
+    asyncio.run(store.upsert(make_documents(10, start=101), embeddings[100:110]))
+    assert store._promotion is None
+
+    store._promotion_retry_at = 0.0
+    asyncio.run(store.upsert(make_documents(10, start=111), embeddings[110:]))
+    _wait_for_promotion()
+    assert store.index_spec.kind == 'ivf'
+    assert store._generation.ntotal == 120
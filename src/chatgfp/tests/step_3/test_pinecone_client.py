@@ -0,0 +1,166 @@
+import json
+import time
+import asyncio
+import httpx
+import pytest
+import requests
+from chatgfp.steps.step_3_embedding.pinecone_client import PineconeClient
+
+class FakeUpsertEndpoint:
+    """Stands in for session.post: records each upsert body, failing the calls listed in fail_calls"""
+
+    def __init__(self, fail_calls=(), status=400):
+        self.fail_calls = set(fail_calls)
+        self.status = status
+        self.calls = 0
+        self.bodies = []
+
+    def __call__(self, url, data, timeout):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = self.status if self.calls in self.fail_calls else 200
+        if response.status_code == 200:
+            self.bodies.append(json.loads(data))
+        return response
+
+    @property
+    def ids(self):
+        return [record["id"] for body in self.bodies for record in body["vectors"]]
+
+def _records(count, start=0):
+    return [(f"vec-{i}", [float(i), 0.5, -1.0], {"source": "COBS"}) for i in range(start, start + count)]
+
+@pytest.fixture
+def client():
+    client = PineconeClient(api_key="test", host="http://pinecone.test")
+    yield client
+    client.close()
+
+def test_batches_respect_count_and_byte_limits(client, monkeypatch):
+    endpoint = FakeUpsertEndpoint()
+    monkeypatch.setattr(client.session, "post", endpoint)
+
+    report = client.bulk_upsert(_records(25), namespace="COBS", max_batch_size=10, concurrency=2)
+    assert [len(body["vectors"]) for body in endpoint.bodies] == [10, 10, 5]
+    assert all(body["namespace"] == "COBS" for body in endpoint.bodies)
+    assert (report.vectors, report.batches) == (25, 3)
+
+    endpoint.bodies.clear()
+    report = client.bulk_upsert(_records(25), max_batch_bytes=400, concurrency=1)
+    assert sorted(endpoint.ids, key=lambda vector_id: int(vector_id[4:])) == [f"vec-{i}" for i in range(25)]
+    assert all(len(json.dumps(body, separators=(",", ":"))) <= 400 for body in endpoint.bodies)
+    assert report.batches == len(endpoint.bodies) > 3
+
+def test_record_larger_than_a_request_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(client.session, "post", FakeUpsertEndpoint())
+    with pytest.raises(ValueError):
+        client.bulk_upsert(_records(1), max_batch_bytes=40)
+
+def test_transient_errors_are_retried_per_batch(client, monkeypatch):
+    endpoint = FakeUpsertEndpoint(fail_calls={2}, status=503)
+    monkeypatch.setattr(client.session, "post", endpoint)
+
+    report = client.bulk_upsert(_records(30), max_batch_size=10, concurrency=1)
+    assert report.retries == 1
+    assert sorted(endpoint.ids) == sorted(f"vec-{i}" for i in range(30))
+
+def test_interrupted_run_resumes_from_its_checkpoint(client, monkeypatch, tmp_path):
+    checkpoint = tmp_path / "upsert.json"
+    failing = FakeUpsertEndpoint(fail_calls={3})
+    monkeypatch.setattr(client.session, "post", failing)
+    with pytest.raises(requests.HTTPError):
+        client.bulk_upsert(_records(50), namespace="COBS", max_batch_size=10, concurrency=1, checkpoint_path=str(checkpoint))
+    assert json.loads(checkpoint.read_text()) == {"namespace": "COBS", "completed": 20}
+
+    with pytest.raises(ValueError):
+        client.bulk_upsert(_records(50), namespace="SYSC", checkpoint_path=str(checkpoint))
+
+    resumed = FakeUpsertEndpoint()
+    monkeypatch.setattr(client.session, "post", resumed)
+    report = client.bulk_upsert(_records(50), namespace="COBS", max_batch_size=10, concurrency=1, checkpoint_path=str(checkpoint))
+    assert report.resumed_from == 20
+    assert resumed.ids == [f"vec-{i}" for i in range(20, 50)]
+    assert not checkpoint.exists()
+
+def _serve(client, delays):
+    """Answer aquery requests from a mock transport; request i waits delays(i) seconds"""
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(delays(len(calls) - 1))
+        return httpx.Response(200, json={"matches": [{"id": "a", "score": 0.9, "metadata": {"text": "t"}}]})
+
+    client._async_client = httpx.AsyncClient(base_url=client.host, transport=httpx.MockTransport(handler))
+    client._async_loop = asyncio.get_running_loop()
+    return calls
+
+def test_no_hedging_before_enough_latency_samples(client):
+    client.hedge_min_samples = 10
+
+    async def run():
+        _serve(client, lambda call: 0.001)
+        for _ in range(9):
+            await client.aquery([0.1, 0.2])
+        return client.hedge_delay()
+
+    assert asyncio.run(run()) is None
+    assert client.query_stats()["hedged"] == 0
+
+def test_hedge_rate_stays_under_the_cap(client):
+    client.hedge_min_samples = 10
+    client.max_hedge_rate = 0.1
+
+    async def run():
+        # Each request after the warm-up is slower than any before it, so
+        # without the cap nearly every query would exceed the hedge delay
+        calls = _serve(client, lambda call: 0.002 if call < 10 else 0.001 * call)
+        for _ in range(60):
+            await client.aquery([0.1, 0.2])
+        return calls
+
+    calls = asyncio.run(run())
+    stats = client.query_stats()
+    assert stats["queries"] == 60
+    assert 0 < stats["hedged"] <= 0.1 * 60
+    assert len(calls) == 60 + stats["hedged"]
+
+def test_hedge_answers_when_the_primary_stalls(client):
+    client.hedge_min_samples = 10
+
+    async def run():
+        _serve(client, lambda call: 1.0 if call == 10 else 0.002)
+        for _ in range(10):
+            await client.aquery([0.1, 0.2])
+        start = time.perf_counter()
+        results = await client.aquery([0.1, 0.2])
+        return results, time.perf_counter() - start
+
+    results, seconds = asyncio.run(run())
+    assert [result.id for result in results] == ["a"]
+    assert seconds < 0.5
+    assert client.query_stats()["hedge_wins"] == 1
+
+def test_caller_timeout_cancels_the_request_in_flight(client):
+    client.hedge_min_samples = 10
+
+    async def run():
+        cancelled = []
+
+        async def handler(request):
+            try:
+                await asyncio.sleep(1.0)
+            except asyncio.CancelledError:
+                cancelled.append(request)
+                raise
+            return httpx.Response(200, json={"matches": []})
+
+        client._async_client = httpx.AsyncClient(base_url=client.host, transport=httpx.MockTransport(handler))
+        client._async_loop = asyncio.get_running_loop()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.aquery([0.1, 0.2]), timeout=0.05)
+        await asyncio.sleep(0.05)
+        # Copied before asyncio.run cancels whatever is left over
+        return len(cancelled)
+
+    assert asyncio.run(run()) == 1